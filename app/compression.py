@@ -0,0 +1,200 @@
+"""Negotiated gzip / brotli compression for HTML responses.
+
+Rendered conversations repeat the same tags, classes and inline styles for
+every field, so they shrink 10-20x.  ``CompressionMiddleware`` is an ASGI
+middleware that compresses text responses above a size threshold with the
+best encoding the client accepts: brotli when the optional ``brotli``
+package is installed, else gzip.  Streamed responses are compressed chunk by
+chunk with a sync flush, so each chunk still reaches the browser right away.
+
+A compressed response's strong ETag gets an encoding suffix (``"abc-gzip"``);
+the suffix is stripped from ``If-None-Match`` before the app sees it.
+"""
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript", "image/svg+xml")
+# Matched by COMPRESSIBLE_TYPES but sent as-is: Server-Sent Events must reach
+# the browser (and any proxy) event by event, uncompressed
+EXCLUDED_TYPES = ("text/event-stream",)
+
+# Responses smaller than this are sent as-is (ROO_BROWSER_COMPRESS_MIN_BYTES)
+MINIMUM_SIZE = 1024
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def available_encodings():
+    """Encodings this process can produce, most preferred first"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding, encodings):
+    """Pick the first of ``encodings`` the Accept-Encoding header allows"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for encoding in encodings:
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def compressor(encoding, gzip_level=GZIP_LEVEL, brotli_quality=BROTLI_QUALITY):
+    """Return (compress(chunk), flush(), finish()) callables for ``encoding``"""
+    if encoding == "br":
+        c = brotli.Compressor(quality=brotli_quality)
+        return c.process, c.flush, c.finish
+    c = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+    return c.compress, lambda: c.flush(zlib.Z_SYNC_FLUSH), c.flush
+
+
+def compress(data, encoding, gzip_level=GZIP_LEVEL, brotli_quality=BROTLI_QUALITY):
+    """Compress a whole body in one go"""
+    process, _, finish = compressor(encoding, gzip_level, brotli_quality)
+    return process(data) + finish()
+
+
+def _strip_suffix(value):
+    """Remove -gzip / -br suffixes from the entity tags of an If-None-Match value"""
+    tags = []
+    for tag in value.split(","):
+        tag = tag.strip()
+        for encoding in ("br", "gzip"):
+            suffix = f'-{encoding}"'
+            if tag.endswith(suffix):
+                tag = tag[:-len(suffix)] + '"'
+                break
+        tags.append(tag)
+    return ", ".join(tags)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing text responses of at least ``minimum_size`` bytes"""
+
+    def __init__(self, app, minimum_size=None, encodings=None, gzip_level=GZIP_LEVEL,
+                 brotli_quality=BROTLI_QUALITY):
+        self.app = app
+        if minimum_size is None:
+            minimum_size = int(os.environ.get("ROO_BROWSER_COMPRESS_MIN_BYTES", MINIMUM_SIZE))
+        self.minimum_size = minimum_size
+        self.encodings = tuple(e for e in (encodings or available_encodings()) if e in available_encodings())
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict((k.lower(), v) for k, v in scope["headers"])
+        encoding = negotiate(headers.get(b"accept-encoding", b"").decode("latin-1"), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        suffixed = False
+        if b"if-none-match" in headers:
+            value = headers[b"if-none-match"].decode("latin-1")
+            stripped = _strip_suffix(value)
+            suffixed = stripped != value
+            scope = dict(scope, headers=[
+                (k, stripped.encode("latin-1") if k.lower() == b"if-none-match" else v)
+                for k, v in scope["headers"]])
+        await _CompressingResponder(self, encoding, suffixed)(scope, receive, send)
+
+
+class _CompressingResponder:
+    def __init__(self, middleware, encoding, suffixed):
+        self.mw = middleware
+        self.encoding = encoding
+        self.suffixed = suffixed
+        self.send = None
+        self.start = None
+        self.active = None  # None until the first body chunk decides
+        self.process = self.flush = self.finish = None
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.mw.app(scope, receive, self.send_wrapper)
+
+    def _compressible(self, headers):
+        if any(k.lower() == b"content-encoding" for k, _ in headers):
+            return False
+        ctype = next((v for k, v in headers if k.lower() == b"content-type"), b"").decode("latin-1")
+        return ctype.startswith(COMPRESSIBLE_TYPES) and not ctype.startswith(EXCLUDED_TYPES)
+
+    def _start_compressed(self):
+        headers = []
+        for k, v in self.start["headers"]:
+            name = k.lower()
+            if name == b"content-length":
+                continue
+            if name == b"etag" and v.endswith(b'"'):
+                v = v[:-1] + f'-{self.encoding}"'.encode("latin-1")
+            elif name == b"vary":
+                continue
+            headers.append((k, v))
+        vary = [v for k, v in self.start["headers"] if k.lower() == b"vary"]
+        headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+        headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        self.process, self.flush, self.finish = compressor(self.encoding, self.mw.gzip_level, self.mw.brotli_quality)
+        return headers
+
+    async def send_wrapper(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            if message["status"] == 304:
+                self.active = False
+                if self.suffixed:
+                    # The client's copy carried the encoding suffix; echo it back
+                    message = dict(message, headers=[
+                        (k, v[:-1] + f'-{self.encoding}"'.encode("latin-1")
+                         if k.lower() == b"etag" and v.endswith(b'"') else v)
+                        for k, v in message["headers"]])
+                await self.send(message)
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+        if self.active is None:
+            compressible = self._compressible(self.start["headers"])
+            if not compressible or (not more and len(body) < self.mw.minimum_size):
+                self.active = False
+                await self.send(self.start)
+                await self.send(message)
+                return
+            self.active = True
+            headers = self._start_compressed()
+            if not more:
+                data = self.process(body) + self.finish()
+                headers.append((b"content-length", str(len(data)).encode("latin-1")))
+                await self.send(dict(self.start, headers=headers))
+                await self.send({"type": "http.response.body", "body": data})
+                return
+            await self.send(dict(self.start, headers=headers))
+        elif not self.active:
+            await self.send(message)
+            return
+
+        if more:
+            # Sync-flush so streamed chunks are not held back by the compressor
+            data = self.process(body) + self.flush()
+        else:
+            data = self.process(body) + self.finish()
+        await self.send({"type": "http.response.body", "body": data, "more_body": more})
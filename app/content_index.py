@@ -0,0 +1,338 @@
+"""Full-text search over the contents of every message of every task.
+
+Each message of ``ui_messages.json`` and ``api_conversation_history.json`` is
+flattened to the text ``render_messages()`` would show -- every string field,
+with JSON-encoded strings expanded the way ``format_message_content()`` does
+-- and stored in a SQLite FTS5 inverted index.  Files are (re)indexed in a
+background thread only when their mtime or size changes, so queries never
+touch the conversation files.
+
+Roo rewrites a task file on every update, usually appending messages or
+replacing the last one.  As in ``offset_index.TailFollower``, when the
+``ANCHOR_BYTES`` before the end of the second to last indexed message are
+unchanged, only the messages after that point are scanned and re-indexed;
+a file that shrank or changed earlier on is indexed again from scratch.
+"""
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+from array import array
+from collections import namedtuple
+from pathlib import Path
+
+from json_loader import loads
+from json_stream import element_offsets
+from offset_index import ANCHOR_BYTES
+from task_index import default_cache_dir
+from task_roots import as_tasks_dir
+
+SCHEMA_VERSION = 2
+
+# Smallest block of FTS rowids reserved for a file.  A block holds twice the
+# messages of the file when it was (re)allocated, so a growing file moves to
+# a new block only O(log n) times.
+MIN_BLOCK = 64
+
+FILE_TYPES = ("ui_messages", "api_conversation_history")
+
+# Snippet highlight markers; control characters never occur in indexed text
+MARK_START, MARK_END = "\x02", "\x03"
+
+# Structural fields that would only add noise to every snippet
+SKIP_KEYS = {"role", "type"}
+
+ContentHit = namedtuple("ContentHit", "tid file index snippet")
+
+
+def _is_binary_blob(key, value, parent):
+    """Base64 image payloads are large and useless for search"""
+    if value.startswith("data:image/"):
+        return True
+    return key == "data" and isinstance(parent, dict) and parent.get("type") == "base64"
+
+
+def _walk_text(value, out, key=None, parent=None):
+    if isinstance(value, str):
+        if _is_binary_blob(key, value, parent):
+            return
+        stripped = value.strip()
+        # Same JSON detection as format_message_content()
+        if (stripped.startswith('{') and stripped.endswith('}')) or \
+           (stripped.startswith('[') and stripped.endswith(']')):
+            try:
+                _walk_text(json.loads(stripped), out)
+                return
+            except json.JSONDecodeError:
+                pass
+        out.append(value)
+    elif isinstance(value, dict):
+        for k, v in value.items():
+            if k not in SKIP_KEYS:
+                _walk_text(v, out, k, value)
+    elif isinstance(value, list):
+        for item in value:
+            _walk_text(item, out, key, parent)
+
+
+def message_text(msg):
+    """Flatten one message to the searchable text shown when it is rendered"""
+    out = []
+    _walk_text(msg, out)
+    return "\n".join(out)
+
+
+def fts_query(query):
+    """Turn free text into an FTS5 query: every whitespace-separated term as a quoted phrase"""
+    terms = query.split()
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+class ContentIndex:
+    """Persistent FTS5 index of message text, refreshed per changed file"""
+
+    def __init__(self, tasks_dir, db_path=None):
+        # One directory, or a TaskRoots
+        self.tasks_dir = as_tasks_dir(tasks_dir)
+        self.db_path = Path(db_path) if db_path else default_cache_dir() / "content_index.sqlite3"
+        self._lock = threading.RLock()
+        self._conn = None
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._worker = None
+        self._listeners = []
+
+    # -- connection / schema -------------------------------------------------
+
+    def _connect(self):
+        if self._conn is not None:
+            return self._conn
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Error opening content index at {self.db_path}: {e}")
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            conn.execute("DROP TABLE IF EXISTS content_files")
+            conn.execute("DROP TABLE IF EXISTS content_fts")
+        # Message i of a file is FTS row first_id + i.  The file owns the
+        # rowids [first_id, first_id + capacity); last_id is its last
+        # message's, so a file is dropped by rowid instead of a scan.
+        # ``resume`` is the end offset of the second to last message (0 if
+        # there are fewer than two) and ``anchor`` the SHA-1 of the
+        # ANCHOR_BYTES before it.
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS content_files (
+                tid TEXT NOT NULL,
+                file TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                first_id INTEGER NOT NULL,
+                last_id INTEGER NOT NULL,
+                capacity INTEGER NOT NULL,
+                resume INTEGER NOT NULL,
+                anchor BLOB NOT NULL,
+                PRIMARY KEY (tid, file)
+            )
+        """)
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS content_fts USING fts5(
+                tid UNINDEXED, file UNINDEXED, idx UNINDEXED, body
+            )
+        """)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+        self._conn = conn
+        return conn
+
+    # -- background indexing -------------------------------------------------
+
+    def apply_delta(self, delta):
+        """TaskListCache listener: queue the touched tasks for (re)indexing"""
+        if delta.full:
+            self._drop_missing(set(delta.added))
+            self.enqueue(delta.added)
+        else:
+            self.enqueue(delta.added + delta.modified + delta.removed)
+
+    def enqueue(self, task_ids):
+        with self._lock:
+            for tid in task_ids:
+                if tid not in self._pending:
+                    self._pending.add(tid)
+                    self._queue.put(tid)
+            if self._worker is None and self._pending:
+                self._worker = threading.Thread(target=self._run, name="content-indexer", daemon=True)
+                self._worker.start()
+
+    def pending(self):
+        """Number of tasks waiting to be indexed"""
+        return len(self._pending)
+
+    def _run(self):
+        while True:
+            tid = self._queue.get()
+            # Un-mark before indexing so a change arriving meanwhile re-queues it
+            with self._lock:
+                self._pending.discard(tid)
+            try:
+                self.index_task(tid)
+            except Exception as e:
+                print(f"Error indexing contents of {tid}: {e}")
+
+    def _drop_missing(self, present):
+        with self._lock:
+            conn = self._connect()
+            indexed = {tid for (tid,) in conn.execute("SELECT DISTINCT tid FROM content_files")}
+            for tid in indexed - present:
+                self._delete(conn, tid)
+            conn.commit()
+
+    def _delete(self, conn, tid, file_type=None):
+        if file_type is None:
+            ranges = conn.execute("SELECT first_id, last_id FROM content_files WHERE tid = ?", (tid,)).fetchall()
+            conn.execute("DELETE FROM content_files WHERE tid = ?", (tid,))
+        else:
+            ranges = conn.execute("SELECT first_id, last_id FROM content_files WHERE tid = ? AND file = ?",
+                                  (tid, file_type)).fetchall()
+            conn.execute("DELETE FROM content_files WHERE tid = ? AND file = ?", (tid, file_type))
+        for first_id, last_id in ranges:
+            conn.execute("DELETE FROM content_fts WHERE rowid BETWEEN ? AND ?", (first_id, last_id))
+
+    def index_task(self, tid):
+        """Re-index whichever of a task's files changed since they were last indexed"""
+        for file_type in FILE_TYPES:
+            path = self.tasks_dir / tid / f"{file_type}.json"
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute("SELECT mtime_ns, size, first_id, last_id, capacity, resume, anchor "
+                                   "FROM content_files WHERE tid = ? AND file = ?", (tid, file_type)).fetchone()
+            try:
+                f = open(path, "rb")
+            except OSError:
+                if row is not None:
+                    with self._lock:
+                        conn = self._connect()
+                        self._delete(conn, tid, file_type)
+                        conn.commit()
+                continue
+            # Read outside the lock so queries are never blocked by big files
+            with f:
+                st = os.fstat(f.fileno())
+                stat = (st.st_mtime_ns, st.st_size)
+                if row is not None and tuple(row[:2]) == stat:
+                    continue
+                start, ends, texts = self._read_tail(f, stat, row) or self._read_all(path, f)
+                count = start + len(texts)
+                resume = ends[count - 1 - start] if count >= 2 else 0
+                f.seek(max(0, resume - ANCHOR_BYTES))
+                anchor = hashlib.sha1(f.read(min(resume, ANCHOR_BYTES))).digest()
+            with self._lock:
+                conn = self._connect()
+                first_id, capacity = self._store(conn, tid, file_type, row, start, texts)
+                conn.execute("INSERT OR REPLACE INTO content_files VALUES (?,?,?,?,?,?,?,?,?)",
+                             (tid, file_type) + stat + (first_id, first_id + count - 1, capacity, resume, anchor))
+                conn.commit()
+            self._notify(str(path), *stat, count)
+
+    def _read_tail(self, f, stat, row):
+        """Like _read_all, but only for the messages from the last indexed one on.
+
+        Returns None when the file has to be read whole: it was not indexed
+        yet, has fewer than two messages indexed, changed before the resume
+        point, lost messages, or its tail does not parse.
+        """
+        if row is None:
+            return None
+        _, _, first_id, last_id, _, resume, anchor = row
+        count = last_id - first_id + 1
+        if count < 2 or stat[1] < resume:
+            return None
+        f.seek(max(0, resume - ANCHOR_BYTES))
+        if hashlib.sha1(f.read(min(resume, ANCHOR_BYTES))).digest() != anchor:
+            return None
+        f.seek(resume)
+        data = f.read()
+        try:
+            offsets = element_offsets(data, start=0)
+            texts = [message_text(loads(data[offsets[i]:offsets[i + 1]])) for i in range(0, len(offsets), 2)]
+        except ValueError:
+            return None
+        if not texts:
+            return None
+        return count - 1, array("Q", [resume]) + array("Q", (resume + end for end in offsets[1::2])), texts
+
+    def _read_all(self, path, f):
+        """(start, ends, texts): the text of every message from ``start`` on and where each ends.
+
+        ``ends[0]`` is the end offset of message ``start - 1`` (0 when
+        ``start`` is 0); ``ends[i + 1]`` that of message ``start + i``.  A file
+        that is not a well-formed JSON array is indexed as empty.
+        """
+        f.seek(0)
+        data = f.read()
+        try:
+            offsets = element_offsets(data)
+            texts = [message_text(loads(data[offsets[i]:offsets[i + 1]])) for i in range(0, len(offsets), 2)]
+        except ValueError as e:
+            print(f"Error indexing contents of {path}: {e}")
+            return 0, array("Q", [0]), []
+        return 0, array("Q", [0]) + offsets[1::2], texts
+
+    def _store(self, conn, tid, file_type, row, start, texts):
+        """Make ``texts`` the FTS rows of messages ``start`` onwards of a file; returns its (first_id, capacity)"""
+        count = start + len(texts)
+        first_id = capacity = None
+        if row is not None:
+            first_id, capacity = row[2], row[4]
+            conn.execute("DELETE FROM content_fts WHERE rowid BETWEEN ? AND ?", (first_id + start, row[3]))
+        if row is None or count > capacity:
+            # New, or outgrew its block: take a block after every other one
+            # and move the rows kept there (from the index, not the file)
+            new_id = conn.execute("SELECT COALESCE(MAX(first_id + capacity), 1) FROM content_files").fetchone()[0]
+            if start:
+                conn.execute("INSERT INTO content_fts (rowid, tid, file, idx, body) "
+                             "SELECT rowid - ? + ?, tid, file, idx, body FROM content_fts "
+                             "WHERE rowid BETWEEN ? AND ?", (first_id, new_id, first_id, first_id + start - 1))
+            if first_id is not None:
+                conn.execute("DELETE FROM content_fts WHERE rowid BETWEEN ? AND ?", (first_id, first_id + start - 1))
+            first_id, capacity = new_id, max(MIN_BLOCK, 2 * count)
+        conn.executemany("INSERT INTO content_fts (rowid, tid, file, idx, body) VALUES (?,?,?,?,?)",
+                         [(first_id + start + i, tid, file_type, start + i, text) for i, text in enumerate(texts)])
+        return first_id, capacity
+
+    def subscribe(self, callback):
+        """Register ``callback(path, mtime_ns, size, count)``, called after a file is (re)indexed"""
+        self._listeners.append(callback)
+
+    def _notify(self, path, mtime_ns, size, count):
+        for callback in self._listeners:
+            try:
+                callback(path, mtime_ns, size, count)
+            except Exception as e:
+                print(f"Error in content index listener: {e}")
+
+    # -- queries -------------------------------------------------------------
+
+    def search(self, query, limit=50):
+        """Return up to ``limit`` ContentHits, best match first"""
+        match = fts_query(query)
+        if not match:
+            return []
+        with self._lock:
+            conn = self._connect()
+            try:
+                rows = conn.execute(
+                    "SELECT tid, file, idx, snippet(content_fts, 3, ?, ?, '…', 16) "
+                    "FROM content_fts WHERE content_fts MATCH ? ORDER BY rank LIMIT ?",
+                    (MARK_START, MARK_END, match, limit)).fetchall()
+            except sqlite3.OperationalError as e:
+                print(f"Error searching contents: {e}")
+                return []
+        return [ContentHit(*row) for row in rows]
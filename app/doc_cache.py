@@ -0,0 +1,125 @@
+"""Shared cache of parsed task JSON files.
+
+Every view of a task parses ``ui_messages.json`` or
+``api_conversation_history.json``; switching tabs or paging back and forth
+would re-parse the same file each time.  ``DocumentCache`` keeps recently
+used documents, keyed by path and validated by (mtime_ns, size), in an LRU
+bounded by a byte budget estimated from the file sizes.
+
+Cached documents are shared between requests and must not be mutated.
+"""
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+from json_loader import load_json
+
+# Default budget (ROO_BROWSER_DOC_CACHE_MB overrides it)
+DEFAULT_BUDGET_MB = 256
+
+# Parsed JSON takes several times its file size in Python objects
+OVERHEAD = 4
+
+CacheStats = namedtuple("CacheStats", "hits misses evictions entries bytes budget")
+
+
+def default_budget():
+    """Byte budget from ROO_BROWSER_DOC_CACHE_MB, else DEFAULT_BUDGET_MB"""
+    try:
+        mb = float(os.environ.get("ROO_BROWSER_DOC_CACHE_MB", DEFAULT_BUDGET_MB))
+    except ValueError:
+        mb = DEFAULT_BUDGET_MB
+    return int(mb * 1024 * 1024)
+
+
+class DocumentCache:
+    """LRU of parsed JSON documents bounded by an estimated memory budget"""
+
+    def __init__(self, budget=None):
+        self.budget = default_budget() if budget is None else budget
+        self._lock = threading.Lock()
+        # path -> (mtime_ns, size, cost, document), least recently used first
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._listeners = []
+
+    def load(self, path, store=True):
+        """Return the parsed JSON in ``path``, from the cache when it is unchanged.
+
+        Raises like ``load_json``.  With ``store=False`` a miss is
+        parsed but not cached, so bulk readers do not evict the working set.
+        """
+        path = str(path)
+        st = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[:2] == (st.st_mtime_ns, st.st_size):
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[3]
+            self.misses += 1
+
+        # Parse outside the lock; concurrent misses on one file may both parse
+        document = load_json(path)
+        if isinstance(document, list):
+            self._notify(path, st.st_mtime_ns, st.st_size, len(document))
+
+        cost = st.st_size * OVERHEAD
+        if store and cost <= self.budget:
+            with self._lock:
+                old = self._entries.pop(path, None)
+                if old is not None:
+                    self._bytes -= old[2]
+                self._entries[path] = (st.st_mtime_ns, st.st_size, cost, document)
+                self._bytes += cost
+                while self._bytes > self.budget:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= evicted[2]
+                    self.evictions += 1
+        return document
+
+    def subscribe(self, callback):
+        """Register ``callback(path, mtime_ns, size, count)``, called after a JSON array is parsed"""
+        self._listeners.append(callback)
+
+    def _notify(self, path, mtime_ns, size, count):
+        for callback in self._listeners:
+            try:
+                callback(path, mtime_ns, size, count)
+            except Exception as e:
+                print(f"Error in document cache listener: {e}")
+
+    def peek(self, path):
+        """The cached document of ``path`` if it is unchanged, else None (never parses).
+
+        Counts a hit or a miss like ``load``.
+        """
+        path = str(path)
+        st = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[:2] != (st.st_mtime_ns, st.st_size):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return entry[3]
+
+    def invalidate(self, path):
+        """Drop ``path`` from the cache"""
+        with self._lock:
+            entry = self._entries.pop(str(path), None)
+            if entry is not None:
+                self._bytes -= entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return CacheStats(self.hits, self.misses, self.evictions, len(self._entries), self._bytes, self.budget)
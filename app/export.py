@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""Streaming bulk export of tasks as NDJSON or as a ZIP of the raw files.
+
+NDJSON has one line per message, tagged with its task, file and index.
+Each line splices the message's stored JSON, read through the offset index,
+so no conversation is ever parsed or held whole.
+
+The ZIP archive stores the files uncompressed (they are served as they are
+on disk).  Its layout is computed up front from the files' names and sizes,
+so any byte range can be produced on its own: ``iter_bytes(start, stop)``
+seeks to the first file the range touches.  CRCs are computed just before
+each file is sent and memoized per file version, so resuming a download does
+not re-read what came before.  The archive's ETag covers every file's name,
+size and mtime, so an ``If-Range`` from a stale download gets the whole
+archive again.
+
+Also a command line tool working on the tasks directories directly:
+
+    python app/export.py --query "payment gateway" --since 2024-05-01 -o review.ndjson
+    python app/export.py --ids task-1 task-2 --format zip -o review.zip
+    python app/export.py --since 2024-05-01 --format zip -o review.zip --resume
+"""
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+
+from json_loader import loads
+from task_roots import SEPARATOR, TaskRoots, as_tasks_dir, configured_roots
+
+FORMATS = ("ndjson", "zip")
+
+# Task files exported as NDJSON, in this order
+MESSAGE_FILES = ("ui_messages", "api_conversation_history")
+
+# Messages read per batch for NDJSON, and bytes per read for the ZIP
+NDJSON_BATCH = 64
+CHUNK_SIZE = 1024 * 1024
+
+# CRCs remembered by (path, mtime_ns, size)
+MAX_CRCS = 100_000
+
+_LOCAL = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL = struct.Struct("<IHHHHHHIIIHHHHHII")
+_ZIP64_EXTRA = struct.Struct("<HHQ")
+_ZIP64_END = struct.Struct("<IQHHIIQQQQ")
+_ZIP64_LOCATOR = struct.Struct("<IIQI")
+_END = struct.Struct("<IHHHHIIH")
+
+# General purpose flag: names are UTF-8
+_UTF8 = 0x0800
+
+# A file of the archive: where its local header starts, and its version
+Member = namedtuple("Member", "name path size mtime_ns offset")
+
+
+class ExportError(OSError):
+    """A task file changed or vanished while it was being exported"""
+
+
+def parse_day(value, end=False):
+    """Epoch seconds of a local YYYY-MM-DD date (its end with ``end``) or ISO datetime.
+
+    Raises ValueError for anything else.
+    """
+    if len(value) == 10:
+        day = datetime.strptime(value, "%Y-%m-%d")
+        return (day + timedelta(days=1) if end else day).timestamp()
+    return datetime.fromisoformat(value).timestamp()
+
+
+def select_tasks(tasks, mtime, ids=None, matches=None, since=None, until=None):
+    """The tasks of ``tasks`` (kept in order) that pass every given filter.
+
+    ``ids`` and ``matches`` (e.g. search results) are collections of task
+    IDs; ``since`` and ``until`` bound ``mtime(tid)`` (epoch seconds,
+    ``until`` exclusive).
+    """
+    ids = set(ids) if ids else None
+    matches = set(matches) if matches is not None else None
+    selected = []
+    for tid in tasks:
+        if ids is not None and tid not in ids or matches is not None and tid not in matches:
+            continue
+        if since is not None or until is not None:
+            modified = mtime(tid)
+            if modified is None or since is not None and modified < since or until is not None and modified >= until:
+                continue
+        selected.append(tid)
+    return selected
+
+
+def ndjson_lines(tasks_dir, task_ids, offsets, files=MESSAGE_FILES):
+    """Yield NDJSON, a batch of lines at a time: one per message of each task file.
+
+    ``tasks_dir`` is a directory or a TaskRoots; ``offsets`` is an OffsetIndex.  A file that cannot be read as an array
+    yields one line with an ``error`` instead.
+    """
+    tasks_dir = as_tasks_dir(tasks_dir)
+    for tid in task_ids:
+        for file_type in files:
+            path = tasks_dir / tid / f"{file_type}.json"
+            if not path.exists():
+                continue
+            prefix = b'{"task":%s,"file":"%s","index":' % (json.dumps(tid).encode(), file_type.encode())
+            try:
+                with offsets.open(path) as messages:
+                    for start in range(0, len(messages), NDJSON_BATCH):
+                        lines = []
+                        for i, raw in enumerate(messages.raw(start, start + NDJSON_BATCH), start):
+                            if b"\n" in raw or b"\r" in raw:
+                                # Pretty-printed source: re-serialize onto one line
+                                raw = json.dumps(loads(raw)).encode()
+                            lines.append(b'%s%d,"message":%s}\n' % (prefix, i, raw))
+                        yield b"".join(lines)
+            except (OSError, ValueError) as e:
+                yield json.dumps({"task": tid, "file": file_type, "error": str(e)}).encode() + b"\n"
+
+
+def parse_range(header, size):
+    """(start, stop) of a single ``bytes=`` range of a ``size`` byte entity.
+
+    Returns None when the header should be ignored (absent, multiple ranges,
+    another unit); raises ValueError when the range cannot be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, sep, last = header[6:].strip().partition("-")
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            start, stop = max(0, size - int(last)), size
+        else:
+            start = int(first)
+            stop = min(size, int(last) + 1) if last else size
+    except ValueError:
+        return None
+    if not sep or start >= size or start >= stop:
+        raise ValueError(f"range not satisfiable: {header}")
+    return start, stop
+
+
+def _dos_time(mtime_ns):
+    t = time.localtime(mtime_ns / 1e9)
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), \
+        ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+_crcs = OrderedDict()
+_crcs_lock = threading.Lock()
+
+
+def _file_crc(f, key):
+    """CRC-32 of the open file ``f``, memoized under ``key``"""
+    with _crcs_lock:
+        crc = _crcs.get(key)
+        if crc is not None:
+            _crcs.move_to_end(key)
+            return crc
+    f.seek(0)
+    crc = 0
+    for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+        crc = zlib.crc32(chunk, crc)
+    with _crcs_lock:
+        _crcs[key] = crc
+        while len(_crcs) > MAX_CRCS:
+            _crcs.popitem(last=False)
+    return crc
+
+
+class ZipExport:
+    """A ZIP archive of every file of the given tasks, producible by byte range"""
+
+    def __init__(self, tasks_dir, task_ids):
+        tasks_dir = as_tasks_dir(tasks_dir)
+        self.members = []
+        offset = 0
+        for tid in task_ids:
+            try:
+                entries = sorted(os.scandir(tasks_dir / tid), key=lambda e: e.name)
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                if st.st_size >= 0xFFFFFFFF:
+                    raise ValueError(f"{entry.path} is too large for the archive")
+                # A qualified task ID becomes a directory per root
+                name = f"{tid.replace(SEPARATOR, '/')}/{entry.name}"
+                self.members.append(Member(name, entry.path, st.st_size, st.st_mtime_ns, offset))
+                offset += _LOCAL.size + len(name.encode("utf-8")) + st.st_size
+        self.central_offset = offset
+        self.central_size = sum(_CENTRAL.size + len(m.name.encode("utf-8")) +
+                                (_ZIP64_EXTRA.size if m.offset >= 0xFFFFFFFF else 0) for m in self.members)
+        self.zip64 = (len(self.members) >= 0xFFFF or self.central_offset >= 0xFFFFFFFF or
+                      self.central_size >= 0xFFFFFFFF)
+        self.size = self.central_offset + self.central_size + _END.size + \
+            (_ZIP64_END.size + _ZIP64_LOCATOR.size if self.zip64 else 0)
+        digest = hashlib.sha1()
+        for m in self.members:
+            digest.update(f"{m.name}\0{m.size}\0{m.mtime_ns}\n".encode("utf-8"))
+        self.etag = f'"zip-{digest.hexdigest()[:32]}"'
+
+    def _open(self, member):
+        """Open a member's file, checking it is still the version laid out"""
+        try:
+            f = open(member.path, "rb")
+        except OSError as e:
+            raise ExportError(f"{member.name} vanished during the export: {e}") from e
+        st = os.fstat(f.fileno())
+        if (st.st_size, st.st_mtime_ns) != (member.size, member.mtime_ns):
+            f.close()
+            raise ExportError(f"{member.name} changed during the export")
+        return f
+
+    def _crc(self, member, f=None):
+        if f is not None:
+            return _file_crc(f, (member.path, member.mtime_ns, member.size))
+        with self._open(member) as f:
+            return _file_crc(f, (member.path, member.mtime_ns, member.size))
+
+    def iter_bytes(self, start=0, stop=None):
+        """Yield bytes [start, stop) of the archive.
+
+        Raises ExportError (mid-stream) if a file changed since the layout was
+        computed; the bytes sent so far are then all the client gets.
+        """
+        stop = self.size if stop is None else min(stop, self.size)
+
+        def clip(data, offset):
+            lo, hi = max(start - offset, 0), min(stop - offset, len(data))
+            return data[lo:hi] if lo < hi else b""
+
+        for m in self.members:
+            name = m.name.encode("utf-8")
+            data_offset = m.offset + _LOCAL.size + len(name)
+            if data_offset + m.size <= start:
+                continue
+            if m.offset >= stop:
+                return
+            with self._open(m) as f:
+                time_, date = _dos_time(m.mtime_ns)
+                header = _LOCAL.pack(0x04034B50, 20, _UTF8, 0, time_, date, self._crc(m, f),
+                                     m.size, m.size, len(name), 0) + name
+                part = clip(header, m.offset)
+                if part:
+                    yield part
+                lo, hi = max(start - data_offset, 0), min(stop - data_offset, m.size)
+                f.seek(lo)
+                while lo < hi:
+                    chunk = f.read(min(CHUNK_SIZE, hi - lo))
+                    if not chunk:
+                        raise ExportError(f"{m.name} was truncated during the export")
+                    lo += len(chunk)
+                    yield chunk
+
+        # Central directory and end records
+        offset = self.central_offset
+        for m in self.members:
+            name = m.name.encode("utf-8")
+            size = _CENTRAL.size + len(name) + (_ZIP64_EXTRA.size if m.offset >= 0xFFFFFFFF else 0)
+            if offset + size > start and offset < stop:
+                time_, date = _dos_time(m.mtime_ns)
+                extra = _ZIP64_EXTRA.pack(1, 8, m.offset) if m.offset >= 0xFFFFFFFF else b""
+                version = 45 if extra else 20
+                # Made by Unix (3), so the external attributes are a file mode
+                record = _CENTRAL.pack(0x02014B50, (3 << 8) | version, version, _UTF8, 0, time_, date, self._crc(m),
+                                       m.size, m.size, len(name), len(extra), 0, 0, 0, 0o100644 << 16,
+                                       min(m.offset, 0xFFFFFFFF)) + name + extra
+                part = clip(record, offset)
+                if part:
+                    yield part
+            offset += size
+        trailer = b""
+        count = len(self.members)
+        if self.zip64:
+            trailer += _ZIP64_END.pack(0x06064B50, _ZIP64_END.size - 12, 45, 45, 0, 0, count, count,
+                                       self.central_size, self.central_offset)
+            trailer += _ZIP64_LOCATOR.pack(0x07064B50, 0, self.central_offset + self.central_size, 1)
+        trailer += _END.pack(0x06054B50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+                             min(self.central_size, 0xFFFFFFFF), min(self.central_offset, 0xFFFFFFFF), 0)
+        part = clip(trailer, offset)
+        if part:
+            yield part
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ids", nargs="+", help="task IDs to export")
+    parser.add_argument("--query", help="export tasks whose title matches this search")
+    parser.add_argument("--since", help="modified on or after this date (YYYY-MM-DD or ISO datetime)")
+    parser.add_argument("--until", help="modified before this date's end (YYYY-MM-DD) "
+                                        "or before this ISO datetime (exclusive)")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("-o", "--output", help="file to write (default: stdout)")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue a partial ZIP in --output if it matches the current archive")
+    parser.add_argument("--tasks-dir", action="append", metavar="[LABEL=]DIR",
+                        help="tasks directory (repeatable; default: $ROO_BROWSER_TASK_ROOTS, else auto-detected)")
+    args = parser.parse_args()
+
+    from offset_index import OffsetIndex
+    from search_index import TitleSearchIndex
+
+    try:
+        since = parse_day(args.since) if args.since else None
+        until = parse_day(args.until, end=True) if args.until else None
+    except ValueError as e:
+        parser.error(f"invalid date: {e}")
+
+    roots = TaskRoots(configured_roots(args.tasks_dir))
+    roots.start()
+    tasks = roots.tasks()
+    matches = None
+    if args.query:
+        # Titles come from each root's index, which may still be catching up in the background
+        while roots.index.progress():
+            time.sleep(0.1)
+        titles = TitleSearchIndex()
+        titles.update_many(roots.index.titles(tasks))
+        matches = titles.search(args.query, roots.ranks())
+
+    selected = select_tasks(tasks, roots.mtime, args.ids, matches, since, until)
+    print(f"Exporting {len(selected)} tasks", file=sys.stderr)
+
+    if args.format == "ndjson":
+        chunks, start, mode = ndjson_lines(roots, selected, OffsetIndex()), 0, "wb"
+    else:
+        archive = ZipExport(roots, selected)
+        start, mode = 0, "wb"
+        if args.resume and args.output and os.path.exists(args.output):
+            # Resume only if the partial file ends with the same bytes the archive has there
+            have = min(os.path.getsize(args.output), archive.size)
+            with open(args.output, "rb") as f:
+                f.seek(max(0, have - 4096))
+                tail = f.read(have - max(0, have - 4096))
+            if b"".join(archive.iter_bytes(max(0, have - 4096), have)) == tail:
+                start, mode = have, "r+b"
+            else:
+                print("Partial archive does not match, starting over", file=sys.stderr)
+        chunks = archive.iter_bytes(start)
+
+    out = open(args.output, mode) if args.output else sys.stdout.buffer
+    try:
+        if start:
+            out.seek(start)
+            out.truncate()
+            print(f"Resuming at byte {start:,}", file=sys.stderr)
+        for chunk in chunks:
+            out.write(chunk)
+    except ExportError as e:
+        sys.exit(f"Error exporting tasks: {e}")
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
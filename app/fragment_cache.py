@@ -0,0 +1,96 @@
+"""Cache of rendered HTML fragments, validated by strong ETags.
+
+A task view is a pure function of the request parameters and the task files
+it reads.  ``fragment_etag`` derives a strong ETag from exactly those inputs
+(file identity is (mtime_ns, size)), so the server can answer
+``If-None-Match`` with 304 before rendering anything, and ``FragmentCache``
+keeps the rendered markup per ETag in an LRU bounded by its size in bytes.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from doc_cache import CacheStats
+
+# Default budget (ROO_BROWSER_FRAGMENT_CACHE_MB overrides it)
+DEFAULT_BUDGET_MB = 64
+
+
+def default_budget():
+    """Byte budget from ROO_BROWSER_FRAGMENT_CACHE_MB, else DEFAULT_BUDGET_MB"""
+    try:
+        mb = float(os.environ.get("ROO_BROWSER_FRAGMENT_CACHE_MB", DEFAULT_BUDGET_MB))
+    except ValueError:
+        mb = DEFAULT_BUDGET_MB
+    return int(mb * 1024 * 1024)
+
+
+def file_identity(path):
+    """(mtime_ns, size) of ``path``, or None if it does not exist"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def fragment_etag(key, paths):
+    """Strong ETag for ``key`` (any repr-able value) rendered from ``paths``"""
+    state = repr((key, [file_identity(p) for p in paths]))
+    return '"' + hashlib.blake2b(state.encode("utf-8"), digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """True if an If-None-Match header value lists ``etag`` (or is ``*``)"""
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+class FragmentCache:
+    """LRU of rendered HTML strings keyed by ETag, bounded by total size"""
+
+    def __init__(self, budget=None):
+        self.budget = default_budget() if budget is None else budget
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, etag):
+        with self._lock:
+            html = self._entries.get(etag)
+            if html is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(etag)
+            self.hits += 1
+            return html
+
+    def put(self, etag, html):
+        cost = len(html)
+        if cost > self.budget:
+            return
+        with self._lock:
+            old = self._entries.pop(etag, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[etag] = html
+            self._bytes += cost
+            while self._bytes > self.budget:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return CacheStats(self.hits, self.misses, self.evictions, len(self._entries), self._bytes, self.budget)
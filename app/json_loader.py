@@ -0,0 +1,86 @@
+"""Load JSON files by decoding straight from a memory map.
+
+``json.load(open(path))`` reads the whole file into a ``str`` (and, on the
+way, a ``bytes`` buffer of the same size) before the decoder builds the
+object graph.  ``load_json`` maps the file instead and decodes from the
+mapping: orjson reads the mapped bytes in place, and the stdlib fallback
+decodes the mapping into one ``str`` without an intermediate ``bytes`` copy.
+The mapped pages belong to the OS page cache, not the process heap, and are
+unmapped as soon as the document is built.
+
+orjson is optional and used when installed (ROO_BROWSER_JSON_DECODER=json
+forces the stdlib).  It rejects some input ``json`` accepts (NaN, Infinity),
+so a document it refuses is decoded again with ``json``: both decoders
+accept the same files and raise ``json.JSONDecodeError``.  (orjson may
+return integers beyond 64 bits as floats; Roo's files have none.)
+
+Mapping is safe because Roo never truncates a task file in place: it writes
+a temporary file and renames it over the old one, so the inode mapped here
+keeps its contents while it is read.  A writer that did truncate in place
+would make touching the lost pages fault (SIGBUS); ROO_BROWSER_MMAP=0 reads
+files into memory instead.
+"""
+import json
+import mmap
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+USE_MMAP = os.environ.get("ROO_BROWSER_MMAP", "1").lower() not in ("0", "false", "no")
+
+
+def _decode_json(buf):
+    # str(buffer, encoding) decodes without copying the buffer into bytes first
+    return json.loads(str(buf, "utf-8"))
+
+
+def _decode_orjson(buf):
+    try:
+        return orjson.loads(buf)
+    except orjson.JSONDecodeError:
+        return _decode_json(buf)
+
+
+DECODERS = {"json": _decode_json}
+if orjson is not None:
+    DECODERS["orjson"] = _decode_orjson
+
+
+def default_decoder():
+    """Decoder name from ROO_BROWSER_JSON_DECODER, else the fastest installed"""
+    name = os.environ.get("ROO_BROWSER_JSON_DECODER", "").lower()
+    if name in DECODERS:
+        return name
+    if name:
+        print(f"Error selecting JSON decoder {name!r}: use one of {', '.join(DECODERS)}")
+    return "orjson" if orjson is not None else "json"
+
+
+DECODER = default_decoder()
+
+
+def loads(buf, decoder=None):
+    """Parse a JSON document from bytes or a buffer with decoder ``decoder`` (default: DECODER)"""
+    return DECODERS[decoder or DECODER](buf)
+
+
+def load_json(path, decoder=None, use_mmap=None):
+    """Parse the JSON document in ``path``.
+
+    ``decoder`` names an entry of DECODERS (default: DECODER); ``use_mmap``
+    defaults to USE_MMAP.  Raises ``OSError`` / ``ValueError``
+    (``json.JSONDecodeError``, ``UnicodeDecodeError``) like ``json.load`` on
+    a text file.
+    """
+    decode = DECODERS[decoder or DECODER]
+    use_mmap = USE_MMAP if use_mmap is None else use_mmap
+    with open(path, "rb") as f:
+        if not use_mmap or os.fstat(f.fileno()).st_size == 0:
+            # mmap() refuses empty files; let the decoder report them
+            return decode(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                return decode(view)
@@ -0,0 +1,182 @@
+"""Incremental readers for the top-level JSON arrays Roo writes.
+
+Both ``ui_messages.json`` and ``api_conversation_history.json`` hold a single
+JSON array.  The helpers here decode the leading elements of such an array
+while reading only as much of the file as they need, so e.g. a task title
+costs the same for a 50 MB conversation as for a 5 KB one.  ``element_offsets``
+finds where every element of such an array starts and ends in one pass, so
+single elements can later be read by seeking.
+"""
+import codecs
+import json
+import re
+from array import array
+
+from json_loader import load_json
+
+# First read size; doubled on every retry so long first elements stay O(n)
+CHUNK_SIZE = 64 * 1024
+
+# Give up on the prefix reader (and let callers fall back) past this point
+MAX_PREFIX_BYTES = 16 * 1024 * 1024
+
+_WHITESPACE = " \t\r\n"
+
+# Window of the file element_offsets() decodes at a time (grown for longer elements)
+SCAN_WINDOW = 1024 * 1024
+
+_SPACE = re.compile(r"[ \t\r\n]*")
+
+
+class PrefixUnavailable(ValueError):
+    """The requested elements could not be decoded from the start of the file"""
+
+
+def _skip_ws(buf, idx):
+    while idx < len(buf) and buf[idx] in _WHITESPACE:
+        idx += 1
+    return idx
+
+
+def read_head(path, count=1, chunk_size=CHUNK_SIZE, max_bytes=MAX_PREFIX_BYTES):
+    """Return up to ``count`` leading elements of the JSON array in ``path``.
+
+    Only the bytes needed to decode those elements are read.  Raises
+    ``PrefixUnavailable`` if the file is not an array, is malformed before the
+    requested elements end, or needs more than ``max_bytes`` to decode them.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = None  # index just after '[' or the last ','
+    items = []
+    total = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            total += len(chunk)
+            eof = not chunk
+            try:
+                buf += utf8.decode(chunk, final=eof)
+            except UnicodeDecodeError as e:
+                raise PrefixUnavailable(str(e)) from e
+            chunk_size *= 2
+
+            while True:
+                if pos is None:
+                    idx = _skip_ws(buf, 0)
+                    if idx == len(buf):
+                        break
+                    if buf[idx] != "[":
+                        raise PrefixUnavailable("top-level value is not an array")
+                    pos = idx + 1
+                idx = _skip_ws(buf, pos)
+                if idx == len(buf):
+                    break
+                if items:
+                    # Between elements: expect ',' or the end of the array
+                    if buf[idx] == "]":
+                        return items
+                    if buf[idx] != ",":
+                        raise PrefixUnavailable(f"unexpected {buf[idx]!r} at offset {idx}")
+                    idx = _skip_ws(buf, idx + 1)
+                    if idx == len(buf):
+                        break
+                elif buf[idx] == "]":
+                    return items
+                try:
+                    value, end = decoder.raw_decode(buf, idx)
+                except json.JSONDecodeError:
+                    break
+                # Only accept the value once the following delimiter is visible:
+                # a number cut at the chunk edge ("-25" of "-2500.0") still decodes
+                if not eof:
+                    nxt = _skip_ws(buf, end)
+                    if nxt == len(buf) or buf[nxt] not in ",]":
+                        break
+                items.append(value)
+                if len(items) >= count:
+                    return items
+                pos = end
+
+            if eof:
+                raise PrefixUnavailable("unexpected end of file")
+            if total > max_bytes:
+                raise PrefixUnavailable(f"first elements exceed {max_bytes} bytes")
+
+
+def read_first_element(path):
+    """Return the first element of the JSON array in ``path`` (None if empty).
+
+    Uses the bounded prefix reader and falls back to a full parse when the
+    prefix cannot be decoded; a full parse of a malformed file raises.
+    """
+    try:
+        head = read_head(path, 1)
+    except PrefixUnavailable:
+        data = load_json(path)
+        head = data[:1] if isinstance(data, list) else []
+    return head[0] if head else None
+
+
+def element_offsets(buf, window=SCAN_WINDOW, start=None):
+    """Byte offsets of the elements of the JSON array in ``buf`` (bytes, or sliceable to bytes).
+
+    Returns an ``array('Q')`` of start, end pairs, one per element.  The
+    buffer is decoded as latin-1, one character per byte, so the positions
+    the C decoder reports are byte offsets (multi-byte UTF-8 never looks like
+    JSON syntax); each element is decoded once to find its end and dropped.
+    Only ``window`` bytes (or the longest element) are held at a time.  With
+    ``start`` (the end offset of an element) only the elements after it are
+    returned.  Raises ``ValueError`` if ``buf`` is not a well-formed array.
+    """
+    decoder = json.JSONDecoder()
+    size = len(buf)
+    offsets = array("Q")
+    base = start or 0
+    text = str(buf[base:base + window], "latin-1")
+    eof = base + len(text) >= size
+    idx = 0
+    expect_value = False
+    if start is None:
+        idx = _SPACE.match(text).end()
+        if text[idx:idx + 1] != "[":
+            raise ValueError("top-level value is not an array")
+        idx += 1
+        expect_value = True
+    while True:
+        idx = _SPACE.match(text, idx).end()
+        if idx < len(text):
+            if not expect_value:
+                if text[idx] == "]":
+                    return offsets
+                if text[idx] != ",":
+                    raise ValueError(f"expected ',' or ']' at offset {base + idx}")
+                idx += 1
+                expect_value = True
+                continue
+            if not offsets and start is None and text[idx] == "]":
+                return offsets
+            try:
+                _, end = decoder.raw_decode(text, idx)
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise ValueError(f"invalid element at offset {base + idx}: {e.msg}") from e
+            else:
+                # Accept it once the next delimiter is visible: a number cut
+                # at the window edge ("-25" of "-2500.0") still decodes
+                nxt = _SPACE.match(text, end).end()
+                if eof or nxt < len(text) and text[nxt] in ",]":
+                    offsets.append(base + idx)
+                    offsets.append(base + end)
+                    idx = end
+                    expect_value = False
+                    continue
+        if eof:
+            raise ValueError("unexpected end of file")
+        # Slide the window to ``idx``; an element longer than the window doubles it
+        grow = window if idx else 2 * len(text)
+        base += idx
+        text = str(buf[base:base + grow], "latin-1")
+        eof = base + len(text) >= size
+        idx = 0
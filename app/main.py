@@ -1,19 +1,164 @@
 #!/usr/bin/env python3
 from fasthtml.common import *
+import asyncio
 import json
-from pathlib import Path
 import os
 import re
+import functools
+import uuid
+from collections import namedtuple
+from contextlib import nullcontext
+from urllib.parse import urlencode
+from task_roots import ROOTS_ENV, TaskRoots, configured_roots
+from search_index import TitleSearchIndex
+from content_index import ContentIndex, MARK_START, MARK_END
+from usage_index import UsageIndex
+from export import FORMATS as EXPORT_FORMATS, ZipExport, ndjson_lines, parse_day, parse_range, select_tasks
+from doc_cache import DocumentCache
+from offset_index import OffsetIndex, MessageFile, TailFollower, RELOAD
+from fragment_cache import FragmentCache, fragment_etag, etag_matches
+from compression import CompressionMiddleware
+import markdown_render
+from workers import WorkerPool, RequestTimeout, env_number
+from metrics import ENABLED as METRICS_ENABLED, MetricsMiddleware, exposition, phase, timed
 
-# Path to Roo tasks directory
-TASKS_DIR = Path.home() / 'Library/Application Support/Code/User/globalStorage/rooveterinaryinc.roo-cline/tasks'
+if __name__ == "__main__":
+    # Handed on through the environment: the server imports this module again
+    import argparse
+    parser = argparse.ArgumentParser(description="Browse Roo Code tasks")
+    parser.add_argument("--tasks-dir", action="append", metavar="[LABEL=]DIR",
+                        help=f"a tasks directory to browse (repeatable; default: ${ROOTS_ENV}, else auto-detected)")
+    args = parser.parse_args()
+    if args.tasks_dir:
+        os.environ[ROOTS_ENV] = os.pathsep.join(args.tasks_dir)
+
+# Roo tasks directories (VS Code builds, profiles, synced homes), each with its
+# own watcher-maintained listing and metadata index, merged into one mtime-sorted
+# list; ``task_roots / tid`` is a task's directory
+task_roots = TaskRoots(configured_roots())
+
+# Display names for the two task files
+FILE_LABELS = {"ui_messages": "UI Messages", "api_conversation_history": "API Conversation History"}
+
+# Persistent metadata index (titles, first message, message counts), one database per root
+task_index = task_roots.index
+
+# Parsed task files shared by every loader, LRU within ROO_BROWSER_DOC_CACHE_MB
+doc_cache = DocumentCache()
+
+# Where each message of a task file starts and ends, so large files are paged
+# by seeking instead of parsing them whole
+offset_index = OffsetIndex()
+
+# Files at least this large (and not already parsed) are read through the offset index
+OFFSET_INDEX_BYTES = int(os.environ.get("ROO_BROWSER_OFFSET_INDEX_BYTES", 1024 * 1024))
+
+# Parsing or scanning a file gives its message count for free; each new file
+# version is stored once, whichever reader (view, content or usage indexer) got it
+doc_cache.subscribe(task_index.record_count)
+offset_index.subscribe(task_index.record_count)
+
+# Watcher-maintained, mtime-sorted task list shared by every route; each root's
+# metadata index re-reads only the tasks its deltas touch
+task_cache = task_roots
+
+# Token / n-gram index over titles for the sidebar search (same scores as fuzzy_match)
+title_index = TitleSearchIndex()
+
+def _update_title_index(delta):
+    """Re-index the titles of the tasks a delta touches"""
+    if delta.full:
+        title_index.clear()
+    for tid in delta.removed:
+        title_index.remove(tid)
+    title_index.update_many(task_index.titles(delta.added + delta.modified))
+
+task_cache.subscribe(_update_title_index)
+
+# A cold start indexes large task directories in the background; pick up
+# each batch of titles as it lands
+task_index.subscribe(lambda task_ids: title_index.update_many(task_index.titles(task_ids)))
+
+def _drop_removed_documents(delta):
+    """Free cached documents and offset indexes of deleted tasks"""
+    for tid in delta.removed:
+        for file_type in FILE_LABELS:
+            doc_cache.invalidate(task_roots / tid / f"{file_type}.json")
+            offset_index.invalidate(task_roots / tid / f"{file_type}.json")
+
+task_cache.subscribe(_drop_removed_documents)
+
+# Rendered task views, keyed by a strong ETag over the request and the files' identity
+fragment_cache = FragmentCache()
+
+# Full-text (FTS5) index over every message, refreshed per changed file in the background
+content_index = ContentIndex(task_roots)
+task_cache.subscribe(content_index.apply_delta)
+content_index.subscribe(task_index.record_count)
+
+# Token / cost rollups per task, day and model for the analytics page, refreshed in the background
+usage_index = UsageIndex(task_roots, documents=doc_cache)
+task_cache.subscribe(usage_index.apply_delta)
+
+# Messages rendered per request; further pages load as the reader scrolls
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Sidebar tasks rendered per request; further pages load as the sidebar scrolls
+TASK_PAGE_SIZE = 100
+
+# Blocking route work runs in bounded pools: heavy task views in one, cheap
+# list/search queries in another, so a huge render never queues a search
+render_pool = WorkerPool("render", env_number("ROO_BROWSER_RENDER_WORKERS", min(4, os.cpu_count() or 1), int),
+                         env_number("ROO_BROWSER_RENDER_TIMEOUT", 30.0))
+query_pool = WorkerPool("query", env_number("ROO_BROWSER_QUERY_WORKERS", 4, int),
+                        env_number("ROO_BROWSER_QUERY_TIMEOUT", 10.0))
+
+# Fields larger than this (serialized) are collapsed and fetched on demand
+LAZY_FIELD_BYTES = int(os.environ.get("ROO_BROWSER_LAZY_FIELD_BYTES", 16 * 1024))
+
+# Top-level arrays of messages: parsed documents or files read through the offset index
+MESSAGE_LISTS = (list, MessageFile)
+
+# Where a rendered value lives: JSON pointer ``path`` inside message ``index`` (-1: the whole file)
+FieldRef = namedtuple("FieldRef", "tid file index path")
+
+# Seconds between checks of a followed task file, and between keep-alive comments
+FOLLOW_INTERVAL = env_number("ROO_BROWSER_FOLLOW_INTERVAL", 1.0)
+FOLLOW_KEEPALIVE = 15.0
+
+# Stream whole files message by message instead of paging (ROO_BROWSER_STREAM=1)
+STREAM_VIEWS = os.environ.get("ROO_BROWSER_STREAM", "").lower() in ("1", "true", "yes")
+
+# Render Markdown and highlight code on the server instead of in the browser
+# (ROO_BROWSER_SERVER_MARKDOWN=1, needs the markdown and pygments packages)
+md_renderer = None
+if os.environ.get("ROO_BROWSER_SERVER_MARKDOWN", "").lower() in ("1", "true", "yes"):
+    if markdown_render.available():
+        md_renderer = markdown_render.MarkdownRenderer()
+    else:
+        print("Error enabling server-side Markdown: install the markdown and pygments packages")
+
+# gzip / brotli for responses over ROO_BROWSER_COMPRESS_MIN_BYTES (ROO_BROWSER_COMPRESS=0 disables)
+COMPRESS = os.environ.get("ROO_BROWSER_COMPRESS", "1").lower() not in ("0", "false", "no")
+
+# Per-request phase timing (Server-Timing) and route latency for /metrics (ROO_BROWSER_METRICS=1);
+# outermost, so the total covers compression too
+middleware = []
+if METRICS_ENABLED:
+    middleware.append(Middleware(MetricsMiddleware))
+if COMPRESS:
+    middleware.append(Middleware(CompressionMiddleware))
 
 # Initialize FastHTML app with markdown and syntax highlighting support
 app, rt = fast_app(
     pico=False,  # Disable Pico CSS for better control over styling
+    middleware=middleware or None,
     hdrs=(
-        MarkdownJS(),
-        HighlightJS(langs=['json', 'python', 'javascript', 'bash', 'markdown']),
+        *((Style(markdown_render.highlight_css()),) if md_renderer else (
+            MarkdownJS(),
+            HighlightJS(langs=['json', 'python', 'javascript', 'bash', 'markdown']),
+        )),
         # Add some custom styling
         Style("""
             body { 
@@ -84,6 +229,15 @@ app, rt = fast_app(
             .task-list { 
                 margin: 1rem 0;
             }
+            .task-root {
+                display: inline-block;
+                margin-right: 0.4rem;
+                padding: 0 0.35rem;
+                border-radius: 3px;
+                background: #e8eef7;
+                color: #345;
+                font-size: 0.75rem;
+            }
             .task-item { 
                 display: block; 
                 padding: 0.5rem 1rem;
@@ -187,6 +341,38 @@ app, rt = fast_app(
                 color: #333;
                 box-shadow: 0 1px 3px rgba(0,0,0,0.05);
             }
+            .message.target { box-shadow: 0 0 0 2px #9090ff; }
+            .follow-control {
+                float: right;
+                font-size: 0.85rem;
+                color: #555;
+            }
+            .page-loader {
+                display: block;
+                width: 100%;
+                padding: 0.5rem;
+                margin-bottom: 1rem;
+                text-align: center;
+                color: #777;
+                font-size: 0.85rem;
+            }
+            .lazy-field {
+                margin: 0.2rem 0;
+                padding: 0.2rem 0.6rem;
+                border: 1px dashed #aaa;
+                border-radius: 4px;
+                background-color: #f8f8f8;
+                color: #555;
+                font-size: 0.8rem;
+                cursor: pointer;
+            }
+            .timeout-notice {
+                padding: 0.5rem 1rem;
+                border: 1px solid #e0c060;
+                border-radius: 4px;
+                background-color: #fff8e0;
+                color: #555;
+            }
             .user-message { border-left: 4px solid #4d7cc3; }
             .assistant-message { border-left: 4px solid #45a175; }
             .message-content {
@@ -261,6 +447,66 @@ app, rt = fast_app(
             .search-container { 
                 margin-bottom: 1rem;
             }
+            .index-status {
+                margin-top: 0.4rem;
+                font-size: 0.8rem;
+                color: #777;
+            }
+            .analytics-link {
+                display: inline-block;
+                margin-top: 0.4rem;
+                font-size: 0.85rem;
+            }
+            /* Usage analytics page */
+            .usage-page { padding: 1rem 2rem; }
+            .usage-table {
+                border-collapse: collapse;
+                margin-bottom: 2rem;
+                font-size: 0.9rem;
+            }
+            .usage-table th, .usage-table td {
+                padding: 0.3rem 0.8rem;
+                border-bottom: 1px solid #eee;
+                text-align: right;
+            }
+            .usage-table th:first-child, .usage-table td:first-child {
+                text-align: left;
+                max-width: 40rem;
+                overflow: hidden;
+                text-overflow: ellipsis;
+                white-space: nowrap;
+            }
+            .search-mode {
+                display: block;
+                margin-top: 0.4rem;
+                font-size: 0.85rem;
+                color: #555;
+                cursor: pointer;
+            }
+            /* Message content search results */
+            .task-item.content-hit {
+                display: block;
+                max-height: none;
+            }
+            .hit-title {
+                font-weight: bold;
+                overflow: hidden;
+                text-overflow: ellipsis;
+                white-space: nowrap;
+            }
+            .hit-location {
+                font-size: 0.8rem;
+                color: #777;
+            }
+            .hit-snippet {
+                font-size: 0.85rem;
+                color: #444;
+                word-break: break-word;
+            }
+            .hit-snippet mark {
+                background-color: #fff3a0;
+                padding: 0 1px;
+            }
             #search-input {
                 width: 100%;
                 padding: 0.5rem 1rem;
@@ -379,182 +625,98 @@ panel_resize_js = Script("""
     });
 """)
 
+# Live follow: splice messages pushed by /task/{tid}/{file}/follow into the view
+follow_js = Script("""
+    function rooFollow(box) {
+        if (window.rooFollowSource) {
+            window.rooFollowSource.close();
+            window.rooFollowSource = null;
+        }
+        localStorage.setItem('followTasks', box.checked ? '1' : '');
+        if (!box.checked) return;
+        const source = new EventSource(box.dataset.url);
+        window.rooFollowSource = source;
+        source.addEventListener('messages', function(e) {
+            if (!document.body.contains(box)) {
+                source.close();
+                return;
+            }
+            const template = document.createElement('template');
+            template.innerHTML = e.data;
+            for (const msg of Array.from(template.content.children)) {
+                const old = document.getElementById(msg.id);
+                const previous = document.getElementById('msg-' + (parseInt(msg.id.slice(4)) - 1));
+                if (old) {
+                    old.replaceWith(msg);
+                } else if (previous) {
+                    // Only once the tail is shown; otherwise the page loaders fetch it
+                    previous.after(msg);
+                } else {
+                    continue;
+                }
+                htmx.process(msg);
+                msg.scrollIntoView({block: 'end'});
+            }
+        });
+        source.addEventListener('reload', function() {
+            source.close();
+            if (document.body.contains(box)) htmx.ajax('GET', box.dataset.reload, '#task-content');
+        });
+    }
+""")
+
+@timed("task_dirs")
 def get_task_dirs():
     """Get all task directories sorted by modification time (newest first)"""
-    if not TASKS_DIR.exists():
-        return []
-    
-    tasks = []
-    try:
-        for item in TASKS_DIR.iterdir():
-            if item.is_dir():
-                # Get the modification time for sorting
-                try:
-                    mtime = item.stat().st_mtime
-                    tasks.append((item.name, mtime))
-                except Exception:
-                    # If stat fails, still include but with old timestamp
-                    tasks.append((item.name, 0))
-    except Exception as e:
-        # Handle permission errors or other issues
-        print(f"Error scanning tasks directory: {e}")
-        return []
-    
-    # Sort by modification time (newest first)
-    tasks.sort(key=lambda x: x[1], reverse=True)
-    return [t[0] for t in tasks]
+    return task_cache.tasks()
+
+@timed("task_dirs")
+def get_task_page(cursor=None, limit=TASK_PAGE_SIZE):
+    """Get one page of get_task_dirs() after ``cursor``, and the cursor of the next page"""
+    return task_cache.page(cursor, limit)
 
+@timed("task_title")
 def get_task_title(task_id):
     """Get the task title from the first entry in ui_messages.json"""
-    task_dir = TASKS_DIR / task_id
-    ui_file = task_dir / "ui_messages.json"
-    
-    default_title = f"Task: {task_id}"
-    
-    if not ui_file.exists():
-        return default_title
-    
-    try:
-        with open(ui_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            
-        if isinstance(data, list) and data and isinstance(data[0], dict):
-            # Look for text field in the first entry
-            text_keys = ["text", "content", "message"]
-            for key in text_keys:
-                if key in data[0] and isinstance(data[0][key], str):
-                    # Get a much longer title without truncation
-                    title = data[0][key].strip()
-                    # Only truncate extremely long titles
-                    if len(title) > 300:
-                        title = title[:297] + "..."
-                    return title
-                    
-    except Exception as e:
-        print(f"Error getting task title: {e}")
-    
-    return default_title
+    meta = task_index.get(task_id)
+    if meta is None:
+        return f"Task: {task_id}"
+    return meta["title"]
 
-def fuzzy_match(text, query):
-    """Word-component-based matching algorithm focused on semantic relevance"""
-    if not query or not text:
-        return False, 0
-    
-    # Normalize both query and text
-    query = query.lower().strip()
-    text = text.lower().strip()
-    
-    # Exact match has highest score
-    if query == text:
-        return True, 1.0
-    
-    # Contains full query is next best
-    if query in text:
-        return True, 0.95
-    
-    # Split into component words
-    query_words = query.split()
-    text_words = text.split()
-    
-    # If query is just one word
-    if len(query_words) == 1:
-        # Check for exact word match
-        if query in text_words:
-            return True, 0.9
-        
-        # Check for word prefix (starts with)
-        for word in text_words:
-            if word.startswith(query) and len(query) >= 3:
-                # The longer the query, the higher the score
-                return True, 0.7 + min(0.2, len(query) / len(word) * 0.2)
-        
-        # Check for substring in words (must be at least 4 chars to be meaningful)
-        if len(query) >= 4:
-            for word in text_words:
-                if query in word and len(word) > len(query):
-                    return True, 0.6
-        
-        # No meaningful match
-        return False, 0
-    
-    # For multi-word queries, track how many query words match
-    matched_words = 0
-    partial_matches = 0
-    
-    for q_word in query_words:
-        # Skip very short words (like "a", "of", etc.)
-        if len(q_word) <= 2:
-            continue
-            
-        word_matched = False
-        
-        # Check for exact word matches
-        if q_word in text_words:
-            matched_words += 1
-            word_matched = True
-            continue
-        
-        # Check for partial word matches (prefixes)
-        for t_word in text_words:
-            if t_word.startswith(q_word) and len(q_word) >= 3:
-                partial_matches += 0.5
-                word_matched = True
-                break
-        
-        if word_matched:
-            continue
-            
-        # If still no match, and the word is significant (4+ chars)
-        # check if it appears as substring in any word
-        if len(q_word) >= 4:
-            for t_word in text_words:
-                if q_word in t_word and len(t_word) > len(q_word):
-                    partial_matches += 0.3
-                    break
-    
-    # Calculate total number of significant words in query
-    significant_words = sum(1 for w in query_words if len(w) > 2)
-    
-    if significant_words == 0:
-        return False, 0
-    
-    # Calculate match score
-    total_match = matched_words + partial_matches
-    score = total_match / significant_words
-    
-    # Must match at least 50% of significant words to be considered a match
-    if score < 0.5:
-        return False, 0
-        
-    return True, min(score, 0.9)  # Cap at 0.9 for non-exact matches
+def root_badge(tid):
+    """The label of the root a task comes from, unless it is the first root"""
+    root, _ = task_roots.resolve(tid)
+    return Span(root.label, cls="task-root") if root.prefix else None
 
-def render_task_list(tasks, query="", selected_task=None):
-    """Render the list of tasks, optionally filtered by query"""
+def task_list_page(query="", cursor=None, offset=0, selected_task=None, client=None):
+    """One page of sidebar task items plus a loader for the next page, if any.
+
+    The plain list pages by mtime cursor (see TaskListCache.page); search
+    results, ordered by score, page by offset.  ``client`` lets the title
+    index refine that client's previous query instead of starting over.
+    """
     if query:
-        # Fuzzy matching with scoring
-        matched_tasks = []
-        for task in tasks:
-            title = get_task_title(task)
-            is_match, score = fuzzy_match(title, query)
-            if is_match:
-                matched_tasks.append((task, score))
-        
-        # Sort by match score (best matches first)
-        matched_tasks.sort(key=lambda x: x[1], reverse=True)
-        tasks = [t[0] for t in matched_tasks]
-    
-    if not tasks:
-        return [P("No tasks found.", cls="no-tasks")]
+        # Fuzzy matching via the title index: best matches first, ties in
+        # task list (mtime) order
+        stop = offset + TASK_PAGE_SIZE
+        matches = title_index.search(query, task_cache.ranks(), limit=stop + 1, client=client)
+        tasks = matches[offset:stop]
+        next_params = {"q": query, "offset": stop} if len(matches) > stop else None
+    else:
+        tasks, next_cursor = get_task_page(cursor)
+        next_params = {"cursor": next_cursor} if next_cursor else None
     
     task_items = []
+    titles = task_index.titles(tasks)
     
     for task in tasks:
-        title = get_task_title(task)
+        title = titles[task]
         is_active = task == selected_task
         active_class = " active" if is_active else ""
         
         task_items.append(
             A(
+                root_badge(task),
                 title,
                 hx_get=f"/load_task/{task}",
                 hx_target="#task-content",
@@ -564,33 +726,170 @@ def render_task_list(tasks, query="", selected_task=None):
             )
         )
     
+    if next_params:
+        # Fetched once it scrolls into view inside the sidebar
+        task_items.append(Div(
+            "Loading more tasks...",
+            hx_get=f"/task_page?{urlencode(next_params)}",
+            hx_trigger="intersect once",
+            hx_swap="outerHTML",
+            cls="page-loader"
+        ))
+    return task_items
+
+def render_task_list(query="", selected_task=None, client=None):
+    """Render the first page of the task list, optionally filtered by query"""
+    task_items = task_list_page(query, selected_task=selected_task, client=client)
+    if not task_items:
+        return [P("No tasks found.", cls="no-tasks")]
     return [Div(*task_items, cls="task-list")]
 
+def highlight_snippet(snippet):
+    """Turn an FTS snippet with highlight markers into text and Mark() parts"""
+    parts = []
+    for i, chunk in enumerate(snippet.split(MARK_START)):
+        if i == 0:
+            parts.append(chunk)
+            continue
+        marked, _, rest = chunk.partition(MARK_END)
+        parts.append(Mark(marked))
+        if rest:
+            parts.append(rest)
+    return parts
+
+def render_content_results(query):
+    """Render message content search hits with task title, location and snippet"""
+    if not query.strip():
+        return render_task_list()
+    
+    hits = content_index.search(query)
+    status = []
+    pending = content_index.pending()
+    if pending:
+        status.append(P(f"Indexing {pending} tasks, results may be incomplete.", cls="no-tasks"))
+    
+    if not hits:
+        return status + [P("No messages found.", cls="no-tasks")]
+    
+    titles = task_index.titles({hit.tid for hit in hits})
+    hit_items = []
+    for hit in hits:
+        hit_items.append(
+            A(
+                Div(root_badge(hit.tid), titles[hit.tid], cls="hit-title"),
+                Div(f"{FILE_LABELS.get(hit.file, hit.file)} · Message {hit.index + 1}", cls="hit-location"),
+                Div(*highlight_snippet(hit.snippet), cls="hit-snippet"),
+                hx_get=f"/load_task/{hit.tid}?file={hit.file}&at={hit.index}",
+                hx_target="#task-content",
+                hx_push_url=f"/task/{hit.tid}",
+                cls="task-item content-hit"
+            )
+        )
+    
+    return status + [Div(*hit_items, cls="task-list")]
+
+def search_box():
+    """Search input with a toggle between title and message content search"""
+    return Div(
+        Input(
+            placeholder="Search tasks...",
+            id="search-input",
+            name="q",
+            hx_get=search,
+            hx_target="#tasks-container",
+            hx_trigger="keyup changed delay:300ms",
+            hx_include="#search-mode",
+        ),
+        Label(
+            Input(
+                type="checkbox",
+                id="search-mode",
+                name="mode",
+                value="content",
+                hx_get=search,
+                hx_target="#tasks-container",
+                hx_trigger="change",
+                hx_include="#search-input",
+            ),
+            " Search message contents",
+            cls="search-mode"
+        ),
+        index_status_bar(),
+        cls="search-container"
+    )
+
+def index_status_bar(finished=False):
+    """Progress of a background indexing run, polled until it is done"""
+    progress = task_index.progress()
+    if progress is not None:
+        done, total = progress
+        return Div(
+            f"Indexing tasks... {done:,} / {total:,}",
+            id="index-status",
+            hx_get=index_status,
+            hx_trigger="every 1s",
+            hx_swap="outerHTML",
+            cls="index-status"
+        )
+    if finished:
+        # Indexing just ended: reload the list with the final titles
+        return Div(
+            id="index-status",
+            hx_get=search,
+            hx_trigger="load",
+            hx_target="#tasks-container",
+            hx_include="#search-input, #search-mode"
+        )
+    return Div(id="index-status")
+
+def in_pool(pool):
+    """Make a blocking route handler async by running it in ``pool`` with the pool's timeout"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def handler(*args, **kwargs):
+            try:
+                return await pool.run(fn, *args, **kwargs)
+            except RequestTimeout as e:
+                print(f"Error serving request: {e}")
+                return timeout_notice(kwargs.get("req"))
+        return handler
+    return decorator
+
+def timeout_notice(req):
+    """Shown when a request times out; the work carries on and fills the caches"""
+    retry = None
+    if req is not None:
+        url = req.url.path + (f"?{req.url.query}" if req.url.query else "")
+        if req.headers.get("HX-Request"):
+            retry = Button("Retry", hx_get=url, hx_target="closest .timeout-notice", hx_swap="outerHTML")
+        else:
+            retry = A("Retry", href=url)
+    return Div(
+        P("This is taking longer than expected. It is still being prepared in the background."),
+        retry,
+        cls="timeout-notice"
+    )
+
 @rt
-def index():
+@in_pool(query_pool)
+def index(req):
     """Home page with split layout"""
-    tasks = get_task_dirs()
-    
+    return index_page()
+
+def index_page():
+    """Render the main page with the first page of the task list"""
     return Titled(
         "Roo Task Browser",
         panel_resize_js,
+        follow_js,
         Div(
             # Left sidebar
             Div(
                 H2("Search Tasks"),
+                search_box(),
+                A("Usage analytics", href="/analytics", cls="analytics-link"),
                 Div(
-                    Input(
-                        placeholder="Search tasks...",
-                        id="search-input",
-                        name="q",
-                        hx_get=search,
-                        hx_target="#tasks-container",
-                        hx_trigger="keyup changed delay:300ms",
-                    ),
-                    cls="search-container"
-                ),
-                Div(
-                    *render_task_list(tasks),
+                    *render_task_list(),
                     id="tasks-container"
                 ),
                 Div(cls="resize-handle", id="resize-handle"),  # Add resize handle element
@@ -612,33 +911,23 @@ def index():
     )
 
 @rt("/task/{tid}")
-def task_route(tid: str):
+@in_pool(query_pool)
+def task_route(req, tid: str):
     """Direct route to a specific task"""
-    tasks = get_task_dirs()
-    
     # Check if task exists
-    task_dir = TASKS_DIR / tid
-    if not task_dir.exists() or not task_dir.is_dir():
+    if not task_cache.has_task(tid):
         return Titled(
             "Task Not Found",
             panel_resize_js,
+            follow_js,
             Div(
                 # Left sidebar
                 Div(
                     H2("Search Tasks"),
+                    search_box(),
+                    A("Usage analytics", href="/analytics", cls="analytics-link"),
                     Div(
-                        Input(
-                            placeholder="Search tasks...",
-                            id="search-input",
-                            name="q",
-                            hx_get=search,
-                            hx_target="#tasks-container",
-                            hx_trigger="keyup changed delay:300ms",
-                        ),
-                        cls="search-container"
-                    ),
-                    Div(
-                        *render_task_list(tasks),
+                        *render_task_list(),
                         id="tasks-container"
                     ),
                     Div(cls="resize-handle", id="resize-handle"),  # Add resize handle element
@@ -657,55 +946,162 @@ def task_route(tid: str):
         )
     
     # Redirect to index with the task loaded via HTMX
-    return index()
+    return index_page()
+
+def usage_table(title, label, rows, names=None):
+    """One analytics table: a row per group (day, week, model or task) with its totals"""
+    def cells(row):
+        return (Td(f"{row.requests:,}"), Td(f"{row.tokens_in:,}"), Td(f"{row.tokens_out:,}"),
+                Td(f"{row.cache_writes:,}"), Td(f"{row.cache_reads:,}"), Td(f"${row.cost:,.2f}"))
+    
+    body = []
+    for row in rows:
+        if names is None:
+            first = Td(row.key)
+        else:
+            # Task rows link to the task
+            first = Td(A(names[row.key], href=f"/task/{row.key}", title=names[row.key]))
+        body.append(Tr(first, *cells(row)))
+    return Div(
+        H2(title),
+        Table(
+            Thead(Tr(Th(label), Th("Requests"), Th("Tokens in"), Th("Tokens out"),
+                     Th("Cache writes"), Th("Cache reads"), Th("Cost"))),
+            Tbody(*body) if body else Tbody(Tr(Td("No usage recorded yet."))),
+            cls="usage-table"
+        )
+    )
+
+@rt
+@in_pool(query_pool)
+def analytics(req):
+    """Token and cost totals by day, week and model, and the most expensive tasks"""
+    totals = usage_index.totals()
+    top = usage_index.top_tasks(20)
+    status = []
+    pending = usage_index.pending()
+    if pending:
+        status.append(P(f"Indexing usage of {pending:,} tasks, totals may be incomplete.", cls="no-tasks"))
+    return Titled(
+        "Usage Analytics",
+        Div(
+            A("← Back to tasks", href="/"),
+            *status,
+            P(f"{totals.requests:,} API requests · {totals.tokens_in:,} tokens in · "
+              f"{totals.tokens_out:,} tokens out · ${totals.cost:,.2f}"),
+            usage_table("By day", "Day", usage_index.by_day(30)),
+            usage_table("By week", "Week of", usage_index.by_week(12)),
+            usage_table("By model", "Model", usage_index.by_model()),
+            usage_table("Most expensive tasks", "Task", top, task_index.titles(row.key for row in top)),
+            cls="usage-page"
+        )
+    )
 
 @rt
-def search(q: str = ""):
+async def index_status():
+    """Polled by the sidebar while tasks are being indexed"""
+    return index_status_bar(finished=True)
+
+@rt
+@in_pool(query_pool)
+def search(req, session, q: str = "", mode: str = ""):
     """Search tasks and return filtered list"""
-    tasks = get_task_dirs()
-    return Div(*render_task_list(tasks, q), id="tasks-container")
+    if mode == "content":
+        return Div(*render_content_results(q), id="tasks-container")
+    return Div(*render_task_list(q, client=search_client(session)), id="tasks-container")
+
+def search_client(session):
+    """Stable ID for this browser, so each keystroke's search can refine the last one"""
+    return session.setdefault("search_client", uuid.uuid4().hex)
+
+@rt
+@in_pool(query_pool)
+def task_page(req, session, cursor: str = "", q: str = "", offset: int = 0):
+    """Next page of the sidebar task list, requested as the reader scrolls"""
+    try:
+        return tuple(task_list_page(q, cursor or None, max(0, offset), client=search_client(session)))
+    except ValueError:
+        return P("Invalid page cursor.", cls="no-tasks")
+
+class Rendered(Safe):
+    """Pre-rendered markup that FastHTML still wraps in a full page for non-HTMX requests"""
+    def __ft__(self):
+        return Safe(self)
+
+def cached_view(req, key, paths, render):
+    """Serve ``render()`` (a pure function of ``key`` and ``paths``) with a strong ETag.
+
+    Answers 304 when the client already holds the current version and reuses
+    the markup rendered for an earlier identical request.
+    """
+    options = (STREAM_VIEWS, md_renderer is not None, LAZY_FIELD_BYTES)
+    # HTMX swaps a bare fragment, but a history restore gets the full page
+    variant = (req.headers.get("HX-Request"), req.headers.get("HX-History-Restore-Request"))
+    etag = fragment_etag((key, options, variant), paths)
+    # Lower-case "vary" replaces FastHTML's default one instead of repeating it
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "vary": "HX-Request, HX-History-Restore-Request"}
+    if etag_matches(req.headers.get("If-None-Match"), etag):
+        return Response(status_code=304, headers=headers)
+    html = fragment_cache.get(etag)
+    if html is None:
+        tree = render()
+        with phase("serialize"):
+            html = to_xml(tree)
+        fragment_cache.put(etag, html)
+    return (Rendered(html),) + tuple(HttpHeader(k, v) for k, v in headers.items())
 
 @rt("/load_task/{tid}")
-def load_task(tid: str):
-    """Load a task and show its content"""
-    task_dir = TASKS_DIR / tid
-    
-    if not task_dir.exists() or not task_dir.is_dir():
+@in_pool(render_pool)
+def load_task(req, tid: str, file: str = "", at: int = -1):
+    """Load a task and show its content, optionally jumping to message ``at`` of ``file``"""
+    if not task_cache.has_task(tid):
         return Div(
             H1("Task Not Found"),
             P(f"Task '{tid}' not found.")
         )
     
     # Check which files exist
+    task_dir = task_roots / tid
     ui_file = task_dir / "ui_messages.json"
     api_file = task_dir / "api_conversation_history.json"
     
-    ui_exists = ui_file.exists()
-    api_exists = api_file.exists()
-    
-    # Get task title
-    title = get_task_title(tid)
+    # Get task title and the full text of the first message for the text box
+    meta = task_index.get(tid)
+    title = meta["title"] if meta else f"Task: {tid}"
+    first_text = meta["first_text"] if meta else ""
+    # Known once either file has been parsed or scanned
+    counts = (meta["ui_count"], meta["api_count"]) if meta else (None, None)
     
-    # Get the full text of the first message for the text box
-    full_text = ""
-    if ui_exists:
-        try:
-            with open(ui_file, 'r', encoding='utf-8') as f:
-                ui_data = json.load(f)
-                if isinstance(ui_data, list) and ui_data and isinstance(ui_data[0], dict):
-                    for key in ["text", "content", "message"]:
-                        if key in ui_data[0] and isinstance(ui_data[0][key], str):
-                            full_text = ui_data[0][key].strip()
-                            break
-        except Exception as e:
-            print(f"Error loading task text: {e}")
+    return cached_view(req, ("load_task", tid, file, at, title, first_text, counts), (ui_file, api_file),
+                       lambda: render_task(tid, file, at, title, first_text, counts))
+
+def tab_label(file_type, count):
+    """A file tab's label, with its message count when the index knows it"""
+    label = FILE_LABELS[file_type]
+    return label if count is None else f"{label} ({count:,})"
+
+def render_task(tid, file, at, title, first_text, counts=(None, None)):
+    """Render the task header, tabs and the active file's first page"""
+    task_dir = task_roots / tid
+    ui_exists = (task_dir / "ui_messages.json").exists()
+    api_exists = (task_dir / "api_conversation_history.json").exists()
+    full_text = first_text if ui_exists else ""
     
     # Default to ui_messages.json content
-    content = None
-    if ui_exists:
-        content = load_file_content(tid, "ui_messages")
+    active_file = None
+    if file == "ui_messages" and ui_exists or file == "api_conversation_history" and api_exists:
+        active_file = file
+    elif ui_exists:
+        active_file = "ui_messages"
     elif api_exists:
-        content = load_file_content(tid, "api_conversation_history")
+        active_file = "api_conversation_history"
+    
+    content = None
+    if active_file and STREAM_VIEWS and not (active_file == file and at >= 0):
+        # Let the viewer stream the file in a separate request
+        content = Div(hx_get=f"/task/{tid}/{active_file}", hx_trigger="load", hx_swap="outerHTML")
+    elif active_file:
+        content = load_file_content(tid, active_file, at=at if active_file == file else -1)
     
     return Div(
         # Title limited to 2 lines
@@ -722,18 +1118,18 @@ def load_task(tid: str):
             # Tabs for switching between files
             Div(
                 Button(
-                    "UI Messages", 
+                    tab_label("ui_messages", counts[0]),
                     hx_get=f"/task/{tid}/ui_messages",
                     hx_target="#file-content",
                     disabled=not ui_exists,
-                    cls=f"tab{' active' if ui_exists else ''}"
+                    cls=f"tab{' active' if active_file == 'ui_messages' else ''}"
                 ),
                 Button(
-                    "API Conversation History", 
+                    tab_label("api_conversation_history", counts[1]),
                     hx_get=f"/task/{tid}/api_conversation_history",
                     hx_target="#file-content",
                     disabled=not api_exists,
-                    cls=f"tab{' active' if not ui_exists and api_exists else ''}"
+                    cls=f"tab{' active' if active_file == 'api_conversation_history' else ''}"
                 ),
                 cls="tab-container"
             ),
@@ -748,21 +1144,49 @@ def load_task(tid: str):
         )
     )
 
-def load_file_content(tid, file_type):
-    """Helper to load and render file content"""
-    task_dir = TASKS_DIR / tid
+@timed("load_file")
+def load_file_content(tid, file_type, offset=0, limit=PAGE_SIZE, at=-1, older=False, stream=False):
+    """Helper to load and render one page of file content.
+
+    The first page (offset 0) comes back wrapped in a Div for #file-content.
+    Follow-up pages requested by a page loader (``offset`` > 0 or ``older``)
+    are returned as bare fragments that replace the loader.  ``at`` renders
+    the page containing that message and scrolls to it.  With ``stream`` every
+    message from ``offset`` on is streamed instead.
+    """
+    task_dir = task_roots / tid
     file_path = task_dir / f"{file_type}.json"
     
     if not file_path.exists():
         return P(f"File not found: {file_type}.json")
     
     try:
-        # Load JSON content
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        if stream:
+            # Load JSON content (shared, must not be mutated)
+            with phase("parse"):
+                data = doc_cache.load(file_path)
+            # Each message is rendered in render_pool, under its worker limit and timeout
+            return StreamingResponse(render_pool.iterate(stream_messages(data, file_type, offset, tid=tid)),
+                                     media_type="text/html; charset=utf-8")
         
-        # Render based on file type
-        return render_messages(data, file_type)
+        with open_messages(file_path) as data:
+            # Render based on file type
+            limit = max(1, min(limit, MAX_PAGE_SIZE))
+            follow = (follow_control(tid, file_type, len(data)),) if isinstance(data, MESSAGE_LISTS) else ()
+            if at >= 0:
+                offset = at - at % limit
+                return Div(
+                    *follow,
+                    *render_page(data, file_type, tid, offset, limit, before=True),
+                    Script(f"""
+                        const target = document.getElementById('msg-{at}');
+                        if (target) {{ target.classList.add('target'); target.scrollIntoView({{block: 'start'}}); }}
+                    """)
+                )
+            if offset > 0 or older:
+                return tuple(render_page(data, file_type, tid, offset, limit, before=older, after=not older))
+            parts = render_page(data, file_type, tid, 0, limit)
+            return Div(*follow, *parts) if follow or len(parts) > 1 else parts[0]
         
     except json.JSONDecodeError:
         return Div(
@@ -772,8 +1196,54 @@ def load_file_content(tid, file_type):
     except Exception as e:
         return Div(P(f"Error loading file: {str(e)}"))
 
-def format_message_content(content):
+def follow_control(tid, file_type, count):
+    """"Follow live" toggle: streams the messages written after the ``count`` shown"""
+    return Label(
+        Input(type="checkbox", id="follow-toggle", onchange="rooFollow(this)",
+              data_url=f"/task/{tid}/{file_type}/follow?count={count}",
+              data_reload=f"/load_task/{tid}?file={file_type}"),
+        " Follow live",
+        # Keep following across views once switched on
+        Script("""
+            (function() {
+                const box = document.getElementById('follow-toggle');
+                if (localStorage.getItem('followTasks') === '1') {
+                    box.checked = true;
+                    rooFollow(box);
+                }
+            })();
+        """),
+        cls="follow-control"
+    )
+
+def open_messages(file_path):
+    """Context manager giving the messages of a task file.
+
+    Documents already in the cache, and small files, are used parsed whole;
+    larger files come through the offset index, so only the messages a page
+    shows are read and decoded.
+    """
+    with phase("parse"):
+        if file_path.stat().st_size < OFFSET_INDEX_BYTES:
+            return nullcontext(doc_cache.load(file_path))
+        # peek() counts the miss that sends the file to the offset index
+        data = doc_cache.peek(file_path)
+        if data is None:
+            try:
+                return offset_index.open(file_path)
+            except ValueError:
+                # Not a JSON array: the full parse handles or reports it
+                data = doc_cache.load(file_path)
+    return nullcontext(data)
+
+def format_message_content(content, ref=None):
     """Format message content with markdown rendering if needed"""
+    # Collapse huge content; it is fetched by ``ref`` when expanded
+    if ref is not None:
+        size = field_size(content, LAZY_FIELD_BYTES)
+        if size > LAZY_FIELD_BYTES:
+            return lazy_field(ref, content, size if isinstance(content, str) else None, mode="content")
+    
     # Check if content looks like markdown (contains common markdown characters)
     if not isinstance(content, str):
         return P(str(content), cls="message-content")
@@ -808,7 +1278,7 @@ def format_message_content(content):
                             if field is not None:
                                 items.append(field)
                     else:
-                        items.append(Pre(Code(json.dumps(item, indent=2), cls="language-json")))
+                        items.append(code_block(json.dumps(item, indent=2)))
                 return Div(*items, cls="message-content")
         except json.JSONDecodeError:
             # Not valid JSON, continue with normal processing
@@ -817,6 +1287,8 @@ def format_message_content(content):
     md_indicators = ['#', '```', '*', '_', '- ', '1. ', '|', '[', '![']
     is_markdown = any(indicator in content for indicator in md_indicators)
     
+    if is_markdown and md_renderer:
+        return Div(Safe(md_renderer.markdown(content)), cls="message-content")
     if is_markdown:
         # Render as markdown
         return Div(content, cls="marked message-content")
@@ -824,8 +1296,112 @@ def format_message_content(content):
         # Plain text
         return P(content, cls="message-content")
 
-def render_field(name, value):
-    """Render a single JSON field with proper formatting"""
+def code_block(text, language="json"):
+    """A code block, highlighted on the server or left to highlight.js"""
+    if md_renderer:
+        return Safe(md_renderer.code(text, language))
+    return Pre(Code(text, cls=f"language-{language}"))
+
+def child_ref(ref, key):
+    """FieldRef of ``key`` inside the value at ``ref`` (None stays None)"""
+    return ref._replace(path=ref.path + (key,)) if ref is not None else None
+
+def field_size(value, limit=None):
+    """Estimated compact JSON size of a value, counted only until it passes ``limit``.
+
+    Strings count their length; the estimate ignores escapes.  Past
+    ``limit`` the result is just some size over it, so a huge value costs
+    no more than one at the limit.
+    """
+    if isinstance(value, str):
+        return len(value)
+    size = 0
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            size += len(item) + 2
+        elif isinstance(item, dict):
+            # Braces, then '"key": ' and ', ' around the pushed keys and values
+            size += 2 + max(0, 4 * len(item) - 2)
+            if limit is None or size <= limit:
+                stack.extend(str(key) for key in item)
+                stack.extend(item.values())
+        elif isinstance(item, list):
+            size += 2 + max(0, 2 * len(item) - 2)
+            if limit is None or size <= limit:
+                stack.extend(item)
+        else:
+            size += len(str(item))
+        if limit is not None and size > limit:
+            break
+    return size
+
+def format_size(size):
+    """Human-readable size, e.g. 12.3 KB"""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024 or unit == "MB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def json_pointer(path):
+    """RFC 6901 JSON pointer for a sequence of keys / indexes"""
+    return "".join("/" + str(part).replace("~", "~0").replace("/", "~1") for part in path)
+
+def resolve_pointer(doc, pointer):
+    """Follow an RFC 6901 JSON pointer; raises LookupError if it does not resolve"""
+    if not pointer:
+        return doc
+    if not pointer.startswith("/"):
+        raise LookupError(f"Invalid JSON pointer: {pointer}")
+    for part in pointer[1:].split("/"):
+        part = part.replace("~1", "/").replace("~0", "~")
+        if isinstance(doc, list):
+            if not part.isdigit():
+                raise LookupError(f"Invalid array index: {part}")
+            doc = doc[int(part)]
+        elif isinstance(doc, dict):
+            doc = doc[part]
+        else:
+            raise LookupError(f"Cannot descend into {type(doc).__name__} at {part}")
+    return doc
+
+def lazy_field(ref, value, size, mode="field"):
+    """Placeholder button that swaps in the full value from the field route
+
+    ``size`` is None when only known to be over LAZY_FIELD_BYTES.
+    """
+    if isinstance(value, dict):
+        kind = f"object, {len(value)} key{'s' if len(value) != 1 else ''}"
+    elif isinstance(value, list):
+        kind = f"array, {len(value)} item{'s' if len(value) != 1 else ''}"
+    else:
+        kind = "text"
+    shown = format_size(size) if size is not None else f"over {format_size(LAZY_FIELD_BYTES)}"
+    query = urlencode({"i": ref.index, "ptr": json_pointer(ref.path), "mode": mode})
+    return Button(
+        f"Show {kind} ({shown})",
+        hx_get=f"/task/{ref.tid}/{ref.file}/field?{query}",
+        hx_swap="outerHTML",
+        cls="lazy-field"
+    )
+
+def render_field_value(value):
+    """The expanded form of a field collapsed by render_field()"""
+    if isinstance(value, str):
+        return Div(value, cls="long-text")
+    return Div(
+        code_block(json.dumps(value, indent=2, ensure_ascii=False)),
+        cls="field-value-complex"
+    )
+
+@timed("render_field")
+def render_field(name, value, ref=None):
+    """Render a single JSON field with proper formatting.
+
+    With ``ref`` (where the value lives in its file) values larger than
+    LAZY_FIELD_BYTES are rendered as a placeholder that loads on demand.
+    """
     # Skip empty image arrays
     if name == "images" and isinstance(value, list) and len(value) == 0:
         return None
@@ -850,7 +1426,7 @@ def render_field(name, value):
                 # Render each field in the nested object
                 for key, nested_value in value.items():
                     # Use indentation to show hierarchy
-                    nested_field = render_field(key, nested_value)
+                    nested_field = render_field(key, nested_value, child_ref(ref, key))
                     if nested_field is not None:
                         fields.append(Div(nested_field, style="margin-left: 1rem;"))
                         
@@ -874,18 +1450,27 @@ def render_field(name, value):
                     
                     # Render each field in the dictionary
                     for key, nested_value in value.items():
-                        nested_field = render_field(key, nested_value)
+                        nested_field = render_field(key, nested_value, child_ref(ref, key))
                         if nested_field is not None:
                             fields.append(Div(nested_field, style="margin-left: 1rem;"))
                             
                     return Div(*fields, cls="json-field")
                     
+            # Large values are only serialized when the reader expands them
+            if ref is not None:
+                if field_size(value, LAZY_FIELD_BYTES) > LAZY_FIELD_BYTES:
+                    return Div(
+                        Div(name + ":", cls="field-name"),
+                        lazy_field(ref, value, None),
+                        cls="json-field"
+                    )
+            
             # Default JSON rendering for other complex types
             pretty_value = json.dumps(value, indent=2, ensure_ascii=False)
             return Div(
                 Div(name + ":", cls="field-name"),
                 Div(
-                    Pre(Code(pretty_value, cls="language-json")),
+                    code_block(pretty_value),
                     cls="field-value-complex"
                 ),
                 cls="json-field"
@@ -898,6 +1483,12 @@ def render_field(name, value):
                 cls="json-field"
             )
     elif isinstance(value, str):
+        if ref is not None and len(value) > LAZY_FIELD_BYTES:
+            return Div(
+                Div(name + ":", cls="field-name"),
+                lazy_field(ref, value, len(value)),
+                cls="json-field"
+            )
         if len(value) > 80:
             # Long string with special formatting
             return Div(
@@ -920,14 +1511,55 @@ def render_field(name, value):
             cls="json-field"
         )
 
-def render_messages(data, file_type):
-    """Render messages from JSON data with improved formatting"""
-    result = []
+def page_loader(tid, file_type, offset, limit, older=False):
+    """Placeholder that swaps itself for another page of messages"""
+    url = f"/task/{tid}/{file_type}?offset={offset}&limit={limit}"
+    if older:
+        return Button(
+            "Load earlier messages",
+            hx_get=url + "&older=true",
+            hx_swap="outerHTML",
+            cls="page-loader"
+        )
+    # Fetched automatically once scrolled into view
+    return Div(
+        "Loading more messages...",
+        hx_get=url,
+        hx_trigger="revealed",
+        hx_swap="outerHTML",
+        cls="page-loader"
+    )
+
+def render_page(data, file_type, tid, offset, limit, before=False, after=True):
+    """Render messages [offset, offset + limit) plus loaders for the neighbouring pages"""
+    if not isinstance(data, MESSAGE_LISTS) or not data:
+        return [render_messages(data, file_type, tid=tid)]
+    
+    offset = max(0, min(offset, len(data)))
+    stop = min(offset + limit, len(data))
+    parts = []
+    if before and offset > 0:
+        parts.append(page_loader(tid, file_type, max(0, offset - limit), limit, older=True))
+    parts.append(render_messages(data, file_type, offset, stop, tid))
+    if after and stop < len(data):
+        parts.append(page_loader(tid, file_type, stop, limit))
+    return parts
+
+def iter_messages(data, file_type, start=0, stop=None, tid=None):
+    """Yield one rendered component per message (or item) of JSON data.
+
+    For lists only items ``start`` to ``stop`` are rendered (numbered by their
+    position in the whole list).  With ``tid`` large fields are collapsed into
+    placeholders that load from /task/{tid}/{file}/field.
+    """
+    if isinstance(data, MESSAGE_LISTS):
+        stop = len(data) if stop is None else min(stop, len(data))
     
     # Check if this is a list-like structure with messages
-    if isinstance(data, list) and data and isinstance(data[0], dict):
+    if isinstance(data, MESSAGE_LISTS) and data and isinstance(data[0], dict):
         # Iterate through each item in the list
-        for i, msg in enumerate(data):
+        for i in range(start, stop):
+            msg = data[i]
             # Determine message class based on role/sender field
             role_key = next((k for k in ["role", "sender", "from"] if k in msg), None)
             role = msg.get(role_key, "unknown").lower() if role_key else "unknown"
@@ -939,6 +1571,7 @@ def render_messages(data, file_type):
             
             # Start building fields
             fields = []
+            ref = FieldRef(tid, file_type, i, ()) if tid else None
             
             # Message index/position with minimal vertical space
             fields.append(H4(f"Message {i+1}: {role.capitalize()}", style="margin: 0.15rem 0; padding: 0;"))
@@ -950,7 +1583,7 @@ def render_messages(data, file_type):
                     continue
                 
                 # Don't add empty images field
-                field = render_field(key, value)
+                field = render_field(key, value, child_ref(ref, key))
                 if field is not None:
                     fields.append(field)
             
@@ -959,65 +1592,291 @@ def render_messages(data, file_type):
                 fields.append(
                     Div(
                         H5("Content:", style="margin: 0.2rem 0 0.1rem 0; padding: 0;"),
-                        format_message_content(content),
+                        format_message_content(content, child_ref(ref, content_key)),
                         cls="message-content"
                     )
                 )
             
             # Add the complete message div (filter out None values)
-            result.append(
-                Div(
-                    *[f for f in fields if f is not None],
-                    cls=f"message {msg_class}"
-                )
+            yield Div(
+                *[f for f in fields if f is not None],
+                cls=f"message {msg_class}",
+                id=f"msg-{i}"
             )
     
-    # If we couldn't render as messages or if there were no messages
-    if not result:
-        # Format JSON as structured elements
-        if isinstance(data, list):
-            for i, item in enumerate(data):
-                if isinstance(item, dict):
-                    fields = [H4(f"Item {i+1}", style="margin: 0.15rem 0; padding: 0;")]
-                    for key, value in item.items():
-                        field = render_field(key, value)
-                        if field is not None:
-                            fields.append(field)
-                    result.append(Div(*fields, cls="message"))
-                else:
-                    result.append(
-                        Div(
-                            H4(f"Item {i+1}", style="margin: 0.15rem 0; padding: 0;"),
-                            Pre(Code(json.dumps(item, indent=2), cls="language-json")),
-                            cls="message"
-                        )
-                    )
-        elif isinstance(data, dict):
-            fields = [H4("JSON Object", style="margin: 0.15rem 0; padding: 0;")]
-            for key, value in data.items():
-                field = render_field(key, value)
-                if field is not None:
-                    fields.append(field)
-            result.append(Div(*fields, cls="message"))
-        else:
-            # Fallback for other types
-            pretty_json = json.dumps(data, indent=2, ensure_ascii=False)
-            result = [Pre(Code(pretty_json, cls="language-json"))]
-    
-    return Div(*result)
+    # If we couldn't render as messages, format JSON as structured elements
+    elif isinstance(data, MESSAGE_LISTS):
+        for i in range(start, stop):
+            item = data[i]
+            if isinstance(item, dict):
+                fields = [H4(f"Item {i+1}", style="margin: 0.15rem 0; padding: 0;")]
+                ref = FieldRef(tid, file_type, i, ()) if tid else None
+                for key, value in item.items():
+                    field = render_field(key, value, child_ref(ref, key))
+                    if field is not None:
+                        fields.append(field)
+                yield Div(*fields, cls="message", id=f"msg-{i}")
+            else:
+                yield Div(
+                    H4(f"Item {i+1}", style="margin: 0.15rem 0; padding: 0;"),
+                    code_block(json.dumps(item, indent=2)),
+                    cls="message",
+                    id=f"msg-{i}"
+                )
+    elif isinstance(data, dict):
+        fields = [H4("JSON Object", style="margin: 0.15rem 0; padding: 0;")]
+        ref = FieldRef(tid, file_type, -1, ()) if tid else None
+        for key, value in data.items():
+            field = render_field(key, value, child_ref(ref, key))
+            if field is not None:
+                fields.append(field)
+        yield Div(*fields, cls="message")
+    else:
+        # Fallback for other types
+        pretty_json = json.dumps(data, indent=2, ensure_ascii=False)
+        yield code_block(pretty_json)
+
+@timed("render_messages")
+def render_messages(data, file_type, start=0, stop=None, tid=None):
+    """Render messages from JSON data with improved formatting"""
+    return Div(*iter_messages(data, file_type, start, stop, tid))
+
+def stream_messages(data, file_type, start=0, tid=None):
+    """Yield the markup of render_messages(), serialized one message at a time.
+
+    Only the component tree of the message being sent is alive at any time,
+    so the first bytes leave immediately and memory stays flat.  Each message
+    is indented on its own rather than inside the wrapper Div, so only the
+    whitespace between tags differs.
+    """
+    yield "<div>\n"
+    for part in iter_messages(data, file_type, start, tid=tid):
+        yield to_xml(part)
+    yield "</div>\n"
 
 @rt("/task/{tid}/{file}")
-def view(tid: str, file: str):
-    """View a specific JSON file from a task"""
+@in_pool(render_pool)
+def view(req, tid: str, file: str, offset: int = 0, limit: int = PAGE_SIZE, at: int = -1, older: bool = False,
+         stream: bool = STREAM_VIEWS):
+    """View a specific JSON file from a task, one page of messages at a time (or streamed)"""
     # Validate file parameter
     if file not in ["ui_messages", "api_conversation_history"]:
         return Div(P(f"Invalid file type: {file}"))
+    if not task_cache.has_task(tid):
+        return Response(f"Unknown task: {tid}", status_code=404)
+    
+    stream = stream and at < 0 and not older
+    if stream:
+        return load_file_content(tid, file, offset, stream=True)
+    return cached_view(req, ("view", tid, file, offset, limit, at, older), (task_roots / tid / f"{file}.json",),
+                       lambda: load_file_content(tid, file, offset, limit, at, older))
+
+def sse_event(event, data):
+    """One Server-Sent Event; every line of ``data`` becomes a data: line"""
+    lines = data.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return f"event: {event}\n" + "".join(f"data: {line}\n" for line in lines) + "\n"
+
+def follow_step(follower, tid, file):
+    """One check of a followed file: None, RELOAD, or the new messages rendered"""
+    try:
+        change = follower.poll()
+    except OSError:
+        return RELOAD
+    if change is None or change is RELOAD:
+        return change
+    with change.messages as data:
+        return "".join(to_xml(part) for part in iter_messages(data, file, change.start, tid=tid))
+
+async def follow_events(follower, tid, file):
+    """Event stream of follow(): ``messages`` as they are written, ``reload`` when the file is rewritten"""
+    yield f"retry: {int(FOLLOW_INTERVAL * 5000)}\n\n"
+    quiet = 0.0
+    while True:
+        try:
+            update = await render_pool.run(follow_step, follower, tid, file)
+        except RequestTimeout as e:
+            print(f"Error following {tid}/{file}: {e}")
+            update = None
+        if update is RELOAD:
+            yield sse_event("reload", file)
+            return
+        if update:
+            yield sse_event("messages", update)
+            quiet = 0.0
+        elif quiet >= FOLLOW_KEEPALIVE:
+            # Comment line: keeps proxies from timing the stream out
+            yield ": keep-alive\n\n"
+            quiet = 0.0
+        await asyncio.sleep(FOLLOW_INTERVAL)
+        quiet += FOLLOW_INTERVAL
+
+@rt("/task/{tid}/{file}/follow")
+async def follow(tid: str, file: str, count: int = -1):
+    """Server-Sent Events with the messages appended to (or updated at the end of) a task file.
+
+    Each change is scanned from the last known message on (TailFollower) and
+    only the new messages are rendered; a rewritten file sends ``reload``.
+    """
+    if file not in FILE_LABELS or not task_cache.has_task(tid):
+        return Response(f"Unknown task file: {tid}/{file}", status_code=404)
+    follower = TailFollower(task_roots / tid / f"{file}.json", offset_index, count if count >= 0 else None)
+    return StreamingResponse(follow_events(follower, tid, file), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@rt("/task/{tid}/{file}/field")
+@in_pool(render_pool)
+def field(req, tid: str, file: str, i: int = -1, ptr: str = "", mode: str = ""):
+    """Expand a collapsed field: JSON pointer ``ptr`` into message ``i`` (-1: the whole file)"""
+    if file not in FILE_LABELS:
+        return Div(P(f"Invalid file type: {file}"))
+    if not task_cache.has_task(tid):
+        return Response(f"Unknown task: {tid}", status_code=404)
+    file_path = task_roots / tid / f"{file}.json"
+    
+    def render():
+        try:
+            with open_messages(file_path) as data:
+                value = resolve_pointer(data if i < 0 else data[i], ptr)
+        except (OSError, ValueError, LookupError, TypeError) as e:
+            return P(f"Error loading field: {e}")
+        if mode == "content":
+            return format_message_content(value)
+        return render_field_value(value)
+    
+    return cached_view(req, ("field", tid, file, i, ptr, mode), (file_path,), render)
+
+@rt("/task/{tid}/{file}/messages")
+@in_pool(render_pool)
+def messages(req, tid: str, file: str, start: int = 0, stop: int = -1, format: str = "html"):
+    """Messages [start, stop) of a task file (default: just ``start``), as HTML or raw JSON.
+
+    Reads only those messages' bytes through the offset index, so the cost
+    does not depend on the size of the file.
+    """
+    if file not in FILE_LABELS:
+        return Div(P(f"Invalid file type: {file}"))
+    if not task_cache.has_task(tid):
+        if format == "json":
+            return JSONResponse({"error": f"unknown task: {tid}"}, status_code=404)
+        return Response(f"Unknown task: {tid}", status_code=404)
+    file_path = task_roots / tid / f"{file}.json"
+    start = max(0, start)
+    stop = start + 1 if stop < 0 else min(max(stop, start), start + MAX_PAGE_SIZE)
     
-    return load_file_content(tid, file)
+    if format == "json":
+        # The stored JSON of each message, spliced into an array without decoding it
+        etag = fragment_etag(("messages", tid, file, start, stop), (file_path,))
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(req.headers.get("If-None-Match"), etag):
+            return Response(status_code=304, headers=headers)
+        try:
+            with phase("parse"), offset_index.open(file_path) as data:
+                body = b"[" + b",".join(data.raw(start, stop)) + b"]"
+        except (OSError, ValueError) as e:
+            return JSONResponse({"error": str(e)}, status_code=404 if isinstance(e, OSError) else 422)
+        return Response(body, media_type="application/json", headers=headers)
+    
+    def render():
+        try:
+            with phase("parse"), offset_index.open(file_path) as data:
+                if start >= len(data):
+                    return P(f"{FILE_LABELS[file]} has {len(data)} messages.", cls="no-tasks")
+                return render_messages(data, file, start, stop, tid)
+        except (OSError, ValueError) as e:
+            return P(f"Error loading messages: {e}")
+    
+    return cached_view(req, ("messages", tid, file, start, stop), (file_path,), render)
+
+def export_selection(ids, q, since, until):
+    """Task IDs (newest first) matching every given export filter; raises ValueError for a bad date"""
+    since = parse_day(since) if since else None
+    until = parse_day(until, end=True) if until else None
+    matches = title_index.search(q, task_cache.ranks()) if q.strip() else None
+    wanted = [tid for tid in re.split(r"[\s,]+", ids) if tid and task_cache.has_task(tid)] if ids.strip() else None
+    if wanted == []:
+        return []
+    return select_tasks(get_task_dirs(), task_cache.mtime, wanted, matches, since, until)
+
+@rt("/export")
+async def export_tasks(req, ids: str = "", q: str = "", since: str = "", until: str = "", format: str = "ndjson"):
+    """Stream the selected tasks (by ``ids``, title search ``q`` and/or date range) as NDJSON or ZIP.
+
+    Nothing is buffered: NDJSON splices each message's stored JSON, and the
+    ZIP is produced by byte range, so it also answers (resumed) Range requests.
+    """
+    if format not in EXPORT_FORMATS:
+        return Response(f"Unknown export format: {format}", status_code=400)
+    try:
+        selected = await query_pool.run(export_selection, ids, q, since, until)
+    except ValueError as e:
+        return Response(f"Invalid date: {e}", status_code=400)
+    except RequestTimeout as e:
+        print(f"Error selecting tasks to export: {e}")
+        return Response("Selecting tasks timed out, try again.", status_code=503)
+    
+    if format == "ndjson":
+        return StreamingResponse(render_pool.iterate(ndjson_lines(task_roots, selected, offset_index)),
+                                 media_type="application/x-ndjson",
+                                 headers={"Content-Disposition": 'attachment; filename="roo-tasks.ndjson"'})
+    
+    try:
+        archive = await query_pool.run(ZipExport, task_roots, selected)
+    except ValueError as e:
+        return Response(str(e), status_code=413)
+    except RequestTimeout as e:
+        print(f"Error listing tasks to export: {e}")
+        return Response("Listing the export timed out, try again.", status_code=503)
+    headers = {"Accept-Ranges": "bytes", "ETag": archive.etag,
+               "Content-Disposition": 'attachment; filename="roo-tasks.zip"'}
+    if_range = req.headers.get("If-Range")
+    try:
+        span = parse_range(req.headers.get("Range"), archive.size) if not if_range or if_range == archive.etag else None
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{archive.size}"})
+    start, stop = span or (0, archive.size)
+    headers["Content-Length"] = str(stop - start)
+    if span:
+        headers["Content-Range"] = f"bytes {start}-{stop - 1}/{archive.size}"
+    return StreamingResponse(render_pool.iterate(archive.iter_bytes(start, stop)), status_code=206 if span else 200,
+                             media_type="application/zip", headers=headers)
+
+def cache_metrics():
+    """Cache, pool and index gauges/counters for /metrics"""
+    caches = [("documents", doc_cache.stats()), ("fragments", fragment_cache.stats())]
+    samples = [
+        (f"cache_{field}{'_total' if kind == 'counter' else ''}", kind, f"Cache {field}",
+         [({"cache": name}, getattr(stats, field)) for name, stats in caches])
+        for field, kind in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"),
+                            ("entries", "gauge"), ("bytes", "gauge"), ("budget", "gauge"))
+    ]
+    if md_renderer:
+        samples.append(("markdown_cache_hits_total", "counter", "Markdown renders served from the memo", md_renderer.hits))
+        samples.append(("markdown_cache_misses_total", "counter", "Markdown renders computed", md_renderer.misses))
+    pools = (render_pool, query_pool)
+    samples += [
+        ("pool_pending", "gauge", "Jobs queued or running", [({"pool": p.name}, p.pending) for p in pools]),
+        ("pool_completed_total", "counter", "Jobs finished", [({"pool": p.name}, p.completed) for p in pools]),
+        ("pool_cancelled_total", "counter", "Jobs dropped at shutdown before they ran",
+         [({"pool": p.name}, p.cancelled) for p in pools]),
+        ("pool_timeouts_total", "counter", "Jobs that outlived their request timeout",
+         [({"pool": p.name}, p.timeouts) for p in pools]),
+        ("tasks", "gauge", "Tasks in the tasks directory", len(task_cache.tasks())),
+        ("content_index_pending", "gauge", "Tasks waiting for full-text indexing", content_index.pending()),
+        ("usage_index_pending", "gauge", "Tasks waiting for usage indexing", usage_index.pending()),
+        ("offset_index_scans_total", "counter", "Task files scanned for message offsets", offset_index.scans),
+        ("offset_index_entries", "gauge", "Files with message offsets held in memory", len(offset_index)),
+    ]
+    return samples
+
+@rt("/metrics")
+def metrics_endpoint():
+    """Prometheus metrics: route latency and phase totals (with ROO_BROWSER_METRICS=1) plus cache stats"""
+    return Response(exposition(cache_metrics()), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 # Start the server
 if __name__ == "__main__":
-    print(f"Scanning tasks in: {TASKS_DIR}")
+    for root in task_roots.roots:
+        print(f"Scanning tasks in: {root.path}" + (f" (as {root.prefix}<task>)" if root.prefix else ""))
     serve(port=5001)
 else:
     # When imported
@@ -0,0 +1,139 @@
+"""Optional server-side Markdown rendering and code highlighting.
+
+By default message content is shipped as Markdown source and rendered in
+the browser by marked.js and highlight.js, one block at a time, which can
+lock the tab for seconds on long conversations.  ``MarkdownRenderer`` does
+the same work on the server with Python-Markdown and Pygments and memoizes
+the HTML per content hash, so a block repeated across messages (tool
+results, re-sent files) is rendered once.
+
+Both libraries are optional; ``available()`` says whether this mode can be
+used.  Raw HTML inside messages is escaped rather than passed through, and
+links and images keep their URL only if it is relative or uses a scheme of
+SAFE_SCHEMES (no ``javascript:`` or ``data:`` URLs).
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from html import escape, unescape
+
+try:
+    import markdown
+except ImportError:
+    markdown = None
+
+try:
+    from pygments import highlight
+    from pygments.formatters import HtmlFormatter
+    from pygments.lexers import get_lexer_by_name
+    from pygments.util import ClassNotFound
+except ImportError:
+    highlight = None
+
+# Total size of memoized HTML kept in memory
+CACHE_BYTES = 32 * 1024 * 1024
+
+CSS_CLASS = "codehilite"
+
+EXTENSIONS = ["fenced_code", "codehilite", "tables", "sane_lists"]
+EXTENSION_CONFIGS = {"codehilite": {"css_class": CSS_CLASS, "guess_lang": False}}
+
+# URL schemes links and images may use; relative URLs and fragments are always allowed
+SAFE_SCHEMES = ("http", "https", "mailto")
+
+_SCHEME_RE = re.compile(r"([a-z][a-z0-9+.-]*):")
+# Browsers skip control characters and spaces inside a URL's scheme
+_IGNORED_RE = re.compile(r"[\x00-\x20\x7f]+")
+
+# Elements whose URL attribute is checked
+URL_ATTRIBUTES = {"a": "href", "img": "src"}
+
+
+def available():
+    """True if both Python-Markdown and Pygments are installed"""
+    return markdown is not None and highlight is not None
+
+
+def safe_url(url):
+    """True if ``url`` is relative (or a fragment) or uses one of SAFE_SCHEMES"""
+    match = _SCHEME_RE.match(_IGNORED_RE.sub("", unescape(url)).lower())
+    return match is None or match.group(1) in SAFE_SCHEMES
+
+
+class _UnsafeUrlFilter:
+    """Markdown treeprocessor removing link targets and image sources that fail ``safe_url``"""
+
+    def run(self, root):
+        for element in root.iter():
+            attribute = URL_ATTRIBUTES.get(element.tag)
+            if attribute in element.attrib and not safe_url(element.get(attribute)):
+                del element.attrib[attribute]
+
+
+def highlight_css(style="default"):
+    """Pygments stylesheet for the highlighted blocks"""
+    return HtmlFormatter(style=style).get_style_defs(f".{CSS_CLASS}")
+
+
+class MarkdownRenderer:
+    """Markdown -> HTML and code -> highlighted HTML, memoized by content hash"""
+
+    def __init__(self, cache_bytes=CACHE_BYTES):
+        self.cache_bytes = cache_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        # Markdown instances keep per-document state; one per thread
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+    def _markdown(self):
+        md = getattr(self._local, "md", None)
+        if md is None:
+            md = markdown.Markdown(extensions=EXTENSIONS, extension_configs=EXTENSION_CONFIGS)
+            # Show raw HTML in messages (e.g. <task> tags) as text
+            md.preprocessors.deregister("html_block")
+            md.inlinePatterns.deregister("html")
+            # Last, once links are built and escapes resolved
+            md.treeprocessors.register(_UnsafeUrlFilter(), "unsafe_urls", -10)
+            self._local.md = md
+        return md
+
+    def _memo(self, kind, text, render):
+        key = hashlib.blake2b(f"{kind}\0{text}".encode("utf-8"), digest_size=16).digest()
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return html
+            self.misses += 1
+        html = render()
+        with self._lock:
+            if key not in self._entries and len(html) <= self.cache_bytes:
+                self._entries[key] = html
+                self._bytes += len(html)
+                while self._bytes > self.cache_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= len(evicted)
+        return html
+
+    def markdown(self, text):
+        """Render Markdown to HTML with fenced code blocks highlighted"""
+        def render():
+            md = self._markdown()
+            md.reset()
+            return md.convert(text)
+        return self._memo("md", text, render)
+
+    def code(self, text, language="json"):
+        """Render a code block highlighted as ``language``"""
+        def render():
+            try:
+                lexer = get_lexer_by_name(language)
+            except ClassNotFound:
+                return f'<pre class="{CSS_CLASS}"><code>{escape(text, quote=False)}</code></pre>'
+            return highlight(text, lexer, HtmlFormatter(cssclass=CSS_CLASS))
+        return self._memo(f"code:{language}", text, render)
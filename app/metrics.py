@@ -0,0 +1,207 @@
+"""Per-request phase timing, ``Server-Timing`` headers and Prometheus metrics.
+
+With ROO_BROWSER_METRICS=1, hot functions decorated with ``timed(name)`` and
+blocks wrapped in ``phase(name)`` add their duration to the current request's
+phases.  ``MetricsMiddleware`` opens those phases per request, reports them
+in a ``Server-Timing`` header (visible in the browser's network panel) and
+feeds per-route latency histograms and phase totals for ``exposition()``.
+
+Disabled, ``timed`` returns the function unchanged, ``phase`` is a shared
+no-op context and the middleware is not installed, so nothing is measured.
+Phases are tracked through a context variable; ``WorkerPool`` copies the
+request's context into its threads.
+"""
+import contextvars
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+ENABLED = os.environ.get("ROO_BROWSER_METRICS", "").lower() in ("1", "true", "yes")
+
+# Upper bounds (seconds) of the request latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PREFIX = "roo_browser"
+
+_current = contextvars.ContextVar("roo_browser_phases", default=None)
+_NOOP = nullcontext()
+
+
+class Phases:
+    """Phase durations of one request: name -> [seconds, calls]"""
+
+    def __init__(self):
+        self.totals = {}
+        self.active = set()  # phases on the stack; nested (recursive) calls are not counted twice
+
+    def add(self, name, seconds):
+        entry = self.totals.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+    def header(self, total):
+        """``Server-Timing`` value; durations in milliseconds"""
+        parts = [f'{name};dur={seconds * 1000:.2f};desc="{calls}x"'
+                 for name, (seconds, calls) in self.totals.items()]
+        parts.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(parts)
+
+
+@contextmanager
+def _phase(phases, name):
+    phases.active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases.add(name, time.perf_counter() - start)
+        phases.active.discard(name)
+
+
+def timed(name):
+    """Decorator: count calls of the function as phase ``name`` of the current request"""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            phases = _current.get()
+            if phases is None or name in phases.active:
+                return fn(*args, **kwargs)
+            with _phase(phases, name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def phase(name):
+    """Context manager timing a block as phase ``name`` of the current request"""
+    phases = _current.get() if ENABLED else None
+    if phases is None or name in phases.active:
+        return _NOOP
+    return _phase(phases, name)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram"""
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += seconds
+        self.count += 1
+
+
+class Registry:
+    """Process-wide request histograms and phase totals"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}  # (method, route) -> Histogram
+        self.phases = {}  # name -> [seconds, calls]
+
+    def observe(self, method, route, seconds, phases):
+        with self._lock:
+            hist = self.requests.get((method, route))
+            if hist is None:
+                hist = self.requests[(method, route)] = Histogram()
+            hist.observe(seconds)
+            for name, (total, calls) in phases.totals.items():
+                entry = self.phases.setdefault(name, [0.0, 0])
+                entry[0] += total
+                entry[1] += calls
+
+
+registry = Registry()
+
+
+class MetricsMiddleware:
+    """ASGI middleware: per-request phases, ``Server-Timing`` and route latency"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        phases = Phases()
+        token = _current.set(phases)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                value = phases.header(time.perf_counter() - start).encode("latin-1")
+                message = dict(message, headers=list(message["headers"]) + [(b"server-timing", value)])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            # The route template, not the path, keeps the label set small
+            route = getattr(scope.get("route"), "path", "unmatched")
+            registry.observe(scope["method"], route, time.perf_counter() - start, phases)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def exposition(samples=()):
+    """Prometheus text format: request histograms, phase totals and ``samples``.
+
+    ``samples`` is an iterable of (name, type, help, value) where value is a
+    number or a list of (labels dict, number).
+    """
+    lines = []
+
+    def family(name, kind, help_text, values):
+        name = f"{PREFIX}_{name}"
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in values:
+            lines.append(f"{name}{_labels(labels)} {value}")
+
+    with registry._lock:
+        requests = [(key, list(h.counts), h.sum, h.count) for key, h in sorted(registry.requests.items())]
+        phases = sorted((name, tuple(entry)) for name, entry in registry.phases.items())
+
+    if requests:
+        name = f"{PREFIX}_request_duration_seconds"
+        lines.append(f"# HELP {name} Request latency by route")
+        lines.append(f"# TYPE {name} histogram")
+        for (method, route), counts, total, count in requests:
+            labels = {"method": method, "route": route}
+            cumulative = 0
+            for bound, n in zip(BUCKETS, counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels({**labels, 'le': f'{bound:g}'})} {cumulative}")
+            lines.append(f"{name}_bucket{_labels({**labels, 'le': '+Inf'})} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+    if phases:
+        family("phase_seconds_total", "counter", "Time spent in each request phase",
+               [({"phase": n}, float(s)) for n, (s, _) in phases])
+        family("phase_calls_total", "counter", "Timed calls of each request phase",
+               [({"phase": n}, c) for n, (_, c) in phases])
+
+    for name, kind, help_text, value in samples:
+        family(name, kind, help_text, value if isinstance(value, list) else [({}, value)])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,320 @@
+"""Byte-offset side index of the messages in task files.
+
+Jumping to message 2,500 of a large ``api_conversation_history.json`` should
+not parse the whole array.  ``OffsetIndex`` scans a file once
+(``json_stream.element_offsets``) and keeps where each element starts and
+ends, in memory and in a side file under the cache directory, until the
+file's mtime or size changes.  ``open()`` returns a ``MessageFile`` whose
+elements are read by seeking and decoded on access, so fetching one message
+costs the same whatever the size of the file.
+
+``TailFollower`` watches one file as Roo appends to it and re-scans only the
+tail after the last element known to be final.
+"""
+import hashlib
+import os
+import struct
+import threading
+from array import array
+from collections import OrderedDict, namedtuple
+from collections.abc import Sequence
+from pathlib import Path
+
+from json_loader import loads
+from json_stream import element_offsets
+from task_index import default_cache_dir
+
+# Offset arrays kept in memory (16 bytes per message)
+MAX_ENTRIES = 256
+
+# Side file header: format version, mtime_ns, size, element count
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<IqQQ")
+
+# Bytes before the resume point that must be unchanged for a rewrite to count as an append
+ANCHOR_BYTES = 4096
+
+# Messages ``start`` onwards of ``messages`` (an open MessageFile) are new or changed
+Change = namedtuple("Change", "messages start")
+
+# The file was rewritten, not appended to: show it again from scratch
+RELOAD = Change(None, 0)
+
+
+class MessageFile(Sequence):
+    """The elements of an open JSON array file, read and decoded on access.
+
+    Reads go to the file as opened, so a task file replaced meanwhile (Roo
+    writes a temporary file and renames it over the old one) does not shift
+    the offsets.  Use as a context manager, or ``close()`` it.
+    """
+
+    def __init__(self, f, offsets):
+        self._file = f
+        self._offsets = offsets
+        self._decoded = {}
+
+    def __len__(self):
+        return len(self._offsets) // 2
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("message index out of range")
+        if i not in self._decoded:
+            self._decoded[i] = loads(self.raw(i, i + 1)[0])
+        return self._decoded[i]
+
+    def raw(self, start, stop):
+        """The undecoded JSON of elements [start, stop), read in one go"""
+        start, stop, _ = slice(start, stop).indices(len(self))
+        if start >= stop:
+            return []
+        offsets = self._offsets
+        base = offsets[2 * start]
+        self._file.seek(base)
+        data = self._file.read(offsets[2 * stop - 1] - base)
+        return [data[offsets[2 * i] - base:offsets[2 * i + 1] - base] for i in range(start, stop)]
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _FileWindows:
+    """An open file as the ``buf[start:stop]`` reads element_offsets makes.
+
+    Only a scan window is in memory at a time, however large the file.
+    """
+
+    def __init__(self, f, size):
+        self._f = f
+        self._size = size
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, window):
+        self._f.seek(window.start)
+        return self._f.read(window.stop - window.start)
+
+
+class OffsetIndex:
+    """Element offsets of JSON array files, scanned once per file version"""
+
+    def __init__(self, cache_dir=None, max_entries=MAX_ENTRIES):
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir() / "offsets"
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # path -> (mtime_ns, size, offsets), least recently used first
+        self._entries = OrderedDict()
+        self.scans = 0
+        self._listeners = []
+
+    def _side_path(self, path):
+        return self.cache_dir / (hashlib.sha1(path.encode("utf-8")).hexdigest() + ".idx")
+
+    def open(self, path):
+        """Open ``path`` as a MessageFile, scanning it first if it changed.
+
+        Raises ``OSError``, or ``ValueError`` if the file is not a JSON array.
+        """
+        path = str(path)
+        f = open(path, "rb")
+        try:
+            st = os.fstat(f.fileno())
+            return MessageFile(f, self._offsets(path, f, st.st_mtime_ns, st.st_size))
+        except BaseException:
+            f.close()
+            raise
+
+    def _offsets(self, path, f, mtime_ns, size):
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[:2] == (mtime_ns, size):
+                self._entries.move_to_end(path)
+                return entry[2]
+
+        offsets = self._read_side_file(path, mtime_ns, size)
+        if offsets is None:
+            # Scan outside the lock; concurrent misses on one file may both scan
+            offsets = element_offsets(_FileWindows(f, size))
+            self.scans += 1
+            self._write_side_file(path, mtime_ns, size, offsets)
+        self.put(path, mtime_ns, size, offsets)
+        return offsets
+
+    def put(self, path, mtime_ns, size, offsets):
+        """Remember ``offsets`` for this version of ``path`` (in memory only)"""
+        with self._lock:
+            old = self._entries.pop(str(path), None)
+            self._entries[str(path)] = (mtime_ns, size, offsets)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if old is None or old[:2] != (mtime_ns, size):
+            self._notify(str(path), mtime_ns, size, len(offsets) // 2)
+
+    def subscribe(self, callback):
+        """Register ``callback(path, mtime_ns, size, count)``, called for each new file version indexed"""
+        self._listeners.append(callback)
+
+    def _notify(self, path, mtime_ns, size, count):
+        for callback in self._listeners:
+            try:
+                callback(path, mtime_ns, size, count)
+            except Exception as e:
+                print(f"Error in offset index listener: {e}")
+
+    def _read_side_file(self, path, mtime_ns, size):
+        try:
+            with open(self._side_path(path), "rb") as f:
+                version, stored_mtime, stored_size, count = _HEADER.unpack(f.read(_HEADER.size))
+                if (version, stored_mtime, stored_size) != (FORMAT_VERSION, mtime_ns, size):
+                    return None
+                offsets = array("Q")
+                offsets.frombytes(f.read())
+        except (OSError, ValueError, struct.error):
+            return None
+        return offsets if len(offsets) == 2 * count else None
+
+    def _write_side_file(self, path, mtime_ns, size, offsets):
+        side = self._side_path(path)
+        tmp = side.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(_HEADER.pack(FORMAT_VERSION, mtime_ns, size, len(offsets) // 2))
+                offsets.tofile(f)
+            os.replace(tmp, side)
+        except OSError as e:
+            print(f"Error writing offset index for {path}: {e}")
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+
+    def invalidate(self, path):
+        """Forget the offsets of ``path`` (e.g. a deleted task)"""
+        path = str(path)
+        with self._lock:
+            self._entries.pop(path, None)
+        try:
+            self._side_path(path).unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error removing offset index for {path}: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class TailFollower:
+    """Reports the messages appended to (or changed at the end of) a JSON array file.
+
+    Roo rewrites a task file whole on every update, usually appending
+    messages or replacing the last, still streaming, one.  Each ``poll()``
+    stats the file; when it changed, only the bytes after the second to last
+    known message are scanned, provided the ``ANCHOR_BYTES`` before them are
+    unchanged.  Anything else (a shorter file, an edited prefix, malformed
+    JSON at the tail) is reported as RELOAD, after which the follower is done.
+    """
+
+    def __init__(self, path, index, known=None):
+        self.path = str(path)
+        self.index = index
+        self.stat = None
+        self.offsets = None
+        self.anchor = b""
+        self.last = None
+        # Messages the client already shows; None: all present at the first poll
+        self.known = known
+
+    def _remember(self, f, stat, offsets):
+        """Make ``offsets`` of the file open as ``f`` the state the next poll compares against"""
+        self.stat = stat
+        self.offsets = offsets
+        self.anchor = self.last = b""
+        n = len(offsets) // 2
+        if n >= 2:
+            end = offsets[2 * n - 3]
+            f.seek(max(0, end - ANCHOR_BYTES))
+            self.anchor = f.read(min(end, ANCHOR_BYTES))
+        if n:
+            f.seek(offsets[2 * n - 2])
+            self.last = hashlib.sha1(f.read(offsets[2 * n - 1] - offsets[2 * n - 2])).digest()
+        self.index.put(self.path, *stat, offsets)
+
+    def poll(self):
+        """None if nothing changed, RELOAD, or a Change to close after use.
+
+        Raises ``OSError`` if the file cannot be read (e.g. the task was deleted).
+        """
+        st = os.stat(self.path)
+        if (st.st_mtime_ns, st.st_size) == self.stat:
+            return None
+        f = open(self.path, "rb")
+        try:
+            st = os.fstat(f.fileno())
+            stat = (st.st_mtime_ns, st.st_size)
+            if self.offsets is None:
+                # First poll: the baseline, less the messages the client does not have yet
+                offsets = self.index._offsets(self.path, f, *stat)
+                self._remember(f, stat, offsets)
+                known = len(offsets) // 2 if self.known is None else self.known
+                if known < len(offsets) // 2:
+                    return Change(MessageFile(f, offsets), known)
+                f.close()
+                return None
+            change = self._tail(f, stat)
+            if change is RELOAD:
+                f.close()
+                return RELOAD
+            if change.start < len(change.messages):
+                return change
+            f.close()
+            return None
+        except BaseException:
+            f.close()
+            raise
+
+    def _tail(self, f, stat):
+        n = len(self.offsets) // 2
+        try:
+            if n < 2:
+                # Nothing before the resume point worth anchoring on: rescan the (small) file
+                offsets = element_offsets(f.read())
+            else:
+                end = self.offsets[2 * n - 3]
+                f.seek(max(0, end - ANCHOR_BYTES))
+                if stat[1] < end or f.read(len(self.anchor)) != self.anchor:
+                    return RELOAD
+                f.seek(end)
+                tail = element_offsets(f.read(), start=0)
+                offsets = self.offsets[:2 * n - 2] + array("Q", (offset + end for offset in tail))
+        except ValueError:
+            # Malformed JSON
+            return RELOAD
+        if len(offsets) // 2 < n:
+            return RELOAD
+        # The last known message is reported again only if its bytes changed
+        first = 0
+        if n:
+            f.seek(offsets[2 * n - 2])
+            unchanged = hashlib.sha1(f.read(offsets[2 * n - 1] - offsets[2 * n - 2])).digest() == self.last
+            first = n if unchanged else n - 1
+        self._remember(f, stat, offsets)
+        return Change(MessageFile(f, offsets), first)
@@ -0,0 +1,423 @@
+"""Sidebar search: the fuzzy title scorer and an incremental index over it.
+
+``fuzzy_match`` is the reference scoring function.  ``TitleSearchIndex``
+answers the same queries with identical scores, but from precomputed
+structures instead of re-normalizing and scanning every title per query:
+
+* normalized title -> task IDs, for exact matches (1.0)
+* token -> task IDs postings, for word matches
+* character n-grams -> tokens, to find every token containing a query word,
+  which covers containment (0.95), prefix (0.5 / 0.7-0.9) and substring
+  (0.3 / 0.6) matches
+
+Only multi-word containment needs a check against the full title, and only
+for tasks that contain every query word.
+
+Typing refines a query keystroke by keystroke.  For a single-word query a
+title matches exactly when it contains the word, so the matches of
+"database" are a subset of those of "databa".  ``search(..., client=...)``
+remembers each client's last single-word candidates in rank order and, when
+the next query extends that word, re-checks only those candidates, stopping
+once ``limit`` results are found.  Multi-word scores depend on the number
+of significant words and are not monotone that way; they are always scored
+in full.
+
+Memory per task is kept low: only the normalized title is stored per task
+(its tokens are split again when it is removed), tokens are interned, and a
+title or token held by a single task maps to the bare task ID instead of a
+one-element set.
+"""
+import heapq
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+
+# Longest n-gram indexed per token; shorter query words use shorter grams
+NGRAM = 3
+
+_EMPTY = frozenset()
+
+# Per-client refinement state: how many clients, and for how long (seconds)
+MAX_CLIENTS = 16
+REFINE_TTL = 60
+
+
+def fuzzy_match(text, query):
+    """Word-component-based matching algorithm focused on semantic relevance"""
+    if not query or not text:
+        return False, 0
+
+    # Normalize both query and text
+    query = query.lower().strip()
+    text = text.lower().strip()
+
+    # Exact match has highest score
+    if query == text:
+        return True, 1.0
+
+    # Contains full query is next best
+    if query in text:
+        return True, 0.95
+
+    # Split into component words
+    query_words = query.split()
+    text_words = text.split()
+
+    # If query is just one word
+    if len(query_words) == 1:
+        # Check for exact word match
+        if query in text_words:
+            return True, 0.9
+
+        # Check for word prefix (starts with)
+        for word in text_words:
+            if word.startswith(query) and len(query) >= 3:
+                # The longer the query, the higher the score
+                return True, 0.7 + min(0.2, len(query) / len(word) * 0.2)
+
+        # Check for substring in words (must be at least 4 chars to be meaningful)
+        if len(query) >= 4:
+            for word in text_words:
+                if query in word and len(word) > len(query):
+                    return True, 0.6
+
+        # No meaningful match
+        return False, 0
+
+    # For multi-word queries, track how many query words match
+    matched_words = 0
+    partial_matches = 0
+
+    for q_word in query_words:
+        # Skip very short words (like "a", "of", etc.)
+        if len(q_word) <= 2:
+            continue
+
+        word_matched = False
+
+        # Check for exact word matches
+        if q_word in text_words:
+            matched_words += 1
+            word_matched = True
+            continue
+
+        # Check for partial word matches (prefixes)
+        for t_word in text_words:
+            if t_word.startswith(q_word) and len(q_word) >= 3:
+                partial_matches += 0.5
+                word_matched = True
+                break
+
+        if word_matched:
+            continue
+
+        # If still no match, and the word is significant (4+ chars)
+        # check if it appears as substring in any word
+        if len(q_word) >= 4:
+            for t_word in text_words:
+                if q_word in t_word and len(t_word) > len(q_word):
+                    partial_matches += 0.3
+                    break
+
+    # Calculate total number of significant words in query
+    significant_words = sum(1 for w in query_words if len(w) > 2)
+
+    if significant_words == 0:
+        return False, 0
+
+    # Calculate match score
+    total_match = matched_words + partial_matches
+    score = total_match / significant_words
+
+    # Must match at least 50% of significant words to be considered a match
+    if score < 0.5:
+        return False, 0
+
+    return True, min(score, 0.9)  # Cap at 0.9 for non-exact matches
+
+
+def _grams(token, n):
+    return {token[i:i + n] for i in range(len(token) - n + 1)}
+
+
+def _as_set(holders):
+    """A postings / by-title value as a set: a single task is stored as its bare ID"""
+    return frozenset((holders,)) if isinstance(holders, str) else holders
+
+
+def _add(mapping, key, tid):
+    """Add ``tid`` to the holders of ``key``; True if ``key`` is new"""
+    holders = mapping.get(key)
+    if holders is None:
+        mapping[key] = tid
+        return True
+    if isinstance(holders, str):
+        if holders != tid:
+            mapping[key] = {holders, tid}
+    else:
+        holders.add(tid)
+    return False
+
+
+def _discard(mapping, key, tid):
+    """Remove ``tid`` from the holders of ``key``; True if ``key`` is gone"""
+    holders = mapping[key]
+    if isinstance(holders, str):
+        if holders != tid:
+            return False
+        del mapping[key]
+        return True
+    holders.discard(tid)
+    if len(holders) == 1:
+        mapping[key] = next(iter(holders))
+    return False
+
+
+class TitleSearchIndex:
+    """Incrementally maintained index reproducing ``fuzzy_match`` scores"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # tid -> normalized title
+        self._docs = {}
+        # normalized title -> tid, or set of tids
+        self._by_text = {}
+        # token -> tid, or set of tids
+        self._postings = {}
+        # n-gram (length 1..NGRAM) -> set of tokens
+        self._grams = {}
+        # Bumped on every change; refinement state from older versions is stale
+        self.version = 0
+        # client -> (query, version, ranks, rank-ordered candidates, time)
+        self._recent = OrderedDict()
+
+    def __len__(self):
+        return len(self._docs)
+
+    # -- maintenance ---------------------------------------------------------
+
+    def update(self, tid, title):
+        """Add or re-index a task title"""
+        with self._lock:
+            old = self._docs.get(tid)
+            if not title:
+                # fuzzy_match never matches an empty title
+                if old is not None:
+                    self._remove(tid)
+                return
+            text = title.lower().strip()
+            if old is not None:
+                if old == text:
+                    return
+                self._remove(tid)
+            self.version += 1
+            tid = sys.intern(tid)
+            self._docs[tid] = text
+            _add(self._by_text, text, tid)
+            for token in set(text.split()):
+                token = sys.intern(token)
+                if _add(self._postings, token, tid):
+                    for n in range(1, NGRAM + 1):
+                        for gram in _grams(token, n):
+                            self._grams.setdefault(gram, set()).add(token)
+
+    def update_many(self, titles):
+        """Index every (tid, title) pair of a mapping"""
+        with self._lock:
+            for tid, title in titles.items():
+                self.update(tid, title)
+
+    def remove(self, tid):
+        """Drop a task from the index"""
+        with self._lock:
+            if tid in self._docs:
+                self._remove(tid)
+
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self._recent.clear()
+            self._docs.clear()
+            self._by_text.clear()
+            self._postings.clear()
+            self._grams.clear()
+
+    def _remove(self, tid):
+        self.version += 1
+        text = self._docs.pop(tid)
+        _discard(self._by_text, text, tid)
+        for token in set(text.split()):
+            if not _discard(self._postings, token, tid):
+                continue
+            for n in range(1, NGRAM + 1):
+                for gram in _grams(token, n):
+                    holders = self._grams[gram]
+                    holders.discard(token)
+                    if not holders:
+                        del self._grams[gram]
+
+    # -- queries -------------------------------------------------------------
+
+    def _tokens_containing(self, word):
+        """All indexed tokens that contain ``word`` as a substring"""
+        n = min(len(word), NGRAM)
+        grams = sorted(_grams(word, n), key=lambda g: len(self._grams.get(g, ())))
+        candidates = self._grams.get(grams[0])
+        if not candidates:
+            return []
+        if n == len(word):
+            return list(candidates)
+        for gram in grams[1:]:
+            candidates = candidates & self._grams.get(gram, set())
+            if not candidates:
+                return []
+        return [t for t in candidates if word in t]
+
+    def _docs_with(self, tokens):
+        docs = set()
+        for token in tokens:
+            docs |= _as_set(self._postings[token])
+        return docs
+
+    def score_all(self, query):
+        """Return {tid: score} for every task ``fuzzy_match`` would match"""
+        return self._scores(query)
+
+    def _scores(self, query, ranks=None, enough=None):
+        """Score every matching task.
+
+        If ``enough`` tasks from ``ranks`` already score 0.95 or more after the
+        containment pass, the word-ratio pass (capped at 0.9) cannot change the
+        top ``enough`` results and is skipped.
+        """
+        if not query:
+            return {}
+        q = query.lower().strip()
+        with self._lock:
+            if not q:
+                # Whitespace-only query: contained in every non-empty title
+                return {tid: 1.0 if not text else 0.95 for tid, text in self._docs.items()}
+            words = q.split()
+            scores = {}
+
+            # Containment (0.95).  A single word can only occur inside one
+            # token; for several words every word must occur somewhere and the
+            # full query is then checked against the title.
+            containing = {}
+            for word in dict.fromkeys(words):
+                containing[word] = self._tokens_containing(word)
+            if len(words) == 1:
+                scores = dict.fromkeys(self._docs_with(containing[q]), 0.95)
+            else:
+                per_word = sorted((self._docs_with(containing[w]) for w in containing), key=len)
+                candidates = per_word[0].intersection(*per_word[1:])
+                for tid in candidates:
+                    if q in self._docs[tid]:
+                        scores[tid] = 0.95
+
+            # Exact title match (1.0)
+            for tid in _as_set(self._by_text.get(q, _EMPTY)):
+                scores[tid] = 1.0
+
+            if len(words) == 1:
+                return scores
+            if enough is not None and sum(1 for tid in scores if tid in ranks) >= enough:
+                return scores
+
+            # Word-ratio scoring for multi-word queries
+            significant = [w for w in words if len(w) > 2]
+            if not significant:
+                return scores
+            n = len(significant)
+            matched = Counter()
+            tiers = []
+            for word in significant:
+                tokens = containing[word]
+                exact = _as_set(self._postings.get(word, _EMPTY))
+                matched.update(exact)
+                prefix = self._docs_with(t for t in tokens if t.startswith(word)) - exact
+                if len(word) >= 4:
+                    substring = self._docs_with(t for t in tokens if len(t) > len(word)) - exact - prefix
+                else:
+                    substring = _EMPTY
+                tiers.append((prefix, substring))
+            partial_docs = set().union(*(prefix | substring for prefix, substring in tiers))
+
+            # Whole-word matches only: score is matched / n
+            for tid, count in matched.items():
+                if 2 * count >= n and tid not in partial_docs and tid not in scores:
+                    scores[tid] = min(count / n, 0.9)
+
+            # Partial matches are summed in query word order so the floats
+            # come out exactly as in fuzzy_match
+            for tid in partial_docs:
+                if tid in scores:
+                    continue
+                partial = 0
+                for prefix, substring in tiers:
+                    if tid in prefix:
+                        partial += 0.5
+                    elif tid in substring:
+                        partial += 0.3
+                score = (matched[tid] + partial) / n
+                if score >= 0.5:
+                    scores[tid] = min(score, 0.9)
+            return scores
+
+    def search(self, query, ranks, limit=None, client=None):
+        """Return matching task IDs, best first, ties broken by ``ranks`` (tid -> position).
+
+        Tasks missing from ``ranks`` are ignored.  With ``limit`` only the top
+        ``limit`` results are selected, using a bounded heap.  ``client``
+        (any hashable) enables refinement from that client's previous query.
+        """
+        if client is not None:
+            q = query.lower().strip() if query else ""
+            if q and len(q.split()) == 1:
+                return self._refine(client, q, ranks, limit)
+        scores = self._scores(query, ranks, limit)
+        matches = ((-score, ranks[tid], tid) for tid, score in scores.items() if tid in ranks)
+        if limit is not None:
+            matches = heapq.nsmallest(limit, matches)
+        else:
+            matches = sorted(matches)
+        return [tid for _, _, tid in matches]
+
+    def _refine(self, client, q, ranks, limit):
+        """Single-word search reusing ``client``'s candidates when ``q`` extends its last query.
+
+        Matches score 1.0 (exact title) or 0.95 (contains ``q``), so the
+        result is the exact matches and then the other candidates containing
+        ``q``, each in rank order -- the same as ``search`` without a client.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._recent.pop(client, None)
+            if entry is not None and entry[1] == self.version and entry[2] is ranks \
+                    and now - entry[4] < REFINE_TTL and q.startswith(entry[0]):
+                candidates = entry[3]
+            else:
+                candidates = sorted((tid for tid in self._scores(q) if tid in ranks), key=ranks.__getitem__)
+
+            exact = sorted((tid for tid in _as_set(self._by_text.get(q, _EMPTY)) if tid in ranks),
+                           key=ranks.__getitem__)
+            if limit is not None:
+                exact = exact[:limit]
+            need = None if limit is None else limit - len(exact)
+            others = []
+            kept = []
+            scanned = len(candidates)
+            for i, tid in enumerate(candidates):
+                if need is not None and len(others) >= need:
+                    # Enough results: the rest stay unchecked candidates
+                    scanned = i
+                    break
+                if q in self._docs[tid]:
+                    kept.append(tid)
+                    if self._docs[tid] != q:
+                        others.append(tid)
+            self._recent[client] = (q, self.version, ranks, kept + candidates[scanned:], now)
+            while len(self._recent) > MAX_CLIENTS:
+                self._recent.popitem(last=False)
+        return exact + others
@@ -0,0 +1,341 @@
+"""Process-wide, watcher-maintained cache of the task directory listing.
+
+The cache scans the tasks directory once, keeps the task IDs sorted by
+modification time and then applies only add/remove/modify deltas reported by a
+filesystem watcher.  ``watchfiles`` (inotify / FSEvents) is used when it is
+installed; otherwise a background thread polls the directory.  Every applied
+delta bumps ``generation`` so other layers can cheaply tell when to invalidate.
+
+Per-task state is held in columns rather than as objects per task: each task
+has a slot, its mtime and stat signature are entries of ``array`` columns,
+and the mtime order is an array of slots (beside an array of the negated
+mtimes in that order, to bisect on).  With task IDs interned (so every
+layer shares one string per task) that is about a third of the memory of a
+tuple-per-task layout; see ``bench/bench_memory.py``.
+"""
+import atexit
+import bisect
+import sys
+import threading
+from array import array
+from collections import namedtuple
+from pathlib import Path
+
+try:
+    import watchfiles
+except ImportError:  # optional dependency
+    watchfiles = None
+
+# Files whose changes mark a task as modified
+WATCHED_FILES = ("ui_messages.json", "api_conversation_history.json")
+
+# Integers per task in the signature column: directory mtime_ns, then
+# (mtime_ns, size) of each watched file, -1 where it is missing
+SIGNATURE_WIDTH = 1 + 2 * len(WATCHED_FILES)
+
+# A batch of changes.  When ``full`` is true, ``added`` is the complete task
+# set (initial scan) and listeners should treat anything else as gone.
+TaskDelta = namedtuple("TaskDelta", "added removed modified full generation")
+
+
+def _stat_task(task_dir):
+    """Return (dir_mtime, signature) for a task directory, or None if it is not one"""
+    try:
+        st = task_dir.stat()
+    except OSError:
+        return None
+    if not task_dir.is_dir():
+        return None
+    signature = [st.st_mtime_ns]
+    for name in WATCHED_FILES:
+        try:
+            fst = (task_dir / name).stat()
+            signature += (fst.st_mtime_ns, fst.st_size)
+        except OSError:
+            signature += (-1, -1)
+    return st.st_mtime, signature
+
+
+def parse_cursor(cursor):
+    """The sort key (-mtime, tid) a page cursor names, or None; raises ValueError if malformed"""
+    if not cursor:
+        return None
+    mtime, sep, tid = cursor.partition(":")
+    if not sep:
+        raise ValueError(f"invalid cursor: {cursor!r}")
+    return -float(mtime), tid
+
+
+def page_of(keys, limit):
+    """The task IDs of the first ``limit`` of ``keys`` (up to limit + 1), and the next page's cursor"""
+    more = len(keys) > limit
+    keys = keys[:limit]
+    next_cursor = f"{-keys[-1][0]!r}:{keys[-1][1]}" if more and keys else None
+    return [tid for _, tid in keys], next_cursor
+
+
+class TaskListCache:
+    """In-memory, mtime-sorted list of task IDs kept current by a watcher"""
+
+    def __init__(self, tasks_dir, poll_interval=2.0, use_watchfiles=True):
+        self.tasks_dir = Path(tasks_dir)
+        self.poll_interval = poll_interval
+        self.use_watchfiles = use_watchfiles and watchfiles is not None
+        self.generation = 0
+        self._lock = threading.RLock()
+        self._started = False
+        self._stop = threading.Event()
+        self._thread = None
+        self._listeners = []
+        # Columns indexed by slot: task ID (None once freed), directory mtime
+        # and SIGNATURE_WIDTH signature integers; freed slots are reused
+        self._ids = []
+        self._mtimes = array("d")
+        self._signatures = array("q")
+        self._free = []
+        # tid -> slot
+        self._slots = {}
+        # Slots sorted by (-mtime, tid), newest first, and their -mtime
+        self._order = array("l")
+        self._order_keys = array("d")
+        self._snapshot = ()
+        self._ranks = None
+
+    # -- public API ----------------------------------------------------------
+
+    def tasks(self):
+        """All task IDs sorted by modification time (newest first)"""
+        self.start()
+        return self._snapshot
+
+    def ranks(self):
+        """Mapping of task ID -> position in ``tasks()``, rebuilt once per generation"""
+        self.start()
+        ranks = self._ranks
+        if ranks is None or ranks[0] != self.generation:
+            with self._lock:
+                ranks = (self.generation, {tid: i for i, tid in enumerate(self._snapshot)})
+                self._ranks = ranks
+        return ranks[1]
+
+    def page(self, cursor=None, limit=100):
+        """Up to ``limit`` task IDs of ``tasks()`` after ``cursor``, and the cursor of the next page.
+
+        A cursor names the last task of the previous page by its sort key
+        (mtime, tid), so pages stay stable while tasks are added or move up;
+        it is None after the last page.  Costs O(log n + limit).  Raises
+        ValueError for a malformed cursor.
+        """
+        return page_of(self.keys(parse_cursor(cursor), limit + 1), limit)
+
+    def keys(self, after=None, limit=None):
+        """Sort keys (-mtime, tid) of ``tasks()`` after the key ``after``, at most ``limit`` of them"""
+        self.start()
+        with self._lock:
+            start = self._position(after, right=True) if after else 0
+            mtimes, ids = self._mtimes, self._ids
+            return [(-mtimes[slot], ids[slot])
+                    for slot in self._order[start:None if limit is None else start + limit]]
+
+    def mtime(self, tid):
+        """Directory mtime of a task, or None if it is unknown"""
+        self.start()
+        with self._lock:
+            slot = self._slots.get(tid)
+            return None if slot is None else self._mtimes[slot]
+
+    def has_task(self, tid):
+        """Check whether a task exists, re-statting it if the watcher has not seen it yet"""
+        self.start()
+        if tid in self._slots:
+            return True
+        # Only plain directory names can be tasks (guards against path tricks)
+        if not tid or tid in (".", "..") or "/" in tid or "\\" in tid:
+            return False
+        self.apply([tid])
+        return tid in self._slots
+
+    def subscribe(self, callback):
+        """Register ``callback(delta)``; called for the initial scan and every later delta"""
+        with self._lock:
+            self._listeners.append(callback)
+            if self._started:
+                callback(TaskDelta(list(self._slots), [], [], True, self.generation))
+
+    def start(self):
+        """Perform the initial scan and start the watcher (idempotent)"""
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._initial_scan()
+            self._started = True
+            self._thread = threading.Thread(target=self._watch, name="task-list-watcher", daemon=True)
+            self._thread.start()
+            # Stop the watcher before interpreter teardown
+            atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the watcher thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def apply(self, task_ids):
+        """Re-stat the given tasks and apply whatever changed.  Returns the delta or None."""
+        added, removed, modified = [], [], []
+        with self._lock:
+            for tid in set(task_ids):
+                stat = _stat_task(self.tasks_dir / tid)
+                slot = self._slots.get(tid)
+                if stat is None:
+                    if slot is not None:
+                        self._unlink(slot)
+                        self._free_slot(slot)
+                        removed.append(tid)
+                    continue
+                if slot is None:
+                    slot = self._new_slot(tid)
+                    added.append(self._ids[slot])
+                elif self._signature(slot) != stat[1]:
+                    modified.append(tid)
+                    self._unlink(slot)
+                else:
+                    continue
+                self._mtimes[slot] = stat[0]
+                self._signatures[SIGNATURE_WIDTH * slot:SIGNATURE_WIDTH * (slot + 1)] = array("q", stat[1])
+                i = self._position(self._sort_key(slot))
+                self._order.insert(i, slot)
+                self._order_keys.insert(i, -stat[0])
+            if not (added or removed or modified):
+                return None
+            self._snapshot = tuple(map(self._ids.__getitem__, self._order))
+            self.generation += 1
+            delta = TaskDelta(added, removed, modified, False, self.generation)
+        # Listeners may do slow work (e.g. re-indexing); readers never wait on it
+        self._notify(delta)
+        return delta
+
+    # -- internals -----------------------------------------------------------
+
+    def _sort_key(self, slot):
+        return -self._mtimes[slot], self._ids[slot]
+
+    def _position(self, key, right=False):
+        """Index in the mtime order where the sort key ``key`` goes (after equal keys if ``right``)"""
+        neg_mtime, tid = key
+        lo = bisect.bisect_left(self._order_keys, neg_mtime)
+        hi = bisect.bisect_right(self._order_keys, neg_mtime, lo)
+        # Among equal mtimes, by task ID
+        ids, order = self._ids, self._order
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if ids[order[mid]] < tid or right and ids[order[mid]] == tid:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _signature(self, slot):
+        return self._signatures[SIGNATURE_WIDTH * slot:SIGNATURE_WIDTH * (slot + 1)].tolist()
+
+    def _new_slot(self, tid):
+        """A slot for a new task (columns filled in by the caller)"""
+        tid = sys.intern(tid)
+        if self._free:
+            slot = self._free.pop()
+            self._ids[slot] = tid
+        else:
+            slot = len(self._ids)
+            self._ids.append(tid)
+            self._mtimes.append(0.0)
+            self._signatures.extend([0] * SIGNATURE_WIDTH)
+        self._slots[tid] = slot
+        return slot
+
+    def _free_slot(self, slot):
+        del self._slots[self._ids[slot]]
+        self._ids[slot] = None
+        self._free.append(slot)
+
+    def _unlink(self, slot):
+        """Take a slot out of the mtime order (before its mtime changes)"""
+        i = self._position(self._sort_key(slot))
+        if i < len(self._order) and self._order[i] == slot:
+            del self._order[i]
+            del self._order_keys[i]
+
+    def _notify(self, delta):
+        for callback in self._listeners:
+            try:
+                callback(delta)
+            except Exception as e:
+                print(f"Error in task list listener: {e}")
+
+    def _list_dir(self):
+        """Return the names of every entry in the tasks directory"""
+        if not self.tasks_dir.exists():
+            return []
+        try:
+            return [item.name for item in self.tasks_dir.iterdir()]
+        except Exception as e:
+            # Handle permission errors or other issues
+            print(f"Error scanning tasks directory: {e}")
+            return []
+
+    def _initial_scan(self):
+        ids, mtimes, signatures = [], array("d"), array("q")
+        for name in self._list_dir():
+            stat = _stat_task(self.tasks_dir / name)
+            if stat is not None:
+                ids.append(sys.intern(name))
+                mtimes.append(stat[0])
+                signatures.extend(stat[1])
+        self._ids, self._mtimes, self._signatures, self._free = ids, mtimes, signatures, []
+        self._slots = {tid: slot for slot, tid in enumerate(ids)}
+        # One sort over the columns; later deltas keep it sorted by insertion
+        self._order = array("l", sorted(range(len(ids)), key=self._sort_key))
+        self._order_keys = array("d", [-mtimes[slot] for slot in self._order])
+        self._snapshot = tuple(map(ids.__getitem__, self._order))
+        self.generation += 1
+        self._notify(TaskDelta(list(ids), [], [], True, self.generation))
+
+    def _watch(self):
+        if self.use_watchfiles and self.tasks_dir.exists():
+            try:
+                self._watch_events()
+                return
+            except Exception as e:
+                print(f"Filesystem watcher failed, falling back to polling: {e}")
+        self._poll()
+
+    def _watch_events(self):
+        """Apply deltas from filesystem events (inotify / FSEvents via watchfiles)"""
+        root = self.tasks_dir.resolve()
+        reconciled = False
+        # yield_on_timeout gives us a first (possibly empty) batch once the
+        # watch is established; a one-off reconcile then catches anything that
+        # changed between the initial scan and the watcher starting up
+        for changes in watchfiles.watch(root, stop_event=self._stop, raise_interrupt=False,
+                                        debounce=200, step=50, rust_timeout=1000,
+                                        yield_on_timeout=True):
+            if not reconciled:
+                reconciled = True
+                self.apply(set(self._list_dir()) | set(self._slots))
+            touched = set()
+            for _, path in changes:
+                try:
+                    rel = Path(path).resolve().relative_to(root)
+                except ValueError:
+                    continue
+                if rel.parts:
+                    touched.add(rel.parts[0])
+            if touched:
+                self.apply(touched)
+
+    def _poll(self):
+        """Fallback watcher: periodically re-stat every task and apply the differences"""
+        while not self._stop.wait(self.poll_interval):
+            names = set(self._list_dir())
+            self.apply(names | set(self._slots))
@@ -0,0 +1,382 @@
+"""Persistent on-disk index of Roo task metadata.
+
+Titles, first-message text and message counts are extracted from each task's
+JSON files once and stored in a small SQLite database.  A refresh only stats
+the task files and re-reads those whose mtime or size changed since the last
+refresh, so page loads and searches become index lookups instead of JSON work.
+Titles come from a bounded prefix read of ``ui_messages.json``.  Counting
+messages needs the whole file, so counts are filled in by ``record_count``
+whenever a file is parsed or offset-scanned anyway (e.g. by the content
+indexer), once per file version.
+The index is normally kept current by subscribing ``apply_delta`` to a
+``task_cache.TaskListCache``.
+"""
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from json_stream import read_first_element
+
+# From this many stale tasks a full refresh runs alongside the server (in
+# batches, see _bulk_refresh) instead of holding the index until it is done
+MIN_PARALLEL_TASKS = 500
+
+# Tasks read and stored per batch of a bulk refresh
+BATCH_SIZE = 200
+
+# Threads reading batches of a bulk refresh (ROO_BROWSER_INDEX_WORKERS overrides it).
+# The reads are stats and small prefix reads, which wait on the disk, not the GIL.
+DEFAULT_WORKERS = 8
+
+# titles() looks up at most this many IDs by key (bound parameters), else scans the table
+MAX_LOOKUP_IDS = 500
+
+# Bump whenever the schema or the extraction rules change; the index is
+# rebuilt from scratch when the stored version differs.
+SCHEMA_VERSION = 4
+
+# Keys checked (in order) for the text of the first UI message
+TEXT_KEYS = ["text", "content", "message"]
+
+# Titles longer than this are truncated for display
+MAX_TITLE_LENGTH = 300
+
+# Count column prefix of each task file
+COUNT_PREFIXES = {"ui_messages": "ui", "api_conversation_history": "api"}
+
+
+def default_cache_dir():
+    """Directory holding the index database (overridable via ROO_BROWSER_CACHE_DIR)"""
+    override = os.environ.get("ROO_BROWSER_CACHE_DIR")
+    if override:
+        return Path(override).expanduser()
+    base = os.environ.get("XDG_CACHE_HOME")
+    base = Path(base).expanduser() if base else Path.home() / ".cache"
+    return base / "roo-task-browser"
+
+
+def default_workers():
+    """Bulk refresh threads from ROO_BROWSER_INDEX_WORKERS, else DEFAULT_WORKERS"""
+    try:
+        return max(1, int(os.environ.get("ROO_BROWSER_INDEX_WORKERS", DEFAULT_WORKERS)))
+    except ValueError:
+        return DEFAULT_WORKERS
+
+
+def extract_first_text(first):
+    """Return the stripped text of the first message of a ui_messages array"""
+    if isinstance(first, dict):
+        for key in TEXT_KEYS:
+            if key in first and isinstance(first[key], str):
+                return first[key].strip()
+    return ""
+
+
+def make_title(task_id, first_text):
+    """Build the display title for a task from its first message text"""
+    if not first_text:
+        return f"Task: {task_id}"
+    # Only truncate extremely long titles
+    if len(first_text) > MAX_TITLE_LENGTH:
+        return first_text[:MAX_TITLE_LENGTH - 3] + "..."
+    return first_text
+
+
+def _file_stat(path):
+    """Return (mtime_ns, size) for a file, or (None, None) if it is missing"""
+    try:
+        st = path.stat()
+    except OSError:
+        return None, None
+    return st.st_mtime_ns, st.st_size
+
+
+def _read_first_text(path):
+    """Read the first message text using the bounded prefix reader"""
+    try:
+        return extract_first_text(read_first_element(path))
+    except Exception as e:
+        print(f"Error indexing {path}: {e}")
+        return ""
+
+
+def read_task_row(tasks_dir, tid, dir_mtime, row=None):
+    """Build a fresh index row for a task, re-reading only files that changed since ``row``"""
+    task_dir = tasks_dir / tid
+    ui_mtime, ui_size = _file_stat(task_dir / "ui_messages.json")
+    api_mtime, api_size = _file_stat(task_dir / "api_conversation_history.json")
+
+    if row is not None:
+        first_text, ui_count, api_count = row["first_text"], row["ui_count"], row["api_count"]
+        ui_changed = (ui_mtime, ui_size) != (row["ui_mtime_ns"], row["ui_size"])
+        api_changed = (api_mtime, api_size) != (row["api_mtime_ns"], row["api_size"])
+    else:
+        first_text, ui_count, api_count = "", None, None
+        ui_changed = api_changed = True
+
+    # Only the first message is decoded; a changed file's count is unknown
+    # until it is next parsed (see TaskIndex.record_count)
+    if ui_changed:
+        ui_count = None
+        first_text = _read_first_text(task_dir / "ui_messages.json") if ui_mtime is not None else ""
+    if api_changed:
+        api_count = None
+
+    return (tid, dir_mtime, make_title(tid, first_text), first_text,
+            ui_mtime, ui_size, ui_count, api_mtime, api_size, api_count)
+
+
+class TaskIndex:
+    """SQLite-backed metadata index for a Roo tasks directory"""
+
+    def __init__(self, tasks_dir, db_path=None, workers=None):
+        self.tasks_dir = Path(tasks_dir)
+        self.db_path = Path(db_path) if db_path else default_cache_dir() / "task_index.sqlite3"
+        self.workers = workers or default_workers()
+        self._lock = threading.RLock()
+        self._conn = None
+        self._listeners = []
+        # While a bulk refresh runs: (done, total) and the tasks refreshed
+        # meanwhile, whose newer rows the bulk results must not overwrite
+        self._progress = None
+        self._touched = None
+
+    # -- connection / schema -------------------------------------------------
+
+    def _connect(self):
+        if self._conn is not None:
+            return self._conn
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        except (OSError, sqlite3.Error) as e:
+            # Fall back to a throwaway in-memory index if the cache dir is unusable
+            print(f"Error opening task index at {self.db_path}: {e}")
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            conn.execute("DROP TABLE IF EXISTS tasks")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                tid TEXT PRIMARY KEY,
+                dir_mtime REAL NOT NULL,
+                title TEXT NOT NULL,
+                first_text TEXT NOT NULL,
+                ui_mtime_ns INTEGER,
+                ui_size INTEGER,
+                ui_count INTEGER,
+                api_mtime_ns INTEGER,
+                api_size INTEGER,
+                api_count INTEGER
+            )
+        """)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+        self._conn = conn
+        return conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # -- refresh -------------------------------------------------------------
+
+    def _scan_dir(self):
+        """Return {task_id: dir_mtime} for every task directory"""
+        tasks = {}
+        if not self.tasks_dir.exists():
+            return tasks
+        try:
+            for item in self.tasks_dir.iterdir():
+                if item.is_dir():
+                    try:
+                        tasks[item.name] = item.stat().st_mtime
+                    except OSError:
+                        # If stat fails, still include but with old timestamp
+                        tasks[item.name] = 0
+        except Exception as e:
+            # Handle permission errors or other issues
+            print(f"Error scanning tasks directory: {e}")
+        return tasks
+
+    def _stale(self, tid, dir_mtime, row):
+        """Check whether an indexed row no longer matches the files on disk"""
+        if row is None or row["dir_mtime"] != dir_mtime:
+            return True
+        task_dir = self.tasks_dir / tid
+        return (_file_stat(task_dir / "ui_messages.json") != (row["ui_mtime_ns"], row["ui_size"]) or
+                _file_stat(task_dir / "api_conversation_history.json") != (row["api_mtime_ns"], row["api_size"]))
+
+    def refresh(self, task_ids=None, background=False):
+        """Bring the index up to date with the tasks directory.
+
+        With ``task_ids`` only those tasks are checked; otherwise the whole
+        directory is scanned and rows for vanished tasks are dropped.  Many
+        stale tasks are stored in batches as they are read (see
+        _bulk_refresh), in a background thread if ``background`` is set.
+        Returns the number of tasks that were (re)indexed or removed.
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.row_factory = sqlite3.Row
+            if task_ids is None:
+                on_disk = self._scan_dir()
+                rows = {r["tid"]: r for r in conn.execute("SELECT * FROM tasks")}
+            else:
+                task_ids = list(task_ids)
+                on_disk = {}
+                for tid in task_ids:
+                    try:
+                        on_disk[tid] = (self.tasks_dir / tid).stat().st_mtime
+                    except OSError:
+                        pass
+                rows = {}
+                # Stay well below SQLite's bound-parameter limit
+                for i in range(0, len(task_ids), 500):
+                    chunk = task_ids[i:i + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows.update((r["tid"], r) for r in conn.execute(
+                        f"SELECT * FROM tasks WHERE tid IN ({placeholders})", chunk))
+            removed = [tid for tid in rows if tid not in on_disk]
+
+            stale = [(tid, dir_mtime, dict(rows[tid]) if tid in rows else None)
+                     for tid, dir_mtime in on_disk.items() if self._stale(tid, dir_mtime, rows.get(tid))]
+            if task_ids is not None and self._touched is not None:
+                self._touched.update(tid for tid, _, _ in stale)
+            if task_ids is None and self._progress is None and len(stale) >= MIN_PARALLEL_TASKS:
+                if removed:
+                    conn.executemany("DELETE FROM tasks WHERE tid = ?", [(tid,) for tid in removed])
+                    conn.commit()
+                conn.row_factory = None
+                self._progress = (0, len(stale))
+                self._touched = set()
+                if background:
+                    threading.Thread(target=self._bulk_refresh, args=(stale,), name="task-indexer",
+                                     daemon=True).start()
+                else:
+                    self._bulk_refresh(stale)
+                return len(stale) + len(removed)
+
+            updates = [read_task_row(self.tasks_dir, tid, dir_mtime, row) for tid, dir_mtime, row in stale]
+
+            if updates:
+                conn.executemany("INSERT OR REPLACE INTO tasks VALUES (?,?,?,?,?,?,?,?,?,?)", updates)
+            if removed:
+                conn.executemany("DELETE FROM tasks WHERE tid = ?", [(tid,) for tid in removed])
+            conn.commit()
+            conn.row_factory = None
+            return len(updates) + len(removed)
+
+    def _read_batch(self, batch):
+        return [read_task_row(self.tasks_dir, tid, dir_mtime, row) for tid, dir_mtime, row in batch]
+
+    def _bulk_refresh(self, stale):
+        """Index ``stale`` tasks batch by batch, storing and announcing each batch.
+
+        Each batch is split across ``self.workers`` reader threads, so the
+        first titles land as soon as with a serial read.  The index lock is
+        only held to store a batch, so lookups and single-task refreshes are
+        served meanwhile.
+        """
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="task-indexer") as pool:
+                for i in range(0, len(stale), BATCH_SIZE):
+                    batch = stale[i:i + BATCH_SIZE]
+                    size = -(-len(batch) // self.workers)
+                    parts = pool.map(self._read_batch, [batch[j:j + size] for j in range(0, len(batch), size)])
+                    self._store_batch([row for part in parts for row in part])
+        except Exception as e:
+            print(f"Error in bulk indexing: {e}")
+        finally:
+            with self._lock:
+                self._progress = None
+                self._touched = None
+
+    def _store_batch(self, rows):
+        with self._lock:
+            rows = [row for row in rows if row[0] not in self._touched]
+            conn = self._connect()
+            conn.executemany("INSERT OR REPLACE INTO tasks VALUES (?,?,?,?,?,?,?,?,?,?)", rows)
+            conn.commit()
+            done, total = self._progress
+            self._progress = (done + len(rows), total)
+        self._notify([row[0] for row in rows])
+
+    def subscribe(self, callback):
+        """Register ``callback(task_ids)``, called after each bulk batch is stored"""
+        self._listeners.append(callback)
+
+    def _notify(self, task_ids):
+        for callback in self._listeners:
+            try:
+                callback(task_ids)
+            except Exception as e:
+                print(f"Error in task index listener: {e}")
+
+    def progress(self):
+        """(done, total) while a bulk refresh is running, else None"""
+        return self._progress
+
+    def record_count(self, path, mtime_ns, size, count):
+        """Store the message count of a task file parsed or scanned elsewhere.
+
+        Kept only if ``path`` is a task file of this directory and
+        (``mtime_ns``, ``size``) is still its indexed version.  Returns
+        whether ``path`` belongs to this index.
+        """
+        path = Path(path)
+        prefix = COUNT_PREFIXES.get(path.stem)
+        if prefix is None or path.suffix != ".json" or path.parent.parent != self.tasks_dir:
+            return False
+        with self._lock:
+            conn = self._connect()
+            updated = conn.execute(
+                f"UPDATE tasks SET {prefix}_count = ? WHERE tid = ? AND {prefix}_mtime_ns = ? "
+                f"AND {prefix}_size = ? AND {prefix}_count IS NOT ?",
+                (count, path.parent.name, mtime_ns, size, count)).rowcount
+            if updated:
+                conn.commit()
+        return True
+
+    def apply_delta(self, delta):
+        """TaskListCache listener: re-index only the tasks a delta touches"""
+        if delta.full:
+            # Initial scan: reconcile everything (unchanged files are not
+            # re-read); a large backlog is indexed in the background
+            self.refresh(background=True)
+        else:
+            self.refresh(delta.added + delta.modified + delta.removed)
+
+    # -- lookups -------------------------------------------------------------
+
+    def get(self, tid):
+        """Return the metadata dict for a task, indexing it on demand"""
+        with self._lock:
+            conn = self._connect()
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM tasks WHERE tid = ?", (tid,)).fetchone()
+            conn.row_factory = None
+            if row is None:
+                if not self.refresh([tid]):
+                    return None
+                return self.get(tid)
+            return dict(row)
+
+    def titles(self, task_ids):
+        """Return {task_id: title} for the given tasks"""
+        task_ids = list(task_ids)
+        with self._lock:
+            conn = self._connect()
+            if len(task_ids) <= MAX_LOOKUP_IDS:
+                # A page of the task list: look up just those rows
+                titles = dict(conn.execute(
+                    f"SELECT tid, title FROM tasks WHERE tid IN ({','.join('?' * len(task_ids))})", task_ids))
+            else:
+                titles = dict(conn.execute("SELECT tid, title FROM tasks"))
+        return {tid: titles.get(tid) or make_title(tid, "") for tid in task_ids}
@@ -0,0 +1,341 @@
+"""Several Roo tasks directories browsed as one.
+
+Tasks pile up under more than one VS Code build (Code, Code - Insiders,
+VSCodium), profile or synced home directory.  Each root keeps its own
+``TaskListCache`` (and watcher) and ``TaskIndex`` database; ``TaskRoots``
+merges their mtime-sorted listings and routes every other lookup straight to
+the root a task ID names, so adding a root costs the others nothing.
+
+Tasks of the first root keep their plain IDs, so existing links and caches
+stay valid; those of any further root are qualified as ``<label>:<id>``.
+The roots are the ``[label=]path`` entries of ``ROO_BROWSER_TASK_ROOTS``
+(separated like ``PATH``), else every Roo tasks directory found in the usual
+VS Code locations on macOS and Linux.
+"""
+import heapq
+import os
+import re
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+from task_cache import TaskDelta, TaskListCache, page_of, parse_cursor
+from task_index import TaskIndex, default_cache_dir
+
+ROOTS_ENV = "ROO_BROWSER_TASK_ROOTS"
+
+# Where each VS Code build keeps Roo's global storage, relative to $HOME
+EXTENSION_STORAGE = "globalStorage/rooveterinaryinc.roo-cline/tasks"
+CONFIG_DIRS = ("Library/Application Support", ".config")
+PRODUCTS = ("Code", "Code - Insiders", "VSCodium", "Cursor")
+
+# The original (macOS, stable VS Code) location, used when nothing is found
+DEFAULT_TASKS_DIR = Path.home() / CONFIG_DIRS[0] / PRODUCTS[0] / "User" / EXTENSION_STORAGE
+
+# Separates a root's label from the task ID
+SEPARATOR = ":"
+
+# Sorts after every task ID
+_LAST = "\U0010ffff"
+
+_LABEL_RE = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+RootSpec = namedtuple("RootSpec", "label path")
+
+
+def _slug(text):
+    return re.sub(r"[^a-z0-9_.]+", "-", text.lower()).strip("-") or "tasks"
+
+
+def default_label(path):
+    """A label for a tasks directory: its VS Code build (and profile) if it is Roo's, else its name"""
+    parts = Path(path).parts
+    if "User" in parts[1:]:
+        i = len(parts) - 1 - parts[::-1].index("User")
+        label = _slug(parts[i - 1])
+        if parts[i + 1:i + 2] == ("profiles",) and len(parts) > i + 2:
+            label += "-" + _slug(parts[i + 2])
+        return label
+    return _slug(Path(path).name)
+
+
+def discover_roots(home=None):
+    """Every existing Roo tasks directory under ``home``: each VS Code build, then its profiles"""
+    home = Path(home) if home else Path.home()
+    found = []
+    for config in CONFIG_DIRS:
+        for product in PRODUCTS:
+            user = home / config / product / "User"
+            if (user / EXTENSION_STORAGE).is_dir():
+                found.append(RootSpec(default_label(user / EXTENSION_STORAGE), user / EXTENSION_STORAGE))
+            try:
+                profiles = sorted(p for p in (user / "profiles").iterdir() if (p / EXTENSION_STORAGE).is_dir())
+            except OSError:
+                continue
+            found += [RootSpec(default_label(p / EXTENSION_STORAGE), p / EXTENSION_STORAGE) for p in profiles]
+    return found
+
+
+def configured_roots(specs=None):
+    """Roots from ``specs`` (``[label=]path`` strings), else $ROO_BROWSER_TASK_ROOTS, else discovered.
+
+    Labels default to ``default_label(path)`` and are made unique.
+    """
+    if specs is None:
+        specs = [s for s in os.environ.get(ROOTS_ENV, "").split(os.pathsep) if s.strip()]
+    roots = []
+    for spec in specs:
+        label, sep, path = spec.partition("=")
+        if not sep or not _LABEL_RE.match(label):
+            label, path = "", spec
+        path = Path(path.strip()).expanduser()
+        roots.append(RootSpec(label or default_label(path), path))
+    if not specs:
+        roots = discover_roots() or [RootSpec(default_label(DEFAULT_TASKS_DIR), DEFAULT_TASKS_DIR)]
+
+    unique, seen = [], set()
+    for label, path in roots:
+        name, n = label, 1
+        while name in seen:
+            n += 1
+            name = f"{label}-{n}"
+        seen.add(name)
+        unique.append(RootSpec(name, path))
+    return unique
+
+
+def as_tasks_dir(tasks_dir):
+    """``tasks_dir`` as something to join task IDs onto: a Path, or a TaskRoots as is"""
+    return tasks_dir if isinstance(tasks_dir, TaskRoots) else Path(tasks_dir)
+
+
+class TaskRoot:
+    """One tasks directory with its own listing cache, watcher and metadata index"""
+
+    def __init__(self, label, path, prefix, cache_dir=None):
+        self.label = label
+        self.path = Path(path)
+        # Prepended to this root's task IDs ("" for the first root)
+        self.prefix = prefix
+        cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        db_name = f"task_index-{label}.sqlite3" if prefix else "task_index.sqlite3"
+        self.cache = TaskListCache(self.path)
+        self.index = TaskIndex(self.path, cache_dir / db_name)
+        self.cache.subscribe(self.index.apply_delta)
+
+    def qualify(self, task_ids):
+        if not self.prefix:
+            return list(task_ids)
+        return [self.prefix + tid for tid in task_ids]
+
+    def local_key(self, key):
+        """This root's (-mtime, tid) sort key to resume after the merged key ``key``"""
+        if not self.prefix:
+            return key
+        neg_mtime, tid = key
+        if tid.startswith(self.prefix):
+            return neg_mtime, tid[len(self.prefix):]
+        # Every qualified ID of this root sorts on the same side of ``tid``
+        return neg_mtime, "" if tid < self.prefix else _LAST
+
+
+class TaskRoots:
+    """The task lists of several roots merged by mtime, with TaskListCache's listing API.
+
+    ``roots / tid`` is the directory of a (qualified) task ID, so code
+    written against one tasks directory works unchanged; ``index`` has
+    TaskIndex's lookup API over every root.
+    """
+
+    def __init__(self, specs, cache_dir=None):
+        self.roots = [TaskRoot(label, path, "" if i == 0 else label + SEPARATOR, cache_dir)
+                      for i, (label, path) in enumerate(specs)]
+        self._by_label = {root.label: root for root in self.roots[1:]}
+        self.index = MergedTaskIndex(self)
+        self._lock = threading.RLock()
+        self._started = False
+        self._listeners = []
+        self._snapshot = (None, ())
+        self._ranks = (None, {})
+        for root in self.roots:
+            root.cache.subscribe(lambda delta, root=root: self._forward(root, delta))
+
+    # -- routing -------------------------------------------------------------
+
+    def resolve(self, tid):
+        """The root a task ID belongs to, and the ID within that root"""
+        label, sep, local = tid.partition(SEPARATOR)
+        root = self._by_label.get(label) if sep else None
+        if root is None:
+            return self.roots[0], tid
+        return root, local
+
+    def __truediv__(self, tid):
+        root, local = self.resolve(tid)
+        return root.path / local
+
+    # -- listing API ---------------------------------------------------------
+
+    @property
+    def generation(self):
+        return sum(root.cache.generation for root in self.roots)
+
+    def _merged_keys(self, after=None, limit=None):
+        """Merged (-mtime, tid) keys after ``after``, at most ``limit`` of them"""
+        streams = []
+        for root in self.roots:
+            keys = root.cache.keys(root.local_key(after) if after else None, limit)
+            streams.append(keys if not root.prefix else [(neg, root.prefix + tid) for neg, tid in keys])
+        return list(islice(heapq.merge(*streams), limit))
+
+    def tasks(self):
+        """All task IDs of every root sorted by modification time (newest first)"""
+        self.start()
+        if len(self.roots) == 1:
+            return self.roots[0].cache.tasks()
+        generation, snapshot = self._snapshot
+        if generation != self.generation:
+            with self._lock:
+                generation = self.generation
+                snapshot = tuple(tid for _, tid in self._merged_keys())
+                self._snapshot = (generation, snapshot)
+        return snapshot
+
+    def ranks(self):
+        """Mapping of task ID -> position in ``tasks()``, rebuilt once per generation"""
+        self.start()
+        if len(self.roots) == 1:
+            return self.roots[0].cache.ranks()
+        generation, ranks = self._ranks
+        if generation != self.generation:
+            with self._lock:
+                generation = self.generation
+                ranks = {tid: i for i, tid in enumerate(self.tasks())}
+                self._ranks = (generation, ranks)
+        return ranks
+
+    def page(self, cursor=None, limit=100):
+        """Up to ``limit`` task IDs of ``tasks()`` after ``cursor``, and the cursor of the next page.
+
+        Same cursors as TaskListCache.page; each root contributes at most
+        ``limit + 1`` keys, so a page costs O(roots * (log n + limit)).
+        """
+        self.start()
+        return page_of(self._merged_keys(parse_cursor(cursor), limit + 1), limit)
+
+    def mtime(self, tid):
+        """Directory mtime of a task, or None if it is unknown"""
+        self.start()
+        root, local = self.resolve(tid)
+        return root.cache.mtime(local)
+
+    def has_task(self, tid):
+        """Check whether a task exists in the root its ID names"""
+        self.start()
+        root, local = self.resolve(tid)
+        return root.cache.has_task(local)
+
+    def subscribe(self, callback):
+        """Register ``callback(delta)`` for deltas of every root, with qualified IDs.
+
+        Called with one full delta once all roots are scanned, then per root delta.
+        """
+        with self._lock:
+            self._listeners.append(callback)
+            if self._started:
+                callback(TaskDelta(self._all_tasks(), [], [], True, self.generation))
+
+    def start(self):
+        """Scan every root concurrently and start their watchers (idempotent)"""
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            with ThreadPoolExecutor(len(self.roots), thread_name_prefix="task-root-scan") as pool:
+                for root, error in zip(self.roots, pool.map(self._start_root, self.roots)):
+                    if error:
+                        print(f"Error scanning tasks in {root.path}: {error}")
+            self._started = True
+            self._notify(TaskDelta(self._all_tasks(), [], [], True, self.generation))
+
+    def stop(self):
+        """Stop every root's watcher"""
+        for root in self.roots:
+            root.cache.stop()
+
+    # -- internals -----------------------------------------------------------
+
+    @staticmethod
+    def _start_root(root):
+        try:
+            root.cache.start()
+        except Exception as e:
+            return e
+        return None
+
+    def _all_tasks(self):
+        return [tid for root in self.roots for tid in root.qualify(root.cache.tasks())]
+
+    def _forward(self, root, delta):
+        # A root's own full delta (its initial scan) is folded into the one sent by start()
+        if delta.full:
+            return
+        self._notify(TaskDelta(root.qualify(delta.added), root.qualify(delta.removed),
+                               root.qualify(delta.modified), False, self.generation))
+
+    def _notify(self, delta):
+        for callback in self._listeners:
+            try:
+                callback(delta)
+            except Exception as e:
+                print(f"Error in task list listener: {e}")
+
+
+class MergedTaskIndex:
+    """TaskIndex's lookup API over the index of every root, by qualified task ID"""
+
+    def __init__(self, roots):
+        self._roots = roots
+
+    def get(self, tid):
+        """Return the metadata dict for a task, indexing it on demand"""
+        root, local = self._roots.resolve(tid)
+        meta = root.index.get(local)
+        if meta is not None:
+            meta["tid"] = tid
+        return meta
+
+    def titles(self, task_ids):
+        """Return {task_id: title} for the given tasks, looked up per root"""
+        task_ids = list(task_ids)
+        by_root = {}
+        for tid in task_ids:
+            root, local = self._roots.resolve(tid)
+            by_root.setdefault(root, {})[local] = tid
+        titles = {}
+        for root, locals_ in by_root.items():
+            for local, title in root.index.titles(locals_).items():
+                titles[locals_[local]] = title
+        return {tid: titles[tid] for tid in task_ids}
+
+    def record_count(self, path, mtime_ns, size, count):
+        """Store the message count of a task file in the index of the root holding it"""
+        for root in self._roots.roots:
+            if root.index.record_count(path, mtime_ns, size, count):
+                return True
+        return False
+
+    def progress(self):
+        """(done, total) summed over the roots with a bulk refresh running, else None"""
+        running = [p for p in (root.index.progress() for root in self._roots.roots) if p]
+        if not running:
+            return None
+        return sum(done for done, _ in running), sum(total for _, total in running)
+
+    def subscribe(self, callback):
+        """Register ``callback(task_ids)`` (qualified), called after each bulk batch of any root"""
+        for root in self._roots.roots:
+            root.index.subscribe(lambda task_ids, root=root: callback(root.qualify(task_ids)))
@@ -0,0 +1,288 @@
+"""Token and cost rollups of every task, for the analytics page.
+
+Roo logs each API request in ``ui_messages.json`` as a ``say:
+api_req_started`` message whose ``text`` is JSON holding ``tokensIn``,
+``tokensOut``, ``cacheWrites``, ``cacheReads`` and ``cost``; the model is
+named in the ``<model>`` tag of the environment details in the request text.
+Each changed file is parsed once in a background thread and reduced to one
+row per (task, day, model) plus a per-task total.  A (day, model) rollup
+over all tasks is adjusted by each task's difference as it is reindexed, so
+the analytics queries aggregate a few hundred rows however many tasks there
+are.
+"""
+import json
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from json_loader import load_json
+from task_index import default_cache_dir
+from task_roots import as_tasks_dir
+
+SCHEMA_VERSION = 2
+
+MODEL_RE = re.compile(r"<model>\s*([^<\s][^<]{0,199}?)\s*</model>")
+
+# Totals of a group of API requests
+Usage = namedtuple("Usage", "requests tokens_in tokens_out cache_writes cache_reads cost")
+# A group label (day, week start, model or task ID) with its totals
+UsageRow = namedtuple("UsageRow", "key requests tokens_in tokens_out cache_writes cache_reads cost")
+
+_SUMS = "SUM(requests), SUM(tokens_in), SUM(tokens_out), SUM(cache_writes), SUM(cache_reads), SUM(cost)"
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0
+
+
+def extract_usage(messages, default_ts=0):
+    """Reduce a ui_messages array to {(day, model): [six Usage fields]}.
+
+    Days are local dates; requests without a timestamp count on ``default_ts``
+    (epoch seconds).  A request that names no model inherits the previous one.
+    """
+    totals = {}
+    model = "unknown"
+    for msg in messages:
+        if not isinstance(msg, dict) or msg.get("say") != "api_req_started":
+            continue
+        try:
+            info = json.loads(msg.get("text") or "")
+        except (TypeError, ValueError):
+            continue
+        if not isinstance(info, dict):
+            continue
+        request = info.get("request")
+        if isinstance(request, str):
+            found = MODEL_RE.search(request)
+            if found:
+                model = found.group(1)
+        ts = msg.get("ts")
+        ts = ts / 1000 if isinstance(ts, (int, float)) and ts > 0 else default_ts
+        day = time.strftime("%Y-%m-%d", time.localtime(ts))
+        entry = totals.setdefault((day, model), [0, 0, 0, 0, 0, 0.0])
+        entry[0] += 1
+        entry[1] += _number(info.get("tokensIn"))
+        entry[2] += _number(info.get("tokensOut"))
+        entry[3] += _number(info.get("cacheWrites"))
+        entry[4] += _number(info.get("cacheReads"))
+        entry[5] += _number(info.get("cost"))
+    return totals
+
+
+class UsageIndex:
+    """Persistent per-task usage rollups, refreshed per changed ui_messages.json"""
+
+    def __init__(self, tasks_dir, db_path=None, documents=None):
+        # One directory, or a TaskRoots
+        self.tasks_dir = as_tasks_dir(tasks_dir)
+        # Optional DocumentCache: reuse documents the viewer already parsed
+        self.documents = documents
+        self.db_path = Path(db_path) if db_path else default_cache_dir() / "usage_index.sqlite3"
+        self._lock = threading.RLock()
+        self._conn = None
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._worker = None
+
+    # -- connection / schema -------------------------------------------------
+
+    def _connect(self):
+        if self._conn is not None:
+            return self._conn
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Error opening usage index at {self.db_path}: {e}")
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            conn.execute("DROP TABLE IF EXISTS usage_tasks")
+            conn.execute("DROP TABLE IF EXISTS usage_days")
+            conn.execute("DROP TABLE IF EXISTS usage_rollup")
+        # One row per task (file identity + totals) and per (task, day, model)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS usage_tasks (
+                tid TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                requests INTEGER NOT NULL,
+                tokens_in INTEGER NOT NULL,
+                tokens_out INTEGER NOT NULL,
+                cache_writes INTEGER NOT NULL,
+                cache_reads INTEGER NOT NULL,
+                cost REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS usage_days (
+                tid TEXT NOT NULL,
+                day TEXT NOT NULL,
+                model TEXT NOT NULL,
+                requests INTEGER NOT NULL,
+                tokens_in INTEGER NOT NULL,
+                tokens_out INTEGER NOT NULL,
+                cache_writes INTEGER NOT NULL,
+                cache_reads INTEGER NOT NULL,
+                cost REAL NOT NULL,
+                PRIMARY KEY (tid, day, model)
+            )
+        """)
+        # Sum of usage_days over all tasks
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS usage_rollup (
+                day TEXT NOT NULL,
+                model TEXT NOT NULL,
+                requests INTEGER NOT NULL,
+                tokens_in INTEGER NOT NULL,
+                tokens_out INTEGER NOT NULL,
+                cache_writes INTEGER NOT NULL,
+                cache_reads INTEGER NOT NULL,
+                cost REAL NOT NULL,
+                PRIMARY KEY (day, model)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS usage_tasks_by_cost ON usage_tasks (cost DESC)")
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+        self._conn = conn
+        return conn
+
+    # -- background indexing -------------------------------------------------
+
+    def apply_delta(self, delta):
+        """TaskListCache listener: queue the touched tasks for (re)indexing"""
+        if delta.full:
+            self._drop_missing(set(delta.added))
+            self.enqueue(delta.added)
+        else:
+            self.enqueue(delta.added + delta.modified + delta.removed)
+
+    def enqueue(self, task_ids):
+        with self._lock:
+            for tid in task_ids:
+                if tid not in self._pending:
+                    self._pending.add(tid)
+                    self._queue.put(tid)
+            if self._worker is None and self._pending:
+                self._worker = threading.Thread(target=self._run, name="usage-indexer", daemon=True)
+                self._worker.start()
+
+    def pending(self):
+        """Number of tasks waiting to be indexed"""
+        return len(self._pending)
+
+    def _run(self):
+        while True:
+            tid = self._queue.get()
+            with self._lock:
+                self._pending.discard(tid)
+            try:
+                self.index_task(tid)
+            except Exception as e:
+                print(f"Error indexing usage of {tid}: {e}")
+
+    def _drop_missing(self, present):
+        with self._lock:
+            conn = self._connect()
+            indexed = {tid for (tid,) in conn.execute("SELECT tid FROM usage_tasks")}
+            for tid in indexed - present:
+                self._delete(conn, tid)
+            conn.commit()
+
+    def _add_rollup(self, conn, rows, sign):
+        """Add (sign=1) or subtract (sign=-1) (day, model, six sums) rows to the rollup"""
+        # UPDATE, then INSERT the rows that were missing: upserts need SQLite 3.24+
+        for row in rows:
+            values = tuple(sign * value for value in row[2:])
+            updated = conn.execute(
+                "UPDATE usage_rollup SET requests = requests + ?, tokens_in = tokens_in + ?, "
+                "tokens_out = tokens_out + ?, cache_writes = cache_writes + ?, cache_reads = cache_reads + ?, "
+                "cost = cost + ? WHERE day = ? AND model = ?", values + tuple(row[:2])).rowcount
+            if not updated:
+                conn.execute("INSERT INTO usage_rollup VALUES (?,?,?,?,?,?,?,?)", tuple(row[:2]) + values)
+
+    def _delete(self, conn, tid):
+        old = conn.execute("SELECT day, model, requests, tokens_in, tokens_out, cache_writes, cache_reads, cost "
+                           "FROM usage_days WHERE tid = ?", (tid,)).fetchall()
+        if old:
+            self._add_rollup(conn, old, -1)
+            conn.execute("DELETE FROM usage_rollup WHERE requests <= 0")
+        conn.execute("DELETE FROM usage_tasks WHERE tid = ?", (tid,))
+        conn.execute("DELETE FROM usage_days WHERE tid = ?", (tid,))
+
+    def index_task(self, tid):
+        """Re-extract a task's usage if its ui_messages.json changed since it was last indexed"""
+        path = self.tasks_dir / tid / "ui_messages.json"
+        try:
+            st = path.stat()
+            stat = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            stat = None
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT mtime_ns, size FROM usage_tasks WHERE tid = ?", (tid,)).fetchone()
+        if row == stat:
+            return
+        totals = {}
+        if stat is not None:
+            # Parse outside the lock so queries are never blocked by big files
+            try:
+                if self.documents is not None:
+                    data = self.documents.load(path, store=False)
+                else:
+                    data = load_json(path)
+            except Exception as e:
+                print(f"Error indexing usage of {path}: {e}")
+                data = None
+            if isinstance(data, list):
+                totals = extract_usage(data, st.st_mtime)
+        with self._lock:
+            conn = self._connect()
+            self._delete(conn, tid)
+            if stat is not None:
+                sums = tuple(sum(entry[i] for entry in totals.values()) for i in range(6))
+                conn.execute("INSERT INTO usage_tasks VALUES (?,?,?,?,?,?,?,?,?)", (tid,) + stat + sums)
+                rows = [(day, model) + tuple(entry) for (day, model), entry in totals.items()]
+                conn.executemany("INSERT INTO usage_days VALUES (?,?,?,?,?,?,?,?,?)", [(tid,) + row for row in rows])
+                self._add_rollup(conn, rows, 1)
+            conn.commit()
+
+    # -- queries -------------------------------------------------------------
+
+    def _rows(self, sql, params=()):
+        with self._lock:
+            conn = self._connect()
+            return [UsageRow(key, *(value or 0 for value in rest)) for key, *rest in conn.execute(sql, params)]
+
+    def totals(self):
+        """Usage summed over every task"""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(f"SELECT {_SUMS} FROM usage_rollup").fetchone()
+        return Usage(*(value or 0 for value in row))
+
+    def by_day(self, limit=30):
+        """Totals of the ``limit`` most recent days with usage, newest first"""
+        return self._rows(f"SELECT day, {_SUMS} FROM usage_rollup GROUP BY day ORDER BY day DESC LIMIT ?", (limit,))
+
+    def by_week(self, limit=12):
+        """Totals per week (keyed by its Monday), newest first"""
+        return self._rows(f"SELECT date(day, 'weekday 0', '-6 days') AS week, {_SUMS} FROM usage_rollup "
+                          f"GROUP BY week ORDER BY week DESC LIMIT ?", (limit,))
+
+    def by_model(self):
+        """Totals per model, most expensive first"""
+        return self._rows(f"SELECT model, {_SUMS} FROM usage_rollup GROUP BY model ORDER BY SUM(cost) DESC")
+
+    def top_tasks(self, limit=20):
+        """The ``limit`` most expensive tasks, most expensive first"""
+        return self._rows("SELECT tid, requests, tokens_in, tokens_out, cache_writes, cache_reads, cost "
+                          "FROM usage_tasks WHERE requests > 0 ORDER BY cost DESC LIMIT ?", (limit,))
@@ -0,0 +1,100 @@
+"""Bounded worker pools that keep blocking request work off the event loop.
+
+Route handlers are ``async`` and hand their blocking part -- disk reads,
+JSON parsing, FT rendering -- to a ``WorkerPool``.  Heavy views and cheap
+queries use separate pools, so a slow render of a 100 MB history can only
+occupy the render pool's threads and never queues sidebar searches behind it.
+Each call has a timeout; a timed-out job keeps running and still fills the
+document and fragment caches, so a retry is usually instant.
+
+Threads rather than processes: parsed documents and the indexes live in this
+process and are shared by every request.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RequestTimeout(Exception):
+    """A pooled job did not finish within its timeout"""
+
+
+# Returned by next() once a pooled iteration is exhausted
+_DONE = object()
+
+
+def env_number(name, default, cast=float):
+    """Numeric setting from the environment, falling back to ``default``"""
+    try:
+        return cast(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+class WorkerPool:
+    """A fixed-size thread pool with per-call timeouts and simple counters"""
+
+    def __init__(self, name, max_workers, timeout):
+        self.name = name
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self.pending = 0  # submitted and not finished (queued + running)
+        self.completed = 0
+        self.cancelled = 0  # still queued at shutdown() and never run
+        self.timeouts = 0
+        self._closed = False
+
+    def _call(self, fn):
+        if self._closed:
+            # Still queued at shutdown(): dropped
+            with self._lock:
+                self.pending -= 1
+                self.cancelled += 1
+            raise RuntimeError(f"{self.name} pool is shut down")
+        try:
+            return fn()
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+
+    async def run(self, fn, *args, timeout=None, **kwargs):
+        """Run ``fn(*args, **kwargs)`` in the pool; raise RequestTimeout after ``timeout`` seconds"""
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            self.pending += 1
+        loop = asyncio.get_running_loop()
+        # Carry the request's context (e.g. its timing phases) into the thread
+        context = contextvars.copy_context()
+        future = loop.run_in_executor(self._executor, self._call,
+                                      functools.partial(context.run, fn, *args, **kwargs))
+        try:
+            # shield(): a timeout abandons the wait, not the job
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise RequestTimeout(f"{self.name} job timed out after {timeout:g}s") from None
+
+    async def iterate(self, iterable, timeout=None):
+        """Yield the items of a blocking iterable (e.g. a streamed response body), each produced in the pool.
+
+        Every item is one pooled job, so a stream holds a worker only while
+        it produces the next chunk and each chunk gets ``run``'s timeout;
+        RequestTimeout ends the stream.
+        """
+        iterator = iter(iterable)
+        while True:
+            item = await self.run(next, iterator, _DONE, timeout=timeout)
+            if item is _DONE:
+                return
+            yield item
+
+    def shutdown(self):
+        self._closed = True
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Benchmark response compression on rendered conversation fragments.
+
+Renders synthetic conversations of increasing size with the app's own
+renderer and reports, per encoding, the compressed size, the bytes saved and
+the CPU time it costs -- both for a whole response and for a streamed one
+(sync-flushed per message).
+
+    python bench/bench_compress.py --messages 50 500 2500
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+# Point the app at an empty HOME / cache so importing it touches nothing real
+_tmp = tempfile.mkdtemp(prefix="roo-bench-")
+os.environ["HOME"] = _tmp
+os.environ["ROO_BROWSER_CACHE_DIR"] = _tmp
+
+import main as app  # noqa: E402
+from compression import available_encodings, compress, compressor  # noqa: E402
+from fasthtml.common import to_xml  # noqa: E402
+
+VOCAB = ("the a to of and in for is that with update fix test error return import def class self "
+         "handler event request response file path config value result data index cache").split()
+
+SETTINGS = [("gzip", {"gzip_level": 1}), ("gzip", {"gzip_level": 6}), ("gzip", {"gzip_level": 9}),
+            ("br", {"brotli_quality": 4}), ("br", {"brotli_quality": 5}), ("br", {"brotli_quality": 11})]
+
+
+def make_api_history(count, seed=0):
+    """An api_conversation_history-like list mixing prose, code and tool calls"""
+    rng = random.Random(seed)
+
+    def prose(words):
+        return " ".join(rng.choice(VOCAB) if rng.random() < 0.8 else f"value_{rng.randint(0, 99999)}"
+                        for _ in range(words))
+
+    messages = []
+    for i in range(count):
+        if i % 2 == 0:
+            content = [{"type": "text", "text": f"<task>\n{prose(rng.randint(10, 60))}\n</task>"}]
+            messages.append({"role": "user", "content": content})
+        else:
+            code = "\n".join(f"    {prose(rng.randint(2, 8))}" for _ in range(rng.randint(5, 40)))
+            call = json.dumps({"tool": "write_to_file", "path": f"src/module_{rng.randint(0, 500)}.py",
+                               "content": f"def handler_{i}(event):\n{code}\n"})
+            content = [{"type": "text", "text": f"{prose(rng.randint(20, 120))}\n\n```python\n{code}\n```"},
+                       {"type": "text", "text": call}]
+            messages.append({"role": "assistant", "content": content})
+    return messages
+
+
+def timeit(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def streamed(chunks, encoding, options):
+    process, flush, finish = compressor(encoding, **options)
+    out = [process(chunk) + flush() for chunk in chunks]
+    out.append(finish())
+    return b"".join(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, nargs="+", default=[50, 500, 2500])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    encodings = available_encodings()
+    print(f"{'fragment':>10} {'encoding':<10} {'size':>10} {'saved':>7} {'whole':>9} {'streamed':>9} {'stream size':>12}")
+    for count in args.messages:
+        data = make_api_history(count)
+        chunks = [to_xml(part).encode("utf-8") for part in app.iter_messages(data, "api_conversation_history")]
+        body = b"".join(chunks)
+        print(f"{len(body) / 1024:>8.0f}KB {'identity':<10} {len(body):>10}")
+        for encoding, options in SETTINGS:
+            if encoding not in encodings:
+                continue
+            label = f"{encoding}-{next(iter(options.values()))}"
+            whole, packed = timeit(lambda: compress(body, encoding, **options), args.repeat)
+            stream, stream_packed = timeit(lambda: streamed(chunks, encoding, options), args.repeat)
+            saved = 1 - len(packed) / len(body)
+            print(f"{'':>10} {label:<10} {len(packed):>10} {saved:>6.1%} {whole * 1000:>7.1f}ms "
+                  f"{stream * 1000:>7.1f}ms {len(stream_packed):>12}")
+    if "br" not in encodings:
+        print("(brotli not installed: pip install brotli to include it)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Benchmark a cold-start metadata index build: serial vs a pool of reader threads.
+
+Generates a tasks directory of synthetic tasks (``corpus.py``), then builds
+the index from an empty database with the bulk refresh the server runs on
+first start, once per worker count.  Each build runs twice: with the OS page
+cache warm (CPU-bound extraction, where threads share the GIL) and with the
+task files evicted from it first (``posix_fadvise``), as on a first start
+after boot, where the prefix reads wait on the disk.  Also reports how soon
+the first batch of titles is stored.  Times are the best of ``--repeat``
+builds.
+
+    python bench/bench_index.py --tasks 10000 --workers 1 2 4 8 16
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+import corpus  # noqa: E402
+import task_index as task_index_module  # noqa: E402
+from task_index import TaskIndex  # noqa: E402
+
+
+def evict(tasks_dir):
+    """Drop the task files from the OS page cache (needs posix_fadvise, i.e. Linux)"""
+    for path in tasks_dir.glob("*/*.json"):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def build(tasks_dir, db_path, workers, cold=False):
+    """(seconds until the first batch is stored, seconds until indexed)"""
+    if cold:
+        evict(tasks_dir)
+    if db_path.exists():
+        db_path.unlink()
+    index = TaskIndex(tasks_dir, db_path, workers=workers)
+    # Every build goes through the bulk path, as on a first start
+    task_index_module.MIN_PARALLEL_TASKS = 1
+    first_at = []
+    index.subscribe(lambda task_ids: first_at or first_at.append(time.perf_counter()))
+    start = time.perf_counter()
+    index.refresh()
+    done = time.perf_counter() - start
+    index.close()
+    return first_at[0] - start, done
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dir", help="where to generate the corpus (must not be tmpfs for cold runs)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        tasks_dir = Path(tmp) / "tasks"
+        start = time.perf_counter()
+        corpus.generate(tasks_dir, args.tasks, messages=(2, 50), image_fraction=0)
+        print(f"generated {args.tasks} tasks in {time.perf_counter() - start:.1f}s, {os.cpu_count()} CPUs")
+        db_path = Path(tmp) / "index.sqlite3"
+        build(tasks_dir, db_path, 1)  # warm the page cache and the imports
+        print(f"{'workers':>7} {'warm 1st':>9} {'warm all':>9} {'cold 1st':>9} {'cold all':>9}")
+        can_evict = hasattr(os, "posix_fadvise")
+        for workers in args.workers:
+            columns = []
+            for cold in (False, True) if can_evict else (False,):
+                runs = [build(tasks_dir, db_path, workers, cold) for _ in range(args.repeat)]
+                columns.append(f"{min(r[0] for r in runs):>8.3f}s {min(r[1] for r in runs):>8.2f}s")
+            print(f"{workers:>7} " + " ".join(columns))
+
+
+if __name__ == "__main__":
+    main()
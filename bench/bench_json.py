@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Benchmark loading large histories: json.load vs the mmap loader per decoder.
+
+Writes synthetic api_conversation_history.json files of the given sizes
+(``corpus.py`` messages, including base64 images) and parses each one in a
+fresh process per method, reporting the median parse time, the peak RSS
+growth over the process baseline and the peak Python heap (tracemalloc, in
+a separate untimed pass).  RSS counts mapped file pages too; those are page
+cache the OS can reclaim, the heap is not.  The method the app uses with
+the current settings is marked with ``*``.
+
+    python bench/bench_json.py --sizes 10 50 200
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+import corpus  # noqa: E402
+from json_loader import DECODER, DECODERS, USE_MMAP, load_json  # noqa: E402
+
+
+def stdlib_load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def loader(name, use_mmap):
+    return lambda path: load_json(path, name, use_mmap)
+
+
+METHODS = {
+    "json.load": stdlib_load,
+    **{f"load_json:{name} ({'mmap' if use_mmap else 'read'})": loader(name, use_mmap)
+       for name in DECODERS for use_mmap in (True, False)},
+}
+
+# What load_json does with the current ROO_BROWSER_JSON_DECODER / ROO_BROWSER_MMAP
+SHIPPED = f"load_json:{DECODER} ({'mmap' if USE_MMAP else 'read'})"
+
+
+def proc_status_kb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def make_history(path, size_mb, seed=0):
+    """Repeat a block of generated messages until the file is about ``size_mb``"""
+    writer = corpus.TaskWriter(seed=seed)
+    block = writer.api_history(400, writer.words(20))
+    block_size = len(json.dumps(block))
+    repeats = max(1, int(size_mb * 1024 * 1024 / block_size))
+    Path(path).write_text(json.dumps(block * repeats), encoding="utf-8")
+
+
+def run_child(path, method, repeat):
+    """Child process: parse ``path`` ``repeat`` times; print time, peak RSS growth and peak heap"""
+    load = METHODS[method]
+    base = proc_status_kb("VmRSS")
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = load(path)
+        samples.append(time.perf_counter() - start)
+        del data
+    peak = proc_status_kb("VmHWM") - base
+    tracemalloc.start()
+    data = load(path)
+    heap = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del data
+    print(json.dumps({"median_s": statistics.median(samples), "peak_mb": peak / 1024,
+                      "heap_mb": heap / 1024 / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=float, nargs="+", default=[10, 50, 200], help="file sizes in MB")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child, args.repeat)
+        return
+
+    print(f"decoders: {', '.join(DECODERS)}")
+    print(f"{'size':>7} {'method':<28} {'parse':>9} {'peak RSS':>10} {'peak heap':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = Path(tmp) / f"history-{size:g}.json"
+            make_history(path, size)
+            actual = path.stat().st_size / 1024 / 1024
+            baseline = None
+            for method in METHODS:
+                out = subprocess.run([sys.executable, __file__, "--child", str(path), method,
+                                      "--repeat", str(args.repeat)], capture_output=True, text=True, check=True)
+                result = json.loads(out.stdout)
+                baseline = baseline or result["median_s"]
+                label = method + (" *" if method == SHIPPED else "")
+                print(f"{actual:>6.0f}M {label:<28} {result['median_s'] * 1000:>7.0f}ms "
+                      f"{result['peak_mb']:>8.0f}MB {result['heap_mb']:>8.0f}MB  {baseline / result['median_s']:.1f}x")
+            path.unlink()
+
+
+if __name__ == "__main__":
+    main()
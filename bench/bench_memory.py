@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Report the memory held per task by the task metadata caches.
+
+Creates ``--tasks`` task directories (two small files each) with synthetic
+titles and measures, with tracemalloc, the bytes per task of:
+
+* the listing: naively one dict per task with its Path, directory mtime
+  and both files' mtimes, sizes and message counts, against TaskListCache's
+  ID, mtime and stat signature columns, mtime order and task ID tuple
+* the titles: naively each title with a set of its tokens, against
+  TitleSearchIndex (normalized titles, interned tokens, postings, n-grams)
+
+The naive titles have no search structures at all, so that comparison
+understates the saving.
+
+    python bench/bench_memory.py --tasks 100000
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from bench_search import make_titles  # noqa: E402
+from search_index import TitleSearchIndex  # noqa: E402
+from task_cache import WATCHED_FILES, TaskListCache  # noqa: E402
+
+
+def measure(build):
+    """(object built by ``build()``, bytes it still holds)"""
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    built = build()
+    gc.collect()
+    return built, tracemalloc.get_traced_memory()[0] - before
+
+
+def naive_listing(tasks_dir):
+    rows = {}
+    for item in tasks_dir.iterdir():
+        row = {"tid": item.name, "path": item, "mtime": item.stat().st_mtime}
+        for prefix, name in zip(("ui", "api"), WATCHED_FILES):
+            st = (item / name).stat()
+            row.update({f"{prefix}_mtime_ns": st.st_mtime_ns, f"{prefix}_size": st.st_size, f"{prefix}_count": 0})
+        rows[item.name] = row
+    return rows
+
+
+def naive_titles(titles):
+    # Copies, as if read from the index database
+    return {tid: (title[:], frozenset(title.lower().split())) for tid, title in titles.items()}
+
+
+def build_title_index(titles):
+    index = TitleSearchIndex()
+    index.update_many(titles)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=20000)
+    args = parser.parse_args()
+
+    titles = make_titles(args.tasks)
+    with tempfile.TemporaryDirectory() as tmp:
+        tasks_dir = Path(tmp)
+        for tid in titles:
+            os.mkdir(tasks_dir / tid)
+            for name in WATCHED_FILES:
+                (tasks_dir / tid / name).write_text("[]")
+
+        tracemalloc.start()
+        rows, naive_listing_bytes = measure(lambda: naive_listing(tasks_dir))
+        del rows
+        rows, naive_title_bytes = measure(lambda: naive_titles(titles))
+        del rows
+        cache = TaskListCache(tasks_dir, poll_interval=3600, use_watchfiles=False)
+        _, cache_bytes = measure(lambda: cache.start() or cache)
+        index, index_bytes = measure(lambda: build_title_index(titles))
+        tracemalloc.stop()
+        cache.stop()
+
+    n = args.tasks
+    print(f"{n} tasks, bytes per task {'naive':>10} {'compact':>10}")
+    for name, before, after in (("listing (TaskListCache)", naive_listing_bytes, cache_bytes),
+                                ("titles (TitleSearchIndex)", naive_title_bytes, index_bytes),
+                                ("total", naive_listing_bytes + naive_title_bytes, cache_bytes + index_bytes)):
+        print(f"  {name:<26} {before / n:>10.0f} {after / n:>10.0f}  {before / after:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Benchmark random access into large histories through the offset index.
+
+For synthetic api_conversation_history.json files of the given sizes, times
+the one-off offset scan, reopening from the side file, and fetching a single
+message (first, middle, last) by seeking, against parsing the whole file.
+
+    python bench/bench_offsets.py --sizes 10 50 200
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from bench_json import make_history  # noqa: E402
+from json_loader import load_json  # noqa: E402
+from offset_index import OffsetIndex  # noqa: E402
+
+
+def median_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=float, nargs="+", default=[10, 50, 200], help="file sizes in MB")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'size':>7} {'messages':>9} {'full parse':>11} {'scan':>9} {'reopen':>9} {'first':>8} "
+          f"{'middle':>8} {'last':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = Path(tmp) / f"history-{size:g}.json"
+            make_history(path, size)
+            actual = path.stat().st_size / 1024 / 1024
+            parse = median_ms(lambda: load_json(path), max(1, args.repeat // 2))
+            index = OffsetIndex(Path(tmp) / "offsets")
+            start = time.perf_counter()
+            with index.open(path) as messages:
+                count = len(messages)
+            scan = (time.perf_counter() - start) * 1000
+
+            def reopen():
+                index.clear()
+                index.open(path).close()
+
+            def fetch(i):
+                with index.open(path) as messages:
+                    messages[i]
+
+            print(f"{actual:>6.0f}M {count:>9} {parse:>9.1f}ms {scan:>7.1f}ms {median_ms(reopen, args.repeat):>7.2f}ms "
+                  + " ".join(f"{median_ms(lambda: fetch(i), args.repeat):>6.2f}ms"
+                             for i in (0, count // 2, count - 1)))
+            index.invalidate(path)
+            path.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Benchmark several task roots merged by TaskRoots.
+
+Generates ``--roots`` tasks directories of ``--tasks`` small tasks each and,
+for 1, 2, 4 ... of them, times the concurrent cold scan and the lookups the
+sidebar makes: a page of the merged list (first and deep), a title lookup
+for that page, and ``has_task`` / metadata lookups of a first-root task,
+which should not depend on how many other roots there are.
+
+    python bench/bench_roots.py --roots 8 --tasks 2000
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+import corpus  # noqa: E402
+from task_roots import RootSpec, TaskRoots  # noqa: E402
+
+
+def median_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--roots", type=int, default=8, help="largest number of roots")
+    parser.add_argument("--tasks", type=int, default=2000, help="tasks per root")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    counts = [1]
+    while counts[-1] * 2 <= args.roots:
+        counts.append(counts[-1] * 2)
+    print(f"{'roots':>5} {'tasks':>7} {'cold scan':>10} {'page 1':>8} {'deep page':>10} {'titles':>8} "
+          f"{'has_task':>9} {'get':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        specs = []
+        for i in range(counts[-1]):
+            path = Path(tmp) / f"root{i}"
+            corpus.generate(path, args.tasks, messages=(2, 6), content_kb=0.2, json_fraction=0,
+                            image_fraction=0, seed=i)
+            specs.append(RootSpec(f"root{i}", path))
+
+        for n in counts:
+            roots = TaskRoots(specs[:n], cache_dir=Path(tmp) / f"cache{n}")
+            start = time.perf_counter()
+            roots.start()
+            while roots.index.progress():
+                time.sleep(0.01)
+            scan = (time.perf_counter() - start) * 1000
+            tasks = roots.tasks()
+            page, _ = roots.page(limit=100)
+            _, deep = roots.page(limit=len(tasks) // 2)
+            probe = roots.roots[0].cache.tasks()[args.tasks // 2]
+            print(f"{n:>5} {len(tasks):>7} {scan:>8.0f}ms "
+                  f"{median_ms(lambda: roots.page(limit=100), args.repeat):>6.3f}ms "
+                  f"{median_ms(lambda: roots.page(deep, 100), args.repeat):>8.3f}ms "
+                  f"{median_ms(lambda: roots.index.titles(page), args.repeat):>6.3f}ms "
+                  f"{median_ms(lambda: roots.has_task(probe), args.repeat * 10):>7.4f}ms "
+                  f"{median_ms(lambda: roots.index.get(probe), args.repeat):>6.3f}ms")
+            roots.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Benchmark sidebar search: linear fuzzy_match scan vs TitleSearchIndex.
+
+Builds synthetic task titles, checks that both paths rank identically and
+reports median per-query latency.
+
+    python bench/bench_search.py --tasks 50000 --top 50
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from search_index import TitleSearchIndex, fuzzy_match  # noqa: E402
+
+COMMON = ("add fix refactor update remove implement debug the a of to in for and with "
+          "test tests error api module").split()
+TOPICS = ("payment gateway database migration schema integration search index cache render "
+          "sidebar layout python javascript typescript config deploy docker build pipeline "
+          "handling retry logging metrics user auth token session endpoint route").split()
+
+QUERIES = ["payment", "pay", "gateway module", "refactor the payment", "databa", "migr schema",
+           "unit tests", "xyz", "fix auth token", "docker build pipeline", "ident42"]
+
+
+def make_titles(count, seed=0):
+    """Titles mixing common words, topic words and a long tail of identifiers"""
+    rng = random.Random(seed)
+    tail = [f"ident{i}" for i in range(count // 2)]
+    titles = {}
+    for i in range(count):
+        words = []
+        for _ in range(rng.randint(3, 25)):
+            r = rng.random()
+            if r < 0.5:
+                words.append(rng.choice(COMMON))
+            elif r < 0.6:
+                words.append(rng.choice(TOPICS))
+            else:
+                # Zipf-ish long tail: low indexes are much more frequent
+                words.append(tail[int(len(tail) * rng.random() ** 3)])
+        titles[f"task-{i:06d}"] = " ".join(words)
+    return titles
+
+
+def linear_search(titles, order, query):
+    matched = []
+    for tid in order:
+        is_match, score = fuzzy_match(titles[tid], query)
+        if is_match:
+            matched.append((tid, score))
+    matched.sort(key=lambda x: x[1], reverse=True)
+    return [tid for tid, _ in matched]
+
+
+def median_time(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=50000)
+    parser.add_argument("--top", type=int, default=50, help="results per page (top-k)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    titles = make_titles(args.tasks)
+    order = list(titles)
+    ranks = {tid: i for i, tid in enumerate(order)}
+
+    start = time.perf_counter()
+    index = TitleSearchIndex()
+    index.update_many(titles)
+    print(f"indexed {len(titles)} titles in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    print(f"{'query':<24} {'matches':>8} {'linear':>10} {'index':>10} {'index top-k':>12}")
+    for query in QUERIES:
+        linear, expected = median_time(lambda: linear_search(titles, order, query), args.repeat)
+        full, got = median_time(lambda: index.search(query, ranks), args.repeat)
+        top, got_top = median_time(lambda: index.search(query, ranks, limit=args.top), args.repeat)
+        assert got == expected and got_top == expected[:args.top], query
+        print(f"{query:<24} {len(expected):>8} {linear * 1000:>8.2f}ms {full * 1000:>8.2f}ms "
+              f"{top * 1000:>10.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Benchmark file views: buffered render vs streamed response of the same messages.
+
+Starts the app under uvicorn against a synthetic task in a temporary HOME,
+once per mode in a fresh server process, and reports time to first byte,
+total time and the server's peak resident memory (Linux only).  The buffered
+mode is the messages route, which renders the same messages as the stream
+without the page's loaders and follow control; the two bodies are checked to
+hold the same markup (they differ only in indentation).
+
+    python bench/bench_stream.py --messages 500 --kb 12
+"""
+import argparse
+import http.client
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+TASKS_SUBDIR = "Library/Application Support/Code/User/globalStorage/rooveterinaryinc.roo-cline/tasks"
+
+
+def write_task(home, messages, kb):
+    """Write one task whose ui_messages.json has ``messages`` messages of ~``kb`` KB"""
+    task_dir = Path(home) / TASKS_SUBDIR / "task-stream"
+    task_dir.mkdir(parents=True)
+    body = "Some assistant output with <html> & `code`\n" * (kb * 1024 // 44)
+    data = [{"ts": i, "type": "say", "say": "text", "text": body} for i in range(messages)]
+    (task_dir / "ui_messages.json").write_text(json.dumps(data), encoding="utf-8")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def peak_rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def wait_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+def measure(home, path):
+    """Fetch ``path`` from a fresh server; return (ttfb, total, body, peak RSS MB)"""
+    port = free_port()
+    env = dict(os.environ, HOME=home, ROO_BROWSER_CACHE_DIR=str(Path(home) / "cache"))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR, env=env)
+    try:
+        wait_ready(port)
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        start = time.perf_counter()
+        conn.request("GET", path, headers={"HX-Request": "true"})
+        resp = conn.getresponse()
+        body = resp.read(1)
+        ttfb = time.perf_counter() - start
+        body += resp.read()
+        total = time.perf_counter() - start
+        conn.close()
+        return ttfb, total, body, peak_rss_mb(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500, help="messages in the file (max page is 500)")
+    parser.add_argument("--kb", type=int, default=12,
+                        help="approximate size of each message (over 16 only placeholders are rendered)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        write_task(home, args.messages, args.kb)
+        print(f"{'mode':<10} {'ttfb':>10} {'total':>10} {'bytes':>12} {'peak RSS':>10}")
+        markup = []
+        for mode, path in (("buffered", f"ui_messages/messages?start=0&stop={args.messages}"),
+                           ("streamed", "ui_messages?stream=true")):
+            ttfb, total, body, rss = measure(home, f"/task/task-stream/{path}")
+            print(f"{mode:<10} {ttfb * 1000:>8.1f}ms {total * 1000:>8.1f}ms {len(body):>12} {rss:>8.1f}MB")
+            markup.append(re.sub(rb">\s+<", b"><", body).strip())
+        print("same markup" if markup[0] == markup[1] else "MARKUP DIFFERS")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""End-to-end benchmark suite over synthetic corpora of several sizes.
+
+For each scale a corpus is generated with ``corpus.py`` and the app is
+imported against it in a fresh process (the app binds its tasks directory at
+import).  The suite times the cold index build and then the hot paths: the
+task list, title lookup, the ``fuzzy_match`` scan and the indexed sidebar
+search, the usage analytics page, content search, and loading / viewing /
+rendering a large task, the latter both cold (document and fragment caches
+cleared) and warm, and fetching one of its messages by offset.
+
+Results are written as JSON tagged with the git commit, so two runs can be
+compared:
+
+    python bench/bench_suite.py --scales 100 1000 5000 --out before.json
+    git checkout my-branch
+    python bench/bench_suite.py --scales 100 1000 5000 --out after.json --compare before.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import corpus
+
+REPO = Path(__file__).resolve().parent.parent
+# Medians below this are timer noise and never reported as a change
+NOISE_MS = 0.05
+QUERIES = ["payment", "gateway module", "databa", "fix auth token", "value_42", "xyz"]
+
+
+def summarize(samples):
+    """Milliseconds: median, p95 (nearest rank), min and sample count"""
+    ms = sorted(s * 1000 for s in samples)
+    p95 = ms[math.ceil(0.95 * len(ms)) - 1]
+    return {"median_ms": round(statistics.median(ms), 4), "p95_ms": round(p95, 4),
+            "min_ms": round(ms[0], 4), "n": len(ms)}
+
+
+def timed(fn, repeat, before=None):
+    """Seconds per call of ``fn()``; ``before()`` runs untimed ahead of each call"""
+    samples = []
+    for _ in range(repeat):
+        if before:
+            before()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def wait_for(done, limit=600):
+    """Seconds until ``done()`` is true"""
+    start = time.perf_counter()
+    while not done() and time.perf_counter() - start < limit:
+        time.sleep(0.01)
+    return time.perf_counter() - start
+
+
+def run_scale(repeat):
+    """Child process: measure the app against the corpus under $HOME; returns the ops dict"""
+    sys.path.insert(0, str(REPO / "app"))
+    start = time.perf_counter()
+    import main as app
+    from fasthtml.common import to_xml
+    from search_index import fuzzy_match
+    from starlette.testclient import TestClient
+
+    ops = {}
+    tasks = app.get_task_dirs()
+    wait_for(lambda: app.task_index.progress() is None)
+    ops["startup_index"] = summarize([time.perf_counter() - start])
+    ops["content_index_build"] = summarize([wait_for(lambda: app.content_index.pending() == 0)])
+
+    ops["get_task_dirs"] = summarize(timed(app.get_task_dirs, repeat * 10))
+    sample = tasks[::max(1, len(tasks) // 200)]
+    ops["get_task_title"] = summarize(timed(lambda: [app.get_task_title(t) for t in sample], repeat))
+    ops["get_task_title"]["per_call"] = True
+    for key in ("median_ms", "p95_ms", "min_ms"):
+        ops["get_task_title"][key] = round(ops["get_task_title"][key] / len(sample), 4)
+
+    titles = app.task_index.titles(tasks)
+    scan = lambda q: [t for t in tasks if fuzzy_match(titles[t], q)[0]]
+    ops["fuzzy_match_scan"] = summarize([s for q in QUERIES for s in timed(lambda: scan(q), repeat)])
+
+    client = TestClient(app.app)
+    hx = {"HX-Request": "true"}
+    ops["search_route"] = summarize([s for q in QUERIES for s in timed(
+        lambda: client.get("/search", params={"q": q}, headers=hx), repeat)])
+    ops["index_route"] = summarize(timed(lambda: client.get("/"), repeat))
+    _, cursor = app.get_task_page(limit=len(tasks) // 2 or 1)
+    ops["task_page_route"] = summarize(timed(
+        lambda: client.get("/task_page", params={"cursor": cursor or ""}, headers=hx), repeat))
+    wait_for(lambda: app.usage_index.pending() == 0)
+    ops["analytics_route"] = summarize(timed(lambda: client.get("/analytics"), repeat))
+    ops["content_search"] = summarize([s for q in QUERIES[:4] for s in timed(
+        lambda: app.content_index.search(q), repeat)])
+
+    # The largest task stands in for the long conversations that dominate view latency
+    tid = max(tasks, key=lambda t: (app.task_roots / t / "ui_messages.json").stat().st_size)
+
+    def clear():
+        app.fragment_cache.clear()
+        app.doc_cache.clear()
+
+    for name, url in (("load_task", f"/load_task/{tid}"), ("view", f"/task/{tid}/api_conversation_history")):
+        ops[f"{name}_cold"] = summarize(timed(lambda: client.get(url, headers=hx), repeat, before=clear))
+        ops[f"{name}_warm"] = summarize(timed(lambda: client.get(url, headers=hx), repeat))
+
+    with app.offset_index.open(app.task_roots / tid / "api_conversation_history.json") as messages:
+        middle = len(messages) // 2
+    ops["message_route"] = summarize(timed(lambda: client.get(
+        f"/task/{tid}/api_conversation_history/messages", params={"start": middle, "format": "json"}), repeat))
+
+    data = app.doc_cache.load(app.task_roots / tid / "ui_messages.json")
+    ops["render_messages"] = summarize(timed(lambda: to_xml(app.render_messages(data, "ui_messages")), repeat))
+    app.render_pool.shutdown()
+    app.query_pool.shutdown()
+    return ops
+
+
+def git_info():
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=REPO, capture_output=True, text=True).stdout.strip()
+        except OSError:
+            return ""
+    return {"commit": git("rev-parse", "--short", "HEAD"), "subject": git("log", "-1", "--format=%s"),
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def measure(scale, args, workdir):
+    """Generate (or reuse) the corpus for ``scale`` and measure it in a fresh process"""
+    home = Path(workdir) / f"home-{scale}"
+    tasks_dir = corpus.tasks_dir_for(home)
+    if not tasks_dir.exists():
+        start = time.perf_counter()
+        corpus.generate(tasks_dir, scale, messages=tuple(args.messages), content_kb=args.content_kb,
+                        json_fraction=args.json_fraction, image_fraction=args.image_fraction, seed=args.seed)
+        print(f"  generated {scale} tasks in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    cache = Path(tempfile.mkdtemp(prefix="cache-", dir=workdir))  # cold index every run
+    env = dict(os.environ, HOME=str(home), ROO_BROWSER_CACHE_DIR=str(cache))
+    proc = subprocess.run([sys.executable, __file__, "--child", "--repeat", str(args.repeat)],
+                          env=env, capture_output=True, text=True)
+    if proc.returncode:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(f"benchmark failed at scale {scale}")
+    files = list(tasks_dir.glob("*/*.json"))
+    return {"corpus": {"tasks": scale, "files": len(files), "bytes": sum(f.stat().st_size for f in files)},
+            "ops": json.loads(proc.stdout.strip().splitlines()[-1])}
+
+
+def compare(old, new, threshold):
+    """Print (to stderr) median ratios new/old per scale and op; returns the number of regressions"""
+    regressions = 0
+    out = sys.stderr
+    print(f"\n{old['meta']['commit'] or 'old'} -> {new['meta']['commit'] or 'new'} (median, ms)", file=out)
+    print(f"{'scale':>7} {'op':<22} {'old':>10} {'new':>10} {'ratio':>7}", file=out)
+    for scale, result in new["scales"].items():
+        before = old["scales"].get(scale)
+        if not before:
+            continue
+        for op, stats in result["ops"].items():
+            if op not in before["ops"]:
+                continue
+            a, b = before["ops"][op]["median_ms"], stats["median_ms"]
+            ratio = b / a if a else float("inf")
+            flag = ""
+            if max(a, b) < NOISE_MS:
+                pass
+            elif ratio > 1 + threshold:
+                flag = "  slower"
+                regressions += 1
+            elif ratio < 1 - threshold:
+                flag = "  faster"
+            print(f"{scale:>7} {op:<22} {a:>10.4f} {b:>10.4f} {ratio:>6.2f}x{flag}", file=out)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[100, 1000, 5000], help="task counts")
+    parser.add_argument("--messages", type=int, nargs=2, default=[10, 200], metavar=("MIN", "MAX"))
+    parser.add_argument("--content-kb", type=float, default=2.0)
+    parser.add_argument("--json-fraction", type=float, default=0.3)
+    parser.add_argument("--image-fraction", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5, help="samples per measurement")
+    parser.add_argument("--corpus-dir", help="keep generated corpora here and reuse them across runs")
+    parser.add_argument("--out", help="write JSON results to this file (default: stdout)")
+    parser.add_argument("--compare", help="earlier results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="ratio change reported as a regression")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_scale(args.repeat)))
+        return
+
+    results = {"meta": {**git_info(), "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                        "python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count(), "repeat": args.repeat,
+                        "corpus": {"messages": args.messages, "content_kb": args.content_kb,
+                                   "json_fraction": args.json_fraction, "image_fraction": args.image_fraction,
+                                   "seed": args.seed}},
+               "scales": {}}
+    with tempfile.TemporaryDirectory(prefix="roo-bench-") as tmp:
+        workdir = Path(args.corpus_dir or tmp)
+        workdir.mkdir(parents=True, exist_ok=True)
+        for scale in args.scales:
+            print(f"scale {scale}...", file=sys.stderr)
+            results["scales"][str(scale)] = measure(scale, args, workdir)
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        regressions = compare(json.loads(Path(args.compare).read_text()), results, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Benchmark task-title extraction: full json.load vs the bounded prefix reader.
+
+Writes synthetic ui_messages.json files of increasing size to a temporary
+directory and times extracting the first message text both ways.
+
+    python bench/bench_title.py --sizes 0.005 0.5 5 50
+"""
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from json_stream import read_first_element  # noqa: E402
+from task_index import extract_first_text  # noqa: E402
+
+
+def write_ui_messages(path, target_mb):
+    """Write a ui_messages.json of roughly ``target_mb`` megabytes"""
+    messages = [{"ts": 0, "type": "say", "say": "text",
+                 "text": "Refactor the payment gateway module and add retries"}]
+    body = "Some assistant output with `code` and\nnewlines.\n" * 40
+    target = int(target_mb * 1024 * 1024)
+    size = 0
+    i = 1
+    while size < target:
+        msg = {"ts": i, "type": "say", "say": "text", "text": body, "partial": False}
+        messages.append(msg)
+        size += len(json.dumps(msg)) + 1
+        i += 1
+    path.write_text(json.dumps(messages), encoding="utf-8")
+
+
+def title_full_parse(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return extract_first_text(data[0] if isinstance(data, list) and data else None)
+
+
+def title_prefix(path):
+    return extract_first_text(read_first_element(path))
+
+
+def timeit(fn, path, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(path)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=float, nargs="+", default=[0.005, 0.5, 5, 50],
+                        help="file sizes in MB")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'size':>10}  {'full parse':>12}  {'prefix read':>12}  {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mb in args.sizes:
+            path = Path(tmp) / f"ui_{mb}.json"
+            write_ui_messages(path, mb)
+            assert title_full_parse(path) == title_prefix(path)
+            full = timeit(title_full_parse, path, args.repeat)
+            prefix = timeit(title_prefix, path, args.repeat)
+            size = path.stat().st_size / (1024 * 1024)
+            print(f"{size:>8.3f}MB  {full * 1000:>10.2f}ms  {prefix * 1000:>10.3f}ms  {full / prefix:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""Generate a synthetic Roo tasks directory for benchmarks.
+
+Each task gets a ``ui_messages.json`` and an ``api_conversation_history.json``
+shaped like the ones Roo writes: ``say``/``ask`` UI events whose ``text`` is
+often an embedded JSON string (``api_req_started`` with token counts, tool
+calls), assistant turns with Markdown and code, tool results carrying file
+contents, and optional base64 screenshots.  Output is deterministic for a
+given seed.
+
+    python bench/corpus.py /tmp/corpus --tasks 1000 --messages 10 200 --content-kb 2
+    HOME=/tmp/corpus python app/main.py   # browse it
+"""
+import argparse
+import base64
+import json
+import os
+import random
+from pathlib import Path
+
+# Where Roo keeps its tasks, relative to $HOME (the root app/task_roots.py finds first)
+TASKS_SUBDIR = "Library/Application Support/Code/User/globalStorage/rooveterinaryinc.roo-cline/tasks"
+
+WORDS = ("the a to of and in for is that with update fix test error return import def class self "
+         "handler event request response file path config value result data index cache payment "
+         "gateway module database migration search render sidebar python javascript deploy build "
+         "pipeline retry logging metrics user auth token session endpoint route").split()
+MODELS = ("anthropic/claude-sonnet-4", "openai/gpt-4.1", "google/gemini-2.5-pro")
+TOOLS = ("read_file", "write_to_file", "apply_diff", "search_files", "list_files", "execute_command")
+
+
+def tasks_dir_for(home):
+    """The tasks directory the app uses when $HOME is ``home``"""
+    return Path(home) / TASKS_SUBDIR
+
+
+class TaskWriter:
+    """Writes tasks with a given shape; all randomness comes from ``seed``"""
+
+    def __init__(self, messages=(10, 200), content_kb=2.0, json_fraction=0.3, image_fraction=0.02,
+                 image_kb=64, seed=0):
+        self.messages = messages
+        self.content_kb = content_kb
+        self.json_fraction = json_fraction
+        self.image_fraction = image_fraction
+        self.image_kb = image_kb
+        self.rng = random.Random(seed)
+
+    def words(self, count):
+        rng = self.rng
+        return " ".join(rng.choice(WORDS) if rng.random() < 0.85 else f"value_{rng.randint(0, 9999)}"
+                        for _ in range(count))
+
+    def text(self):
+        """Prose with some Markdown and a fenced code block, about ``content_kb`` long on average"""
+        target = int(self.rng.expovariate(1 / (self.content_kb * 1024))) + 40
+        parts = [f"## {self.words(4)}\n"]
+        size = 0
+        while size < target:
+            if self.rng.random() < 0.25:
+                code = "\n".join(f"    {self.words(self.rng.randint(2, 8))}" for _ in range(self.rng.randint(3, 15)))
+                chunk = f"```python\ndef handler():\n{code}\n```\n"
+            else:
+                chunk = f"- {self.words(self.rng.randint(5, 30))}\n" if self.rng.random() < 0.3 \
+                    else self.words(self.rng.randint(10, 60)) + "\n\n"
+            parts.append(chunk)
+            size += len(chunk)
+        return "".join(parts)
+
+    def image(self):
+        raw = self.rng.randbytes(int(self.image_kb * 1024 * 3 / 4))
+        return "data:image/png;base64," + base64.b64encode(raw).decode("ascii")
+
+    def api_req(self):
+        rng = self.rng
+        request = f"<task>\n{self.words(20)}\n</task>"
+        usage = {"tokensIn": rng.randint(100, 20000), "tokensOut": rng.randint(10, 4000),
+                 "cacheWrites": rng.randint(0, 5000), "cacheReads": rng.randint(0, 50000),
+                 "cost": round(rng.uniform(0.001, 0.2), 6)}
+        # Model picked from the drawn values so corpora of a given seed stay unchanged otherwise
+        model = MODELS[usage["tokensIn"] % len(MODELS)]
+        request += f"\n<environment_details>\n<model>{model}</model>\n</environment_details>"
+        return {"request": request, **usage}
+
+    def tool_call(self):
+        rng = self.rng
+        return {"tool": rng.choice(TOOLS), "path": f"src/{self.words(1)}_{rng.randint(0, 99)}.py",
+                "content": self.text()}
+
+    def ui_messages(self, count, first_text, start_ts):
+        rng = self.rng
+        messages = [{"ts": start_ts, "type": "say", "say": "text", "text": first_text, "images": []}]
+        for i in range(1, count):
+            ts = start_ts + i * rng.randint(500, 30000)
+            r = rng.random()
+            if r < self.json_fraction / 2:
+                messages.append({"ts": ts, "type": "say", "say": "api_req_started",
+                                 "text": json.dumps(self.api_req())})
+            elif r < self.json_fraction:
+                messages.append({"ts": ts, "type": "ask", "ask": "tool", "text": json.dumps(self.tool_call())})
+            else:
+                msg = {"ts": ts, "type": "say", "say": "text", "text": self.text(), "partial": False}
+                if rng.random() < self.image_fraction:
+                    msg["images"] = [self.image()]
+                messages.append(msg)
+        return messages
+
+    def api_history(self, count, first_text):
+        rng = self.rng
+        history = [{"role": "user", "content": [{"type": "text", "text": f"<task>\n{first_text}\n</task>"}]}]
+        for i in range(1, count):
+            if i % 2:
+                content = [{"type": "text", "text": self.text()}]
+                if rng.random() < self.json_fraction:
+                    content.append({"type": "text", "text": json.dumps(self.tool_call())})
+                history.append({"role": "assistant", "content": content})
+            else:
+                content = [{"type": "text", "text": f"[{rng.choice(TOOLS)}] Result:\n{self.text()}"}]
+                if rng.random() < self.image_fraction:
+                    data = self.image().split(",", 1)[1]
+                    content.append({"type": "image",
+                                    "source": {"type": "base64", "media_type": "image/png", "data": data}})
+                history.append({"role": "user", "content": content})
+        return history
+
+    def write_task(self, task_dir, start_ts):
+        """Write one task directory"""
+        task_dir.mkdir(parents=True, exist_ok=True)
+        count = self.rng.randint(*self.messages)
+        first_text = self.words(self.rng.randint(5, 60))
+        ui = self.ui_messages(count, first_text, start_ts)
+        api = self.api_history(max(1, count // 2), first_text)
+        (task_dir / "ui_messages.json").write_text(json.dumps(ui), encoding="utf-8")
+        (task_dir / "api_conversation_history.json").write_text(json.dumps(api), encoding="utf-8")
+        # Spread modification times like a real history (newest task last)
+        mtime = start_ts / 1000
+        for path in (task_dir / "ui_messages.json", task_dir / "api_conversation_history.json", task_dir):
+            os.utime(path, (mtime, mtime))
+
+
+def generate(tasks_dir, tasks, **options):
+    """Write ``tasks`` tasks into ``tasks_dir``; returns their IDs, oldest first"""
+    writer = TaskWriter(**options)
+    tasks_dir = Path(tasks_dir)
+    base_ts = 1_700_000_000_000
+    ids = []
+    for i in range(tasks):
+        tid = f"task-{i:06d}"
+        writer.write_task(tasks_dir / tid, base_ts + i * 60_000)
+        ids.append(tid)
+    return ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("home", help="directory used as $HOME; tasks go under the Roo tasks path")
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--messages", type=int, nargs=2, default=[10, 200], metavar=("MIN", "MAX"),
+                        help="UI messages per task")
+    parser.add_argument("--content-kb", type=float, default=2.0, help="mean size of a text message")
+    parser.add_argument("--json-fraction", type=float, default=0.3,
+                        help="share of messages carrying embedded JSON strings")
+    parser.add_argument("--image-fraction", type=float, default=0.02,
+                        help="share of messages with a base64 image")
+    parser.add_argument("--image-kb", type=float, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tasks_dir = tasks_dir_for(args.home)
+    generate(tasks_dir, args.tasks, messages=tuple(args.messages), content_kb=args.content_kb,
+             json_fraction=args.json_fraction, image_fraction=args.image_fraction,
+             image_kb=args.image_kb, seed=args.seed)
+    size = sum(p.stat().st_size for p in tasks_dir.glob("*/*.json"))
+    print(f"wrote {args.tasks} tasks ({size / 1024 / 1024:.1f} MB) to {tasks_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""The app's modules import each other flat from app/, so the tests do too"""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+
+def make_task(root, tid, n):
+    task_dir = root / tid
+    task_dir.mkdir(parents=True)
+    (task_dir / "ui_messages.json").write_text(
+        json.dumps([{"ts": i, "text": f"{tid} – message {i} " * 20} for i in range(n)], ensure_ascii=False),
+        encoding="utf-8")
+    (task_dir / "api_conversation_history.json").write_text(
+        json.dumps([{"role": "user", "content": f"request {i}"} for i in range(n)]), encoding="utf-8")
+    return task_dir
+
+
+@pytest.fixture(scope="session")
+def client(tmp_path_factory):
+    """The app, serving a tasks directory of three tasks.
+
+    main binds its tasks directory at import, so every test module shares it.
+    """
+    tmp = tmp_path_factory.mktemp("app")
+    for i, tid in enumerate(["task-a", "task-b", "task-c"]):
+        make_task(tmp / "tasks", tid, 40 + i)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("ROO_BROWSER_TASK_ROOTS", str(tmp / "tasks"))
+        mp.setenv("ROO_BROWSER_CACHE_DIR", str(tmp / "cache"))
+        import main
+        from starlette.testclient import TestClient
+        yield TestClient(main.app)
+        main.task_roots.stop()
@@ -0,0 +1,119 @@
+"""CompressionMiddleware: which responses are compressed, and the headers it rewrites"""
+import gzip
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from compression import CompressionMiddleware, negotiate
+
+PAGE = "<div class='message'>" + "rendered conversation " * 200 + "</div>"
+ETAG = '"abc"'
+
+
+def page(request):
+    if request.headers.get("if-none-match") == ETAG:
+        return Response(status_code=304, headers={"ETag": ETAG})
+    return Response(PAGE, media_type="text/html", headers={"ETag": ETAG, "Vary": "HX-Request"})
+
+
+def chunks():
+    for i in range(3):
+        yield f"<p>chunk {i}</p>" * 100
+
+
+def events():
+    yield "event: messages\ndata: " + "x" * 4000 + "\n\n"
+
+
+ROUTES = [
+    Route("/page", page),
+    Route("/small", lambda request: PlainTextResponse("short")),
+    Route("/json", lambda request: Response('{"a": "' + "b" * 4000 + '"}', media_type="application/json")),
+    Route("/zip", lambda request: Response(b"PK" + b"\0" * 4000, media_type="application/zip")),
+    Route("/stream", lambda request: StreamingResponse(chunks(), media_type="text/html")),
+    Route("/events", lambda request: StreamingResponse(events(), media_type="text/event-stream")),
+    Route("/encoded", lambda request: Response(gzip.compress(PAGE.encode()), media_type="text/html",
+                                               headers={"Content-Encoding": "gzip"})),
+]
+
+
+@pytest.fixture
+def client():
+    app = Starlette(routes=ROUTES)
+    app.add_middleware(CompressionMiddleware, minimum_size=1024, encodings=("gzip",))
+    return TestClient(app)
+
+
+def get(client, path, **headers):
+    return client.get(path, headers={"Accept-Encoding": "gzip", **headers})
+
+
+def test_large_html_is_compressed(client):
+    response = get(client, "/page")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == PAGE
+    assert int(response.headers["content-length"]) < len(PAGE) // 5
+
+
+def test_etag_gets_an_encoding_suffix_and_vary_is_merged(client):
+    response = get(client, "/page")
+    assert response.headers["etag"] == '"abc-gzip"'
+    assert response.headers["vary"] == "HX-Request, Accept-Encoding"
+
+
+def test_suffixed_if_none_match_reaches_the_app_without_the_suffix(client):
+    response = get(client, "/page", **{"If-None-Match": '"abc-gzip"'})
+    assert response.status_code == 304
+    assert response.headers["etag"] == '"abc-gzip"'
+    assert "content-encoding" not in response.headers
+
+
+def test_unsuffixed_etag_is_left_alone_on_304(client):
+    response = get(client, "/page", **{"If-None-Match": ETAG})
+    assert response.status_code == 304 and response.headers["etag"] == ETAG
+
+
+@pytest.mark.parametrize("path, encoding", [("/small", None), ("/zip", None), ("/events", None),
+                                            ("/encoded", "gzip")])
+def test_sent_as_is(client, path, encoding):
+    response = get(client, path)
+    assert response.headers.get("content-encoding") == encoding
+    assert "accept-encoding" not in response.headers.get("vary", "").lower()
+
+
+def test_event_stream_is_never_compressed(client):
+    response = get(client, "/events")
+    assert "content-encoding" not in response.headers
+    assert response.text.startswith("event: messages\n")
+
+
+def test_json_is_compressed(client):
+    assert get(client, "/json").headers["content-encoding"] == "gzip"
+
+
+def test_streamed_html_is_compressed_without_a_length(client):
+    response = get(client, "/stream")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text == "".join(chunks())
+
+
+def test_client_without_gzip_gets_identity(client):
+    response = client.get("/page", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == ETAG and response.text == PAGE
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br", "br"),
+    ("gzip;q=1.0, br;q=0", "gzip"),
+    ("*", "br"),
+    ("br;q=0, *;q=0.5", "gzip"),
+    ("identity", None),
+    ("", None),
+])
+def test_negotiate(header, expected):
+    assert negotiate(header, ("br", "gzip")) == expected
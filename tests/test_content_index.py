@@ -0,0 +1,147 @@
+"""ContentIndex: incremental re-indexing of appended messages and its FTS rowid blocks"""
+import json
+
+import pytest
+
+import content_index
+from content_index import ContentIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = ContentIndex(tmp_path / "tasks", tmp_path / "content.sqlite3")
+    yield index
+    index._conn.close()
+
+
+def write(index, tid, texts, file_type="ui_messages"):
+    path = index.tasks_dir / tid / f"{file_type}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Replaced by rename, like Roo does
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps([{"type": "say", "text": text} for text in texts], indent=1), encoding="utf-8")
+    tmp.replace(path)
+    return path
+
+
+def files(index):
+    """{(tid, file): (first_id, last_id, capacity)}"""
+    return {(tid, file): tuple(rest) for tid, file, *rest in index._conn.execute(
+        "SELECT tid, file, first_id, last_id, capacity FROM content_files")}
+
+
+def rows(index, tid, file_type="ui_messages"):
+    """[(rowid, idx, body)] of a file, checking every rowid is first_id + idx"""
+    first_id, last_id, _ = files(index)[tid, file_type]
+    found = index._conn.execute("SELECT rowid, idx, body FROM content_fts WHERE tid = ? AND file = ? "
+                                "ORDER BY rowid", (tid, file_type)).fetchall()
+    assert [rowid for rowid, _, _ in found] == list(range(first_id, last_id + 1))
+    assert all(rowid == first_id + idx for rowid, idx, _ in found)
+    return found
+
+
+def assert_blocks_disjoint(index):
+    blocks = sorted((first_id, first_id + capacity) for first_id, _, capacity in files(index).values())
+    assert all(end <= start for (_, end), (start, _) in zip(blocks, blocks[1:]))
+    for first_id, last_id, capacity in files(index).values():
+        assert last_id < first_id + capacity
+
+
+@pytest.fixture
+def scanned(monkeypatch):
+    """Messages decoded per index_task call"""
+    calls = []
+    real = content_index.message_text
+    monkeypatch.setattr(content_index, "message_text", lambda msg: calls.append(msg["text"]) or real(msg))
+    return calls
+
+
+def test_appends_index_only_the_tail(index, scanned):
+    write(index, "a", [f"message {i}" for i in range(5)])
+    index.index_task("a")
+    assert len(scanned) == 5
+    scanned.clear()
+
+    # The last message is re-read (Roo may still be streaming it), then the new ones
+    write(index, "a", [f"message {i}" for i in range(4)] + ["message 4 done", "message 5", "message 6"])
+    index.index_task("a")
+    assert scanned == ["message 4 done", "message 5", "message 6"]
+    assert [body for _, _, body in rows(index, "a")] == \
+        [f"message {i}" for i in range(4)] + ["message 4 done", "message 5", "message 6"]
+    assert [hit.index for hit in index.search("done")] == [4]
+
+
+@pytest.mark.parametrize("texts", [
+    ["message 0", "message 1", "EDITED", "message 3", "message 4"],  # changed before the tail
+    ["message 0", "message 1", "message 2"],  # lost messages
+    ["message 0"],
+    [],
+])
+def test_other_rewrites_are_indexed_from_scratch(index, scanned, texts):
+    write(index, "a", [f"message {i}" for i in range(5)])
+    index.index_task("a")
+    scanned.clear()
+    write(index, "a", texts)
+    index.index_task("a")
+    assert scanned == texts
+    assert [body for _, _, body in rows(index, "a")] == texts
+
+
+def test_growing_file_moves_to_a_bigger_block(index, monkeypatch):
+    monkeypatch.setattr(content_index, "MIN_BLOCK", 4)
+    write(index, "a", ["a0", "a1", "a2"])
+    write(index, "b", ["b0", "b1"])
+    index.index_task("a")
+    index.index_task("b")
+    assert files(index)[("a", "ui_messages")] == (1, 3, 6)
+    assert files(index)[("b", "ui_messages")] == (7, 8, 4)
+
+    texts = ["a0", "a1", "a2"]
+    for i in range(3, 20):
+        texts.append(f"a{i}")
+        write(index, "a", texts)
+        index.index_task("a")
+        assert [body for _, _, body in rows(index, "a")] == texts
+        assert_blocks_disjoint(index)
+    assert files(index)[("a", "ui_messages")][2] >= 20
+    assert [body for _, _, body in rows(index, "b")] == ["b0", "b1"]
+    assert index._conn.execute("SELECT COUNT(*) FROM content_fts").fetchone()[0] == 22
+
+
+def test_malformed_file_is_indexed_empty(index):
+    path = write(index, "a", ["x", "y"])
+    index.index_task("a")
+    path.write_text('[{"text": "x"}, {"te', encoding="utf-8")
+    index.index_task("a")
+    assert rows(index, "a") == []
+    write(index, "a", ["x", "y", "z"])
+    index.index_task("a")
+    assert [body for _, _, body in rows(index, "a")] == ["x", "y", "z"]
+
+
+def test_deleted_files_and_tasks_are_dropped(index):
+    for tid in ("a", "b", "c"):
+        write(index, tid, [f"{tid} ui"])
+        write(index, tid, [f"{tid} api"], "api_conversation_history")
+        index.index_task(tid)
+    (index.tasks_dir / "a" / "ui_messages.json").unlink()
+    index.index_task("a")
+    assert set(files(index)) == {("a", "api_conversation_history"), ("b", "ui_messages"),
+                                 ("b", "api_conversation_history"), ("c", "ui_messages"),
+                                 ("c", "api_conversation_history")}
+
+    # A full listing drops every task it no longer has, with all its rows
+    index._drop_missing({"b"})
+    assert set(files(index)) == {("b", "ui_messages"), ("b", "api_conversation_history")}
+    assert {tid for (tid,) in index._conn.execute("SELECT tid FROM content_fts")} == {"b"}
+    assert [hit.tid for hit in index.search("ui")] == ["b"]
+
+
+def test_listeners_get_the_message_count(index):
+    counts = []
+    index.subscribe(lambda path, mtime_ns, size, count: counts.append((path.split("/")[-2], count)))
+    write(index, "a", ["x", "y"])
+    index.index_task("a")
+    write(index, "a", ["x", "y", "z"])
+    index.index_task("a")
+    assert counts == [("a", 2), ("a", 3)]
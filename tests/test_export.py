@@ -0,0 +1,130 @@
+"""Export: ZIP layout, byte ranges and resuming a download with Range / If-Range"""
+import io
+import json
+import zipfile
+
+import pytest
+
+from conftest import make_task
+from export import ExportError, ZipExport, parse_range
+from task_roots import RootSpec, TaskRoots
+
+FILES = ("api_conversation_history.json", "ui_messages.json")
+
+
+@pytest.fixture
+def roots(tmp_path):
+    for i, tid in enumerate(["task-a", "task-b"]):
+        make_task(tmp_path / "main", tid, 5 + i)
+    make_task(tmp_path / "work", "task-c", 3)
+    return TaskRoots([RootSpec("main", tmp_path / "main"), RootSpec("work", tmp_path / "work")],
+                     cache_dir=tmp_path / "cache")
+
+
+def archive_bytes(archive, start=0, stop=None):
+    return b"".join(archive.iter_bytes(start, stop))
+
+
+def test_zip_layout(roots):
+    archive = ZipExport(roots, ["task-b", "work:task-c", "task-a"])
+    data = archive_bytes(archive)
+    assert len(data) == archive.size
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        # In the order asked for, files sorted per task, one directory per root
+        assert zf.namelist() == [f"{tid}/{name}" for tid in ("task-b", "work/task-c", "task-a") for name in FILES]
+        for info in zf.infolist():
+            assert info.compress_type == zipfile.ZIP_STORED
+            tid = info.filename.rsplit("/", 1)[0].replace("/", ":")
+            assert zf.read(info) == (roots / tid / info.filename.rsplit("/", 1)[1]).read_bytes()
+
+
+def test_unknown_tasks_are_skipped(roots):
+    assert [m.name for m in ZipExport(roots, ["nope", "task-a"]).members] == [f"task-a/{n}" for n in FILES]
+
+
+def test_any_byte_range_matches_the_whole_archive(roots):
+    archive = ZipExport(roots, ["task-a", "task-b", "work:task-c"])
+    data = archive_bytes(archive)
+    member = archive.members[2]
+    cuts = [0, 1, 29, 30, member.offset, member.offset + 31, archive.central_offset - 1,
+            archive.central_offset, archive.central_offset + 50, archive.size - 22, archive.size - 1]
+    for start in cuts:
+        for stop in cuts + [archive.size]:
+            if start < stop:
+                assert archive_bytes(archive, start, stop) == data[start:stop], (start, stop)
+
+
+def test_etag_changes_with_the_files(roots):
+    before = ZipExport(roots, ["task-a"]).etag
+    assert ZipExport(roots, ["task-a"]).etag == before
+    path = roots / "task-a" / "ui_messages.json"
+    path.write_text("[]", encoding="utf-8")
+    assert ZipExport(roots, ["task-a"]).etag != before
+
+
+def test_file_changed_during_export_raises(roots):
+    archive = ZipExport(roots, ["task-a", "task-b"])
+    (roots / "task-b" / "ui_messages.json").write_text("[1]", encoding="utf-8")
+    with pytest.raises(ExportError):
+        archive_bytes(archive)
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 100)),
+    ("bytes=100-", (100, 1000)),
+    ("bytes=-10", (990, 1000)),
+    ("bytes=900-5000", (900, 1000)),
+    ("bytes=-5000", (0, 1000)),
+    (None, None),
+    ("", None),
+    ("items=0-10", None),
+    ("bytes=0-10,20-30", None),
+    ("bytes=a-b", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=5-2", "bytes=5"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
+
+
+def test_download_resumes_with_range_and_if_range(client):
+    url = "/export?format=zip&ids=task-a,task-b,task-c"
+    full = client.get(url)
+    assert full.status_code == 200
+    assert full.headers["accept-ranges"] == "bytes"
+    assert full.headers["content-type"] == "application/zip"
+    etag, data = full.headers["etag"], full.content
+    assert int(full.headers["content-length"]) == len(data)
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None and len(zf.namelist()) == 6
+
+    # Resume after a dropped connection: the rest, which completes the same archive
+    rest = client.get(url, headers={"Range": "bytes=1000-", "If-Range": etag})
+    assert rest.status_code == 206
+    assert rest.headers["content-range"] == f"bytes 1000-{len(data) - 1}/{len(data)}"
+    assert data[:1000] + rest.content == data
+
+    middle = client.get(url, headers={"Range": "bytes=10-19"})
+    assert middle.status_code == 206 and middle.content == data[10:20]
+
+    # A stale If-Range (the files changed since) gets the whole archive again
+    stale = client.get(url, headers={"Range": "bytes=1000-", "If-Range": '"zip-stale"'})
+    assert stale.status_code == 200 and stale.content == data
+
+    unsatisfiable = client.get(url, headers={"Range": f"bytes={len(data)}-"})
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == f"bytes */{len(data)}"
+
+
+def test_ndjson_export(client):
+    response = client.get("/export?ids=task-b")
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [(line["file"], line["index"]) for line in lines] == \
+        [("ui_messages", i) for i in range(41)] + [("api_conversation_history", i) for i in range(41)]
+    assert {line["task"] for line in lines} == {"task-b"}
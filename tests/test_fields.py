@@ -0,0 +1,101 @@
+"""Large fields: size estimates, JSON pointers and the on-demand field route"""
+import html
+import json
+import re
+
+import pytest
+
+from fasthtml.common import to_xml
+
+
+@pytest.fixture(scope="module")
+def main(client):
+    import main
+    return main
+
+
+@pytest.mark.parametrize("value", [
+    {"a": [1, 2.5, None, True, False, "x"], "b": {}, "c": [], "d": {"e": {"f": "g h"}}},
+    [],
+    {},
+    [[["deep"]]],
+    {"ünïcode": "ünïcode ✓"},
+])
+def test_field_size_matches_the_compact_serialization(main, value):
+    assert main.field_size(value) == len(json.dumps(value, ensure_ascii=False))
+
+
+def test_field_size_stops_once_past_the_limit(main):
+    class Unreachable:
+        def __str__(self):
+            raise AssertionError("visited past the limit")
+
+    value = {"items": [Unreachable()] + [{"text": "x" * 100} for _ in range(1000)]}
+    assert main.field_size(value, 1000) > 1000
+    with pytest.raises(AssertionError):
+        main.field_size(value)
+    assert main.field_size("x" * 5000, 1000) == 5000
+
+
+@pytest.mark.parametrize("path, pointer", [
+    ((), ""),
+    (("content", 0, "text"), "/content/0/text"),
+    (("a/b", "m~n", ""), "/a~1b/m~0n/"),
+    (("~1",), "/~01"),
+])
+def test_json_pointer_round_trips(main, path, pointer):
+    doc = {"content": [{"text": "hi"}], "a/b": {"m~n": {"": 1}}, "~1": 2}
+    assert main.json_pointer(path) == pointer
+    value = doc
+    for part in path:
+        value = value[part]
+    assert main.resolve_pointer(doc, pointer) == value
+
+
+@pytest.mark.parametrize("pointer", ["content", "/missing", "/content/1", "/content/x", "/content/-1",
+                                     "/content/0/text/more"])
+def test_resolve_pointer_raises_lookup_error(main, pointer):
+    with pytest.raises(LookupError):
+        main.resolve_pointer({"content": [{"text": "hi"}]}, pointer)
+
+
+def test_large_complex_values_are_collapsed_without_their_size(main):
+    ref = main.FieldRef("task-a", "api_conversation_history", 3, ("content",))
+    value = [{"type": "text", "text": "x" * 100} for _ in range(main.LAZY_FIELD_BYTES // 50)]
+    button = to_xml(main.render_field("tool_result", value, ref))
+    assert f"Show array, {len(value)} items (over 16.0 KB)" in button
+    assert "i=3&amp;ptr=%2Fcontent&amp;mode=field" in button
+    assert "Show text (16.0 KB)" in to_xml(main.format_message_content("y" * (16 * 1024 + 1), ref))
+
+
+def get(client, url):
+    return client.get(url, headers={"HX-Request": "true"})
+
+
+def test_placeholders_load_their_field(client, main, monkeypatch):
+    monkeypatch.setattr(main, "LAZY_FIELD_BYTES", 100)
+    page = get(client, "/task/task-c/ui_messages").text
+    urls = [html.unescape(url) for url in re.findall(r'<button hx-get="([^"]*/field\?[^"]*)"', page)]
+    assert len(urls) == 42
+    assert urls[7] == "/task/task-c/ui_messages/field?i=7&ptr=%2Ftext&mode=content"
+    expanded = get(client, urls[7])
+    assert expanded.status_code == 200
+    assert "task-c – message 7 " * 20 in html.unescape(expanded.text)
+    assert get(client, urls[7]).headers["etag"] == expanded.headers["etag"]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("i=2", '"text": "task-a – message 2 task-a'),
+    ("i=-1&ptr=/1/ts", '<code class="language-json">1</code>'),
+    ("i=2&ptr=/nope", "Error loading field: 'nope'"),
+    ("i=99&ptr=/text", "Error loading field: list index out of range"),
+])
+def test_field_route(client, query, expected):
+    response = get(client, f"/task/task-a/ui_messages/field?{query}")
+    assert response.status_code == 200
+    assert expected in response.text
+
+
+def test_field_route_rejects_unknown_tasks_and_files(client):
+    assert get(client, "/task/no-such-task/ui_messages/field?i=0").status_code == 404
+    assert "Invalid file type: bogus" in get(client, "/task/task-a/bogus/field?i=0").text
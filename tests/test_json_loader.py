@@ -0,0 +1,46 @@
+"""load_json: mapped and read files, every decoder, the same results and errors"""
+import json
+
+import pytest
+
+from json_loader import DECODERS, load_json
+
+
+@pytest.fixture(params=[(name, use_mmap) for name in DECODERS for use_mmap in (True, False)],
+                ids=lambda p: f"{p[0]}-{'mmap' if p[1] else 'read'}")
+def load(request):
+    name, use_mmap = request.param
+    return lambda path: load_json(path, name, use_mmap)
+
+
+def test_documents_match_json_load(load, tmp_path):
+    doc = [{"role": "user", "content": "héllo ✓ " * 100}, {"n": [1, 2.5, -3e10, None, True]}]
+    path = tmp_path / "a.json"
+    path.write_text(json.dumps(doc, ensure_ascii=False), encoding="utf-8")
+    assert load(path) == doc
+
+
+def test_nan_is_accepted_like_json(load, tmp_path):
+    path = tmp_path / "nan.json"
+    path.write_text('[NaN, 1]', encoding="utf-8")
+    value = load(path)
+    assert value[0] != value[0] and value[1] == 1
+
+
+@pytest.mark.parametrize("text", ["", "[1, 2", "[1] x"])
+def test_malformed_and_empty_files_raise_json_errors(load, tmp_path, text):
+    path = tmp_path / "bad.json"
+    path.write_text(text, encoding="utf-8")
+    with pytest.raises(json.JSONDecodeError):
+        load(path)
+
+
+def test_document_outlives_a_replaced_file(load, tmp_path):
+    path = tmp_path / "task.json"
+    path.write_text(json.dumps(["old"] * 1000), encoding="utf-8")
+    doc = load(path)
+    # Roo replaces task files by rename; the parsed document keeps no reference to the file
+    tmp = tmp_path / "task.json.tmp"
+    tmp.write_text(json.dumps(["new"]), encoding="utf-8")
+    tmp.replace(path)
+    assert doc == ["old"] * 1000 and load(path) == ["new"]
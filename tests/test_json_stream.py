@@ -0,0 +1,107 @@
+"""read_head / read_first_element: decoding the first elements of an array from a prefix"""
+import json
+
+import pytest
+
+import json_stream
+from json_stream import PrefixUnavailable, read_first_element, read_head
+
+
+@pytest.fixture
+def write(tmp_path):
+    def write(content):
+        path = tmp_path / "messages.json"
+        path.write_bytes(content if isinstance(content, bytes) else content.encode("utf-8"))
+        return path
+    return write
+
+
+@pytest.fixture
+def bytes_read(monkeypatch):
+    """Bytes read from files opened by json_stream"""
+    read = []
+
+    class CountingFile:
+        def __init__(self, f):
+            self.f = f
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self.f.close()
+
+        def read(self, size):
+            chunk = self.f.read(size)
+            read.append(len(chunk))
+            return chunk
+
+    monkeypatch.setattr(json_stream, "open", lambda path, mode: CountingFile(open(path, mode)), raising=False)
+    return read
+
+
+@pytest.mark.parametrize("chunk_size", range(1, 14))
+def test_numbers_cut_at_a_chunk_edge_are_read_whole(write, chunk_size):
+    # "-25" of "-2500.0" is a valid number on its own
+    path = write("[-2500.0e1 , 12345]")
+    assert read_head(path, 1, chunk_size=chunk_size) == [-25000.0]
+    assert read_head(path, 2, chunk_size=chunk_size) == [-25000.0, 12345]
+    assert read_head(write("[7, 123]"), 5, chunk_size=chunk_size) == [7, 123]
+
+
+@pytest.mark.parametrize("chunk_size", range(1, 12))
+def test_utf8_cut_at_a_chunk_edge_is_decoded(write, chunk_size):
+    elements = [{"text": "héllo ✓ 😀"}, "ünïcode"]
+    path = write(json.dumps(elements, ensure_ascii=False))
+    assert read_head(path, 2, chunk_size=chunk_size) == elements
+
+
+@pytest.mark.parametrize("content, count, expected", [
+    ("[]", 1, []),
+    (" \n[ ]\n", 3, []),
+    ("[1, 2]", 5, [1, 2]),
+    # Only the requested elements need to be well-formed
+    ('[{"a": 1}, {"b"', 1, [{"a": 1}]),
+    ('[{"a": 1}, oops', 1, [{"a": 1}]),
+])
+def test_reads_up_to_count_elements(write, content, count, expected):
+    assert read_head(write(content), count, chunk_size=4) == expected
+
+
+@pytest.mark.parametrize("content, count", [
+    ("", 1),
+    ('{"a": 1}', 1),
+    ('"text"', 1),
+    ('[{"a": ', 1),
+    ('[{"a": 1}, ', 2),
+    ("[1 2]", 2),
+    ("[1, ]", 2),
+    (b'["\xff\xfe"]', 1),
+])
+def test_malformed_or_truncated_prefixes_raise(write, content, count):
+    with pytest.raises(PrefixUnavailable):
+        read_head(write(content), count, chunk_size=4)
+
+
+def test_max_bytes_caps_the_prefix_read(write, bytes_read):
+    path = write(json.dumps(["x" * 10000, "y"]))
+    with pytest.raises(PrefixUnavailable, match="exceed 1000 bytes"):
+        read_head(path, 1, chunk_size=100, max_bytes=1000)
+    # Chunks double: 100, 200, 400, 800
+    assert sum(bytes_read) == 1500
+    assert read_head(path, 1, chunk_size=100, max_bytes=20000) == ["x" * 10000]
+
+
+def test_only_the_needed_prefix_is_read(write, bytes_read):
+    path = write(json.dumps([{"text": "first"}] + [{"text": "x" * 1000}] * 1000))
+    assert read_head(path, 1, chunk_size=64) == [{"text": "first"}]
+    assert sum(bytes_read) == 64
+
+
+def test_read_first_element_falls_back_to_a_full_parse(write):
+    assert read_first_element(write('[{"text": "hi"}, 2]')) == {"text": "hi"}
+    assert read_first_element(write("[]")) is None
+    # Not an array: parsed whole, and has no first element
+    assert read_first_element(write('{"text": "hi"}')) is None
+    with pytest.raises(ValueError):
+        read_first_element(write('[{"text": "hi"'))
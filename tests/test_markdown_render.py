@@ -0,0 +1,95 @@
+"""Server-side Markdown: unsafe link and image URLs are dropped, raw HTML is escaped"""
+import pytest
+
+pytest.importorskip("markdown")
+pytest.importorskip("pygments")
+
+from markdown_render import MarkdownRenderer, safe_url  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def render():
+    return MarkdownRenderer().markdown
+
+
+@pytest.mark.parametrize("url", [
+    "javascript:alert(1)",
+    "JaVaScRiPt:alert(1)",
+    "vbscript:msgbox(1)",
+    "data:text/html,<script>alert(1)</script>",
+    "data:image/png;base64,AAAA",
+    # Entity-encoded schemes, as a browser decodes them in an attribute
+    "&#106;avascript:alert(1)",
+    "&#x6A;avascript:alert(1)",
+    "&#X6a;&#x61;vascript:alert(1)",
+    "javascript&colon;alert(1)",
+    # Whitespace and control characters browsers skip inside a scheme
+    " javascript:alert(1)",
+    "java\tscript:alert(1)",
+    "java\nscript:alert(1)",
+    "\x01javascript:alert(1)",
+    "java&#9;script:alert(1)",
+    "java&#x0A;script:alert(1)",
+])
+def test_unsafe_urls(url):
+    assert not safe_url(url)
+
+
+@pytest.mark.parametrize("url", [
+    "https://example.com/a?b=1&c=2",
+    "HTTP://EXAMPLE.COM",
+    "mailto:someone@example.com",
+    "docs/readme.md",
+    "./img.png",
+    "/abs/path",
+    "#section",
+    "?q=1",
+    "//example.com/x",
+    # Not a scheme to a browser either: these stay relative
+    "&amp;#106;avascript:alert(1)",
+    "java%09script:alert(1)",
+])
+def test_safe_urls(url):
+    assert safe_url(url)
+
+
+@pytest.mark.parametrize("source, html", [
+    ("[x](javascript:alert(1))", "<p><a>x</a></p>"),
+    ("[x](&#106;avascript:alert(1))", "<p><a>x</a></p>"),
+    ("[x](&#x6A;avascript:alert(1))", "<p><a>x</a></p>"),
+    ("[x](java&#9;script:alert(1))", "<p><a>x</a></p>"),
+    ("[x](<java script:alert(1)>)", "<p><a>x</a></p>"),
+    ("[x](\x01javascript:alert(1))", "<p><a>x</a></p>"),
+    ("![i](data:image/png;base64,AAAA)", '<p><img alt="i" /></p>'),
+    ("![i](data:image/svg+xml,<svg onload=alert(1)>)", '<p><img alt="i" /></p>'),
+    # Reference-style links and images go through the same filter
+    ("[r][1]\n\n[1]: javascript:alert(1)", "<p><a>r</a></p>"),
+    ("![r][1]\n\n[1]: data:text/html,x", '<p><img alt="r" /></p>'),
+    ('[r][1]\n\n[1]: javascript:alert(1) "title"', '<p><a title="title">r</a></p>'),
+])
+def test_unsafe_targets_are_removed(render, source, html):
+    assert render(source) == html
+
+
+@pytest.mark.parametrize("source, html", [
+    ("[ok](https://example.com/a?b=1&c=2)", '<p><a href="https://example.com/a?b=1&amp;c=2">ok</a></p>'),
+    ("[rel](docs/a.md)", '<p><a href="docs/a.md">rel</a></p>'),
+    ("[frag](#top)", '<p><a href="#top">frag</a></p>'),
+    ("[m](mailto:a@b.c)", '<p><a href="mailto:a@b.c">m</a></p>'),
+    ("![img](img.png)", '<p><img alt="img" src="img.png" /></p>'),
+    ("[r][1]\n\n[1]: https://example.com", '<p><a href="https://example.com">r</a></p>'),
+    ("<https://example.com>", '<p><a href="https://example.com">https://example.com</a></p>'),
+])
+def test_safe_targets_are_kept(render, source, html):
+    assert render(source) == html
+
+
+@pytest.mark.parametrize("source, html", [
+    ("<script>alert(1)</script>", "<p>&lt;script&gt;alert(1)&lt;/script&gt;</p>"),
+    ("a <img src=x onerror=alert(1)> b", "<p>a &lt;img src=x onerror=alert(1)&gt; b</p>"),
+    ('<a href="javascript:alert(1)">x</a>', '<p>&lt;a href="javascript:alert(1)"&gt;x&lt;/a&gt;</p>'),
+    ("<javascript:alert(1)>", "<p>&lt;javascript:alert(1)&gt;</p>"),
+    ("<task>\nfix it\n</task>", "<p>&lt;task&gt;\nfix it\n&lt;/task&gt;</p>"),
+])
+def test_raw_html_is_escaped(render, source, html):
+    assert render(source) == html
@@ -0,0 +1,71 @@
+"""Message byte offsets: json_stream.element_offsets and OffsetIndex"""
+import json
+
+import pytest
+
+from json_stream import element_offsets
+from offset_index import OffsetIndex
+
+# Multi-byte UTF-8 of every length, and JSON escapes of non-ASCII text
+MESSAGES = [
+    {"type": "say", "text": "héllo wörld"},
+    {"text": "日本語のテキスト", "n": [1, 2.5, -3e10]},
+    {"text": "emoji 🎉, a line separator   and brackets ] [ } {"},
+    "ünïcode string \"quoted\"",
+    12345,
+    None,
+    {"escaped": "\\u00e9 stays escaped"},
+]
+
+
+def write(path, messages, **options):
+    path.write_bytes(json.dumps(messages, ensure_ascii=False, **options).encode("utf-8"))
+    return path.read_bytes()
+
+
+@pytest.mark.parametrize("options", [{}, {"indent": 2}, {"separators": (",", ":")}])
+def test_offsets_are_byte_offsets_in_utf8(tmp_path, options):
+    data = write(tmp_path / "ui_messages.json", MESSAGES, **options)
+    offsets = element_offsets(data)
+    assert len(offsets) == 2 * len(MESSAGES)
+    for i, message in enumerate(MESSAGES):
+        assert json.loads(data[offsets[2 * i]:offsets[2 * i + 1]].decode("utf-8")) == message
+
+
+def test_window_smaller_than_an_element(tmp_path):
+    data = write(tmp_path / "ui_messages.json", MESSAGES)
+    assert element_offsets(data, window=7) == element_offsets(data)
+
+
+def test_resume_after_an_element(tmp_path):
+    data = write(tmp_path / "ui_messages.json", MESSAGES)
+    offsets = element_offsets(data)
+    assert element_offsets(data, start=offsets[3]) == offsets[4:]
+
+
+@pytest.mark.parametrize("data", [b"", b"{}", b'[1, 2', "[\"é\" \"è\"]".encode("utf-8")])
+def test_malformed_arrays_raise(data):
+    with pytest.raises(ValueError):
+        element_offsets(data)
+
+
+def test_open_reads_messages_through_the_side_file(tmp_path):
+    path = tmp_path / "api_conversation_history.json"
+    write(path, MESSAGES)
+    index = OffsetIndex(tmp_path / "offsets")
+    with index.open(path) as messages:
+        assert len(messages) == len(MESSAGES)
+        assert list(messages) == MESSAGES
+        assert messages[-1] == MESSAGES[-1]
+        assert [json.loads(raw) for raw in messages.raw(1, 3)] == MESSAGES[1:3]
+    assert index.scans == 1
+
+    # A new process (index) reuses the side file until the file changes
+    again = OffsetIndex(tmp_path / "offsets")
+    with again.open(path) as messages:
+        assert messages[1] == MESSAGES[1]
+    assert again.scans == 0
+    write(path, MESSAGES[:2])
+    with again.open(path) as messages:
+        assert list(messages) == MESSAGES[:2]
+    assert again.scans == 1
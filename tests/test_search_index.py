@@ -0,0 +1,89 @@
+"""TitleSearchIndex against the reference scorer, fuzzy_match"""
+import random
+
+import pytest
+
+from search_index import TitleSearchIndex, fuzzy_match
+
+VOCABULARY = ("data database databases base gateway pay payment payments api fix fixes bug render search "
+              "index in a of the x ab abc abcd Ünïcode naïve café").split()
+
+QUERIES = ["", " ", "data", "DATA", "dat", "atab", "pay gate", "payment gateway", "base data", "a b",
+           "fix bug x", "abcd", "abc abcd xyz", "ünïcode", "tab", "data  base", "gateway pay", "ase ata",
+           "x", "payments gateway api", "render  search", "café", "naï", "zzz"]
+
+
+def random_title(rng):
+    words = " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(1, 7)))
+    return words + rng.choice(["", "  ", " extra", "\tTab"])
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    """(index, titles, ranks) after adds, re-titles and removals"""
+    rng = random.Random(1)
+    index, titles = TitleSearchIndex(), {}
+    for i in range(1000):
+        titles[f"t{i}"] = random_title(rng)
+        index.update(f"t{i}", titles[f"t{i}"])
+    for i in range(0, 1000, 7):
+        titles[f"t{i}"] = random_title(rng)
+        index.update(f"t{i}", titles[f"t{i}"])
+    for i in range(0, 1000, 11):
+        del titles[f"t{i}"]
+        index.remove(f"t{i}")
+    ranks = {tid: rank for rank, tid in enumerate(rng.sample(list(titles), len(titles)))}
+    queries = QUERIES + [" ".join(rng.choice(VOCABULARY + ["zz", "qqqq"])[:rng.randint(1, 9)]
+                                  for _ in range(rng.randint(1, 4))) for _ in range(100)]
+    return index, titles, ranks, queries
+
+
+def reference(titles, ranks, query):
+    """fuzzy_match over every title: {tid: score} and the ranking (score, then rank)"""
+    scores = {}
+    for tid, title in titles.items():
+        matched, score = fuzzy_match(title, query)
+        if matched:
+            scores[tid] = score
+    return scores, sorted(scores, key=lambda tid: (-scores[tid], ranks[tid]))
+
+
+def test_scores_match_fuzzy_match(corpus):
+    index, titles, ranks, queries = corpus
+    for query in queries:
+        assert index.score_all(query) == reference(titles, ranks, query)[0], query
+
+
+def test_ranking_matches_fuzzy_match(corpus):
+    index, titles, ranks, queries = corpus
+    for query in queries:
+        expected = reference(titles, ranks, query)[1]
+        assert index.search(query, ranks) == expected, query
+        for limit in (1, 5, 50):
+            assert index.search(query, ranks, limit=limit) == expected[:limit], (query, limit)
+
+
+def test_typing_refinement_matches_a_fresh_search(corpus):
+    index, titles, ranks, _ = corpus
+    for word in ("payments", "databases", "ünïcode", "abcd", "fixes"):
+        for n in range(1, len(word) + 1):
+            query = word[:n]
+            expected = reference(titles, ranks, query)[1]
+            assert index.search(query, ranks, limit=20, client="browser") == expected[:20], query
+            assert index.search(query, ranks, client="other") == expected, query
+
+
+def test_refinement_sees_updates(corpus):
+    index, titles, ranks, _ = corpus
+    first = index.search("gatew", ranks, client="editor")
+    index.update(first[0], "renamed")
+    try:
+        assert first[0] not in index.search("gatewa", ranks, client="editor")
+    finally:
+        index.update(first[0], titles[first[0]])
+
+
+def test_tasks_without_a_rank_are_ignored(corpus):
+    index, titles, ranks, _ = corpus
+    some = dict(list(ranks.items())[:100])
+    assert index.search("data", some) == [tid for tid in reference(titles, ranks, "data")[1] if tid in some]
@@ -0,0 +1,96 @@
+"""TailFollower: appends, an updated last message, and truncated or rewritten files"""
+import json
+import os
+
+import pytest
+
+from offset_index import RELOAD, OffsetIndex, TailFollower
+
+
+def message(i, text="done"):
+    return {"ts": i, "type": "say", "text": f"message {i} – {text}"}
+
+
+class TaskFile:
+    """A ui_messages.json rewritten whole, as Roo does, with a fresh mtime every time"""
+
+    def __init__(self, path, messages):
+        self.path = path
+        self.version = 0
+        self.write(messages)
+
+    def write(self, messages=None, raw=None):
+        self.path.write_bytes(raw if raw is not None else json.dumps(messages, ensure_ascii=False).encode("utf-8"))
+        self.version += 1
+        os.utime(self.path, ns=(self.version * 10**9, self.version * 10**9))
+
+
+@pytest.fixture
+def task(tmp_path):
+    return TaskFile(tmp_path / "ui_messages.json", [message(i) for i in range(3)])
+
+
+@pytest.fixture
+def follower(tmp_path, task):
+    follower = TailFollower(task.path, OffsetIndex(tmp_path / "offsets"))
+    assert follower.poll() is None  # baseline: everything present is known
+    return follower
+
+
+def changed(follower):
+    change = follower.poll()
+    assert change is not None and change is not RELOAD
+    with change.messages as messages:
+        return change.start, list(messages[change.start:])
+
+
+def test_unchanged_file_reports_nothing(task, follower):
+    assert follower.poll() is None
+    task.write([message(i) for i in range(3)])  # same bytes, new mtime
+    assert follower.poll() is None
+
+
+def test_appended_messages(task, follower):
+    task.write([message(i) for i in range(5)])
+    assert changed(follower) == (3, [message(3), message(4)])
+    task.write([message(i) for i in range(6)])
+    assert changed(follower) == (5, [message(5)])
+
+
+def test_last_message_updated_in_place(task, follower):
+    task.write([message(0), message(1), message(2, "still streaming…")])
+    assert changed(follower) == (2, [message(2, "still streaming…")])
+    task.write([message(0), message(1), message(2, "still streaming… and more"), message(3)])
+    assert changed(follower) == (2, [message(2, "still streaming… and more"), message(3)])
+
+
+def test_client_behind_gets_the_missing_messages_first(tmp_path, task):
+    follower = TailFollower(task.path, OffsetIndex(tmp_path / "offsets"), known=1)
+    assert changed(follower) == (1, [message(1), message(2)])
+
+
+def test_truncated_file_reloads(task, follower):
+    task.write([message(0)])
+    assert follower.poll() is RELOAD
+
+
+def test_truncated_to_nothing_reloads(task, follower):
+    task.write(raw=b"")
+    assert follower.poll() is RELOAD
+
+
+def test_rewritten_prefix_reloads(task, follower):
+    task.write([message(0, "edited"), message(1), message(2), message(3)])
+    assert follower.poll() is RELOAD
+
+
+def test_malformed_tail_reloads(task, follower):
+    data = json.dumps([message(i) for i in range(4)]).encode("utf-8")
+    task.write(raw=data[:-20])
+    assert follower.poll() is RELOAD
+
+
+def test_deleted_file_raises(task, follower):
+    task.path.unlink()
+    with pytest.raises(OSError):
+        follower.poll()
@@ -0,0 +1,96 @@
+"""TaskListCache's columns: order, paging and slot reuse under adds, moves and removals"""
+import os
+import random
+
+import pytest
+
+from task_cache import TaskListCache
+
+
+@pytest.fixture
+def tasks_dir(tmp_path):
+    return tmp_path / "tasks"
+
+
+@pytest.fixture
+def cache(tasks_dir):
+    rng = random.Random(3)
+    for i in range(200):
+        set_task(tasks_dir, f"t{i:03}", rng.choice([100, 200, 300]) + rng.randint(0, 3))
+    cache = TaskListCache(tasks_dir, poll_interval=3600, use_watchfiles=False)
+    cache.start()
+    yield cache
+    cache.stop()
+
+
+def set_task(tasks_dir, tid, mtime):
+    (tasks_dir / tid).mkdir(parents=True, exist_ok=True)
+    os.utime(tasks_dir / tid, (mtime, mtime))
+
+
+def on_disk(tasks_dir):
+    """Task IDs by (-mtime, tid), straight from the directory"""
+    return [tid for _, tid in sorted((-os.stat(tasks_dir / tid).st_mtime, tid) for tid in os.listdir(tasks_dir))]
+
+
+def pages(cache, limit):
+    ids, cursor = [], None
+    while True:
+        page, cursor = cache.page(cursor, limit)
+        ids += page
+        if cursor is None:
+            return ids
+
+
+def test_initial_scan_order(cache, tasks_dir):
+    assert list(cache.tasks()) == on_disk(tasks_dir)
+    assert pages(cache, 7) == on_disk(tasks_dir)
+
+
+def test_deltas_keep_the_columns_sorted(cache, tasks_dir):
+    rng = random.Random(4)
+    for step in range(400):
+        tid = f"t{rng.randint(0, 250):03}"
+        if rng.random() < 0.3 and (tasks_dir / tid).exists():
+            (tasks_dir / tid).rmdir()
+        else:
+            # Few distinct mtimes: most moves land among ties
+            set_task(tasks_dir, tid, rng.choice([100, 200, 300]) + rng.randint(0, 3))
+        cache.apply([tid])
+        assert list(cache.tasks()) == on_disk(tasks_dir), step
+    assert pages(cache, 1) == pages(cache, 13) == on_disk(tasks_dir)
+    assert cache.ranks() == {tid: i for i, tid in enumerate(on_disk(tasks_dir))}
+
+
+def test_keys_after_a_tie(cache, tasks_dir):
+    for tid in ("a", "b", "c", "d"):
+        set_task(tasks_dir, tid, 1000)
+    cache.apply(["a", "b", "c", "d"])
+    assert [tid for _, tid in cache.keys(limit=4)] == ["a", "b", "c", "d"]
+    assert [tid for _, tid in cache.keys((-1000.0, "b"), 2)] == ["c", "d"]
+    # A cursor naming a task that is gone still resumes in place
+    assert [tid for _, tid in cache.keys((-1000.0, "bb"), 2)] == ["c", "d"]
+
+
+def test_freed_slots_are_reused(cache, tasks_dir):
+    slots = len(cache._ids)
+    for tid in ("t001", "t002"):
+        (tasks_dir / tid).rmdir()
+    cache.apply(["t001", "t002"])
+    for tid in ("new1", "new2"):
+        set_task(tasks_dir, tid, 50)
+    cache.apply(["new1", "new2"])
+    assert len(cache._ids) == slots
+    assert list(cache.tasks())[-2:] == ["new1", "new2"]
+    assert cache.mtime("new1") == 50 and cache.mtime("t001") is None
+
+
+@pytest.mark.parametrize("tid", ["", ".", "..", "a/b", "..\\x", "t001/.."])
+def test_has_task_rejects_paths(cache, tid):
+    assert not cache.has_task(tid)
+
+
+def test_has_task_sees_tasks_before_the_watcher(cache, tasks_dir):
+    set_task(tasks_dir, "brand-new", 5000)
+    assert cache.has_task("brand-new")
+    assert cache.tasks()[0] == "brand-new"
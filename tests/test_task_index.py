@@ -0,0 +1,84 @@
+"""TaskIndex: the threaded bulk refresh and incremental re-reads"""
+import pytest
+
+import task_index
+from conftest import make_task
+from task_index import TaskIndex
+
+
+@pytest.fixture
+def tasks_dir(tmp_path):
+    for i in range(120):
+        make_task(tmp_path / "tasks", f"t{i:03}", 2 + i % 5)
+    return tmp_path / "tasks"
+
+
+def file_stat(path):
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_bulk_refresh_stores_every_task_in_batches(tasks_dir, tmp_path, monkeypatch, workers):
+    monkeypatch.setattr(task_index, "MIN_PARALLEL_TASKS", 10)
+    monkeypatch.setattr(task_index, "BATCH_SIZE", 25)
+    index = TaskIndex(tasks_dir, tmp_path / "index.sqlite3", workers=workers)
+    batches = []
+    index.subscribe(batches.append)
+    assert index.refresh() == 120
+    assert index.progress() is None
+    assert [len(batch) for batch in batches] == [25, 25, 25, 25, 20]
+    assert sorted(tid for batch in batches for tid in batch) == [f"t{i:03}" for i in range(120)]
+    titles = index.titles(f"t{i:03}" for i in range(120))
+    assert titles["t007"].startswith("t007 – message 0")
+    assert index.refresh() == 0
+    index.close()
+
+
+def test_refresh_rereads_only_changed_tasks(tasks_dir, tmp_path, monkeypatch):
+    index = TaskIndex(tasks_dir, tmp_path / "index.sqlite3", workers=2)
+    index.refresh()
+    reads = []
+    monkeypatch.setattr(task_index, "read_first_element", lambda path: reads.append(path) or {"text": "new"})
+    (tasks_dir / "t005" / "ui_messages.json").write_text('[{"text": "new"}]', encoding="utf-8")
+    assert index.refresh(["t005", "t006"]) == 1
+    assert [path.parent.name for path in reads] == ["t005"]
+    assert index.get("t005")["title"] == "new"
+    index.close()
+
+
+def test_counts_are_recorded_for_the_indexed_version_only(tasks_dir, tmp_path):
+    index = TaskIndex(tasks_dir, tmp_path / "index.sqlite3", workers=1)
+    index.refresh()
+    path, api_path = tasks_dir / "t004" / "ui_messages.json", tasks_dir / "t004" / "api_conversation_history.json"
+    mtime_ns, size = file_stat(path)
+    assert index.get("t004")["ui_count"] is None
+    # A stale version, and files outside the index, are ignored
+    assert index.record_count(path, mtime_ns - 1, size, 99)
+    assert not index.record_count(tmp_path / "t004" / "ui_messages.json", mtime_ns, size, 99)
+    assert index.get("t004")["ui_count"] is None
+    assert index.record_count(path, mtime_ns, size, 6)
+    assert index.record_count(api_path, *file_stat(api_path), 6)
+    assert (index.get("t004")["ui_count"], index.get("t004")["api_count"]) == (6, 6)
+
+    # Re-indexing keeps the count of an unchanged file and forgets a changed one's
+    path.write_text('[{"text": "a"}, {"text": "b"}]', encoding="utf-8")
+    index.refresh(["t004"])
+    assert (index.get("t004")["ui_count"], index.get("t004")["api_count"]) == (None, 6)
+    index.close()
+
+
+def test_counts_come_from_parses_and_offset_scans(tasks_dir, tmp_path):
+    from doc_cache import DocumentCache
+    from offset_index import OffsetIndex
+    index = TaskIndex(tasks_dir, tmp_path / "index.sqlite3", workers=1)
+    index.refresh()
+    documents, offsets = DocumentCache(), OffsetIndex(tmp_path / "offsets")
+    documents.subscribe(index.record_count)
+    offsets.subscribe(index.record_count)
+    documents.load(tasks_dir / "t001" / "ui_messages.json", store=False)
+    with offsets.open(tasks_dir / "t002" / "api_conversation_history.json") as messages:
+        assert len(messages) == 4
+    assert index.get("t001")["ui_count"] == 3
+    assert index.get("t002")["api_count"] == 4
+    index.close()
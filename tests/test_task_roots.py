@@ -0,0 +1,107 @@
+"""TaskRoots: several tasks directories merged into one mtime-ordered, cursor-paged list"""
+import os
+
+import pytest
+
+from task_roots import RootSpec, TaskRoots
+
+# (root, task ID, mtime): ties within and across roots, and IDs on both
+# sides of the other roots' "label:" prefixes
+TASKS = [
+    ("main", "alpha", 500), ("main", "zeta", 400), ("main", "m-1", 400), ("main", "old", 100),
+    ("work", "alpha", 400), ("work", "beta", 300), ("work", "x", 500),
+    ("laptop", "alpha", 400), ("laptop", "gamma", 200), ("laptop", "zz", 600),
+]
+
+
+def touch(path, mtime):
+    path.mkdir(parents=True, exist_ok=True)
+    (path / "ui_messages.json").write_text("[]")
+    os.utime(path, (mtime, mtime))
+
+
+def qualified(label, tid):
+    return tid if label == "main" else f"{label}:{tid}"
+
+
+def expected_order(tasks):
+    return [qualified(label, tid) for label, tid, mtime in sorted(tasks, key=lambda t: (-t[2], qualified(*t[:2])))]
+
+
+@pytest.fixture
+def roots(tmp_path):
+    for label, tid, mtime in TASKS:
+        touch(tmp_path / label / tid, mtime)
+    roots = TaskRoots([RootSpec(label, tmp_path / label) for label in ("main", "work", "laptop")],
+                      cache_dir=tmp_path / "cache")
+    roots.start()
+    yield roots
+    roots.stop()
+
+
+def all_pages(roots, limit, cursor=None):
+    """Every page from ``cursor`` (None: the first page) on"""
+    pages = []
+    while True:
+        page, cursor = roots.page(cursor, limit)
+        pages.append(page)
+        if cursor is None:
+            return pages
+
+
+def test_merged_order(roots):
+    assert list(roots.tasks()) == expected_order(TASKS)
+    assert roots.ranks() == {tid: i for i, tid in enumerate(expected_order(TASKS))}
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 4, 7, 10, 100])
+def test_pages_cover_the_merged_list_once(roots, limit):
+    pages = all_pages(roots, limit)
+    assert [tid for page in pages for tid in page] == list(roots.tasks())
+    assert all(len(page) == limit for page in pages[:-1])
+
+
+def test_cursor_survives_new_and_moved_tasks(roots, tmp_path):
+    first, cursor = roots.page(limit=4)
+    # A new task and one that moves to the top both land before the cursor
+    touch(tmp_path / "work" / "fresh", 900)
+    touch(tmp_path / "laptop" / "gamma", 950)
+    for root in roots.roots:
+        root.cache.apply(os.listdir(root.path))
+    rest = [tid for page in all_pages(roots, 3, cursor) for tid in page]
+    before = expected_order(TASKS)
+    assert rest == [tid for tid in before[4:] if tid != "laptop:gamma"]
+    assert list(roots.tasks())[:2] == ["laptop:gamma", "work:fresh"]
+
+
+def test_removed_task_leaves_the_merge(roots, tmp_path):
+    path = tmp_path / "work" / "x"
+    (path / "ui_messages.json").unlink()
+    path.rmdir()
+    roots.roots[1].cache.apply(["x"])
+    assert "work:x" not in roots.tasks()
+    assert [tid for page in all_pages(roots, 3) for tid in page] == list(roots.tasks())
+
+
+def test_routing(roots, tmp_path):
+    assert roots / "alpha" == tmp_path / "main" / "alpha"
+    assert roots / "work:alpha" == tmp_path / "work" / "alpha"
+    # An unknown label is part of a first-root task ID
+    assert roots.resolve("nope:alpha") == (roots.roots[0], "nope:alpha")
+    assert roots.has_task("laptop:zz") and not roots.has_task("work:zz")
+    assert roots.mtime("work:x") == 500 and roots.mtime("missing") is None
+
+
+def test_malformed_cursor(roots):
+    with pytest.raises(ValueError):
+        roots.page("no-separator")
+
+
+def test_subscribers_get_qualified_deltas(roots, tmp_path):
+    deltas = []
+    roots.subscribe(deltas.append)
+    assert deltas[0].full and sorted(deltas[0].added) == sorted(expected_order(TASKS))
+    touch(tmp_path / "laptop" / "new", 700)
+    roots.roots[2].cache.apply(["new"])
+    # (The watcher may have applied it first)
+    assert any(delta.added == ["laptop:new"] for delta in deltas[1:])
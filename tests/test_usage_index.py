@@ -0,0 +1,92 @@
+"""UsageIndex: per-task usage rows and the running (day, model) rollup"""
+import json
+import time
+
+import pytest
+
+from usage_index import Usage, UsageIndex, extract_usage
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = UsageIndex(tmp_path / "tasks", tmp_path / "usage.sqlite3")
+    yield index
+    index._conn.close()
+
+
+def ts(day):
+    """Local noon of a YYYY-MM-DD day, in epoch milliseconds"""
+    return int(time.mktime(time.strptime(day + " 12", "%Y-%m-%d %H")) * 1000)
+
+
+def request(day, model=None, tokens_in=100, tokens_out=10, cost=0.5):
+    text = "<task>hi</task>" + (f"<environment_details><model>{model}</model></environment_details>" if model else "")
+    info = {"request": text, "tokensIn": tokens_in, "tokensOut": tokens_out,
+            "cacheWrites": 1, "cacheReads": 2, "cost": cost}
+    return {"ts": ts(day), "type": "say", "say": "api_req_started", "text": json.dumps(info)}
+
+
+def write(index, tid, messages):
+    path = index.tasks_dir / tid / "ui_messages.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(messages), encoding="utf-8")
+    tmp.replace(path)
+    return path
+
+
+def test_a_request_without_a_model_inherits_the_previous_one():
+    messages = [
+        request("2024-01-01"),
+        request("2024-01-01", "model-a"),
+        {"ts": ts("2024-01-01"), "type": "say", "say": "text", "text": "<model>not-a-request</model>"},
+        request("2024-01-01"),
+        request("2024-01-02", "model-b"),
+        request("2024-01-02"),
+    ]
+    totals = extract_usage(messages)
+    assert {key: entry[0] for key, entry in totals.items()} == {
+        ("2024-01-01", "unknown"): 1, ("2024-01-01", "model-a"): 2, ("2024-01-02", "model-b"): 2}
+
+
+def test_totals_follow_reindexing_changes_and_deletes(index):
+    write(index, "a", [request("2024-01-01", "m"), request("2024-01-02", cost=0.25)])
+    write(index, "b", [request("2024-01-01", "m", tokens_in=1000)])
+    index.index_task("a")
+    index.index_task("b")
+    assert index.totals() == Usage(3, 1200, 30, 3, 6, 1.25)
+
+    # Unchanged: nothing is counted twice
+    index.index_task("a")
+    assert index.totals() == Usage(3, 1200, 30, 3, 6, 1.25)
+
+    write(index, "a", [request("2024-01-01", "m"), request("2024-01-02", cost=0.25), request("2024-01-03")])
+    index.index_task("a")
+    assert index.totals() == Usage(4, 1300, 40, 4, 8, 1.75)
+    assert [(row.key, row.requests) for row in index.by_day()] == \
+        [("2024-01-03", 1), ("2024-01-02", 1), ("2024-01-01", 2)]
+
+    (index.tasks_dir / "b" / "ui_messages.json").unlink()
+    index.index_task("b")
+    assert index.totals() == Usage(3, 300, 30, 3, 6, 1.25)
+    assert [row.key for row in index.top_tasks()] == ["a"]
+
+    # Days and models left without requests disappear from the rollup
+    write(index, "a", [request("2024-01-05", "other")])
+    index.index_task("a")
+    assert index.totals() == Usage(1, 100, 10, 1, 2, 0.5)
+    assert [row.key for row in index.by_day()] == ["2024-01-05"]
+    assert [row.key for row in index.by_model()] == ["other"]
+
+    index._drop_missing(set())
+    assert index.totals() == Usage(0, 0, 0, 0, 0, 0)
+    assert index.by_day() == []
+
+
+def test_weeks_are_keyed_by_their_monday(index):
+    # 2024-01-01 is a Monday
+    write(index, "a", [request(day, "m") for day in (
+        "2023-12-31", "2024-01-01", "2024-01-03", "2024-01-07", "2024-01-08", "2024-01-14")])
+    index.index_task("a")
+    assert [(row.key, row.requests) for row in index.by_week()] == \
+        [("2024-01-08", 2), ("2024-01-01", 3), ("2023-12-25", 1)]
@@ -0,0 +1,48 @@
+"""Task views: conditional requests and the response variants they depend on"""
+import re
+
+import pytest
+
+VARY = ["HX-Request", "HX-History-Restore-Request"]
+
+
+def vary(response):
+    return [v.strip() for v in response.headers["vary"].split(",") if v.strip() != "Accept-Encoding"]
+
+
+@pytest.mark.parametrize("url", ["/task/task-a/ui_messages", "/task/task-a/ui_messages/messages?start=0&stop=5"])
+def test_etag_and_vary_on_200_and_304(client, url):
+    full = client.get(url)
+    assert full.status_code == 200
+    assert vary(full) == VARY
+    not_modified = client.get(url, headers={"If-None-Match": full.headers["etag"]})
+    assert not_modified.status_code == 304
+    assert vary(not_modified) == VARY
+    assert not_modified.headers["etag"] == full.headers["etag"]
+
+
+def test_htmx_requests_get_their_own_etag(client):
+    url = "/task/task-a/ui_messages"
+    page = client.get(url)
+    fragment = client.get(url, headers={"HX-Request": "true"})
+    assert fragment.status_code == 200
+    assert fragment.headers["etag"] != page.headers["etag"]
+    # A fragment validator must not revalidate the full page
+    assert client.get(url, headers={"If-None-Match": fragment.headers["etag"]}).status_code == 200
+
+
+def test_tabs_show_message_counts_once_a_file_was_parsed(client):
+    for file_type in ("ui_messages", "api_conversation_history"):
+        client.get(f"/task/task-b/{file_type}")
+    page = client.get("/load_task/task-b").text
+    assert "API Conversation History (41)" in page
+    assert "UI Messages (41)" in page
+
+
+@pytest.mark.parametrize("file_type", ["ui_messages", "api_conversation_history"])
+def test_streamed_view_has_the_markup_of_the_messages_route(client, file_type):
+    headers = {"HX-Request": "true"}
+    streamed = client.get(f"/task/task-c/{file_type}?stream=true", headers=headers).text
+    buffered = client.get(f"/task/task-c/{file_type}/messages?start=0&stop=42", headers=headers).text
+    assert streamed.count('class="message ') == 42
+    assert re.sub(r">\s+<", "><", streamed).strip() == re.sub(r">\s+<", "><", buffered).strip()